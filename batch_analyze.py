@@ -0,0 +1,259 @@
+"""
+batch_analyze.py — KneeConnect headless re-scoring of recorded patient videos.
+
+Runs the exercise evaluators from utils.py over
+``patients_assets/<pid>/videos/*.avi`` without starting Qt.  Videos are spread
+over a process pool; every worker owns a single MediaPipe Pose instance that
+it reuses (reset between clips).
+
+Per video it writes rep counts, knee/hip/torso angle ranges and the per-frame
+angle series.  Angles are computed once per clip from the stacked landmark
+arrays with utils.joint_angles(), for the side the evaluator tracked on each
+frame.
+
+Output:
+    <out>/<pid>/<video stem>.json   full result incl. per-frame series
+    <out>/summary.json              one row per video, without the series
+
+Usage:
+    python batch_analyze.py                          # every patient
+    python batch_analyze.py --patients P001 P002 --workers 4
+    python batch_analyze.py --exercise Squats --side left --out rescore_v2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import storage
+from pose_engine import LocalPoseEngine, InferenceScaler
+from utils import (
+    EXERCISE_EVALUATORS, NUM_LANDMARKS, KNEE_ANGLE, HIP_ANGLE, TORSO_LEAN,
+    SIDE_LEFT, SIDE_RIGHT, joint_angles, resolve_sides,
+)
+
+# SetupPage names recordings "<Exercise_Label>_<YYYYmmdd_HHMMSS>.avi"
+_TIMESTAMP_SUFFIX = re.compile(r"_\d{8}_\d{6}$")
+
+
+# ─── Job discovery ───────────────────────────────────────────────────────────
+
+def _exercise_from_filename(path: Path) -> str:
+    label = _TIMESTAMP_SUFFIX.sub("", path.stem)
+    return storage.canonical_exercise(label.replace("_", " "))
+
+
+def _video_exercises(pid: str) -> dict:
+    """Video file name -> exercise key, from the patient.json videos index."""
+    data = storage.load_patient_json({"id": pid})
+    videos = (data.get("setup") or {}).get("videos") or data.get("videos") or []
+    out = {}
+    for v in videos:
+        if not isinstance(v, dict) or not v.get("path"):
+            continue
+        key = v.get("exercise_key") or storage.canonical_exercise(v.get("exercise", ""))
+        if key:
+            out[Path(v["path"]).name] = key
+    return out
+
+
+def find_jobs(patients=None, exercise: str = "", side: str = "auto") -> list:
+    """(pid, video path, exercise key, side) for every scorable recording."""
+    assets = Path(storage.ASSETS_DIR)
+    if patients:
+        pids = list(patients)
+    elif assets.is_dir():
+        pids = sorted(p.name for p in assets.iterdir() if p.is_dir())
+    else:
+        pids = []
+
+    jobs = []
+    for pid in pids:
+        folder = storage.get_videos_folder({"id": pid})
+        if not folder.is_dir():
+            print(f"{pid}: no videos folder, skipped")
+            continue
+        known = _video_exercises(pid)
+        for path in sorted(folder.glob("*.avi")):
+            ex = exercise or known.get(path.name) or _exercise_from_filename(path)
+            if ex not in EXERCISE_EVALUATORS:
+                print(f"{pid}/{path.name}: no evaluator for '{ex}', skipped")
+                continue
+            jobs.append((pid, str(path), ex, side))
+    return jobs
+
+
+# ─── Worker ──────────────────────────────────────────────────────────────────
+
+_engine = None
+_scaler = None
+
+
+def _init_worker(model_complexity: int, width: int):
+    global _engine, _scaler
+    # One process per core already; keep OpenCV from oversubscribing
+    cv2.setNumThreads(1)
+    _engine = LocalPoseEngine(model_complexity)
+    _scaler = InferenceScaler(width)
+
+
+def _series(values) -> list:
+    return [None if np.isnan(v) else round(float(v), 1) for v in values]
+
+
+def _range(values) -> list:
+    if np.isnan(values).all():
+        return None
+    return [round(float(np.nanmin(values)), 1), round(float(np.nanmax(values)), 1)]
+
+
+def analyze_video(job) -> dict:
+    """Score one recording in this worker. Never raises; errors are reported."""
+    pid, path, exercise, side = job
+    result = {"patient_id": pid, "video": path, "exercise": exercise, "side": side}
+    t_start = time.perf_counter()
+    try:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError("could not open video")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+
+        evaluator = EXERCISE_EVALUATORS[exercise]()
+        _engine.reset()
+
+        landmarks = []   # (33, 4) array or None per frame
+        cols = []        # joint_angles() side column the evaluator tracked
+        aspect = 1.0
+        try:
+            while True:
+                ret, bgr = cap.read()
+                if not ret:
+                    break
+                rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+                aspect = rgb.shape[1] / rgb.shape[0]
+                lm = _engine.process(_scaler.scale(rgb))
+                landmarks.append(lm)
+                if lm is None:
+                    cols.append(SIDE_RIGHT)
+                    continue
+                sides = resolve_sides(lm, side)
+                evaluator.update(lm, rgb, side, sides)
+                # StraightLegRaise switches to the raised leg on its own
+                tracked = getattr(evaluator, "current_side", sides.name)
+                cols.append(SIDE_LEFT if tracked == "left" else SIDE_RIGHT)
+        finally:
+            cap.release()
+
+        n = len(landmarks)
+        stack = np.full((n, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        detected = [i for i, lm in enumerate(landmarks) if lm is not None]
+        for i in detected:
+            stack[i] = landmarks[i]
+        angles = np.empty((0, 3))
+        if n:
+            with np.errstate(invalid="ignore"):   # undetected frames are NaN
+                angles = joint_angles(stack, aspect)[np.arange(n), :, cols]
+
+        knee = angles[:, KNEE_ANGLE]
+        hip = angles[:, HIP_ANGLE]
+        torso = angles[:, TORSO_LEAN]
+
+        result.update({
+            "frames": n,
+            "detected_frames": len(detected),
+            "fps": round(fps, 2),
+            "rep_count": evaluator.rep_count,
+            "total_rep_count": evaluator.total_rep_count,
+            "knee_range": _range(knee),
+            "hip_range": _range(hip),
+            "torso_range": _range(torso),
+        })
+        if exercise == "Straight Leg Raises":
+            for key in ("left_rep_count", "left_total_rep_count",
+                        "right_rep_count", "right_total_rep_count"):
+                result[key] = getattr(evaluator, key)
+        result["series"] = {
+            "t": [round(i / fps, 3) for i in range(n)],
+            "knee": _series(knee),
+            "hip": _series(hip),
+            "torso": _series(torso),
+            "side": ["left" if c == SIDE_LEFT else "right" for c in cols],
+        }
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed_s"] = round(time.perf_counter() - t_start, 2)
+    return result
+
+
+# ─── Driver ──────────────────────────────────────────────────────────────────
+
+def run_batch(jobs: list, out_dir: str, workers: int = 0, model_complexity: int = 1,
+              width: int = 0) -> list:
+    """Score every job on a process pool; returns the summary rows."""
+    if not jobs:
+        return []
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    workers = min(workers, len(jobs))
+    out = Path(out_dir)
+    summary = []
+
+    ctx = multiprocessing.get_context("spawn")
+    t0 = time.perf_counter()
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(model_complexity, width)) as pool:
+        for done, result in enumerate(pool.imap_unordered(analyze_video, jobs), 1):
+            name = Path(result["video"]).name
+            if "error" in result:
+                print(f"[{done}/{len(jobs)}] {result['patient_id']}/{name}: "
+                      f"ERROR {result['error']}")
+            else:
+                target = out / result["patient_id"] / f"{Path(name).stem}.json"
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with open(target, "w") as f:
+                    json.dump(result, f)
+                print(f"[{done}/{len(jobs)}] {result['patient_id']}/{name}: "
+                      f"{result['exercise']} reps {result['rep_count']}/"
+                      f"{result['total_rep_count']} ({result['elapsed_s']}s)")
+            summary.append({k: v for k, v in result.items() if k != "series"})
+
+    summary.sort(key=lambda r: (r["patient_id"], r["video"]))
+    out.mkdir(parents=True, exist_ok=True)
+    with open(out / "summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{len(jobs)} video(s) with {workers} worker(s) in "
+          f"{time.perf_counter() - t0:.1f}s → {out}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score recorded patient videos")
+    parser.add_argument("--patients", nargs="+",
+                        help="patient IDs (default: every folder in patients_assets)")
+    parser.add_argument("--exercise", choices=sorted(EXERCISE_EVALUATORS),
+                        help="score every video as this exercise "
+                             "(default: from patient.json / the file name)")
+    parser.add_argument("--side", choices=("auto", "left", "right"), default="auto")
+    parser.add_argument("--workers", type=int, default=0, help="0 = CPU count - 1")
+    parser.add_argument("--complexity", type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument("--width", type=int, default=0,
+                        help="inference width in px (0 = full resolution)")
+    parser.add_argument("--out", default="batch_results")
+    args = parser.parse_args(argv)
+
+    jobs = find_jobs(args.patients, args.exercise or "", args.side)
+    if not jobs:
+        print("No videos to analyze.")
+        return
+    run_batch(jobs, args.out, args.workers, args.complexity, args.width)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
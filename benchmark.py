@@ -0,0 +1,480 @@
+"""
+benchmark.py — KneeConnect vision pipeline benchmarks.
+
+Pipeline run: replays a clip through every stage of CameraThread.run without
+a display — decode, cvtColor, pose inference, exercise update, overlay and
+QImage wrapping — and reports throughput, p50/p95/p99 latency per stage and
+peak RSS as JSON.  ``compare`` diffs two such runs and exits non-zero on a
+regression, so it can gate CI: it gates on p50/p95 (p99 only with enough
+frames), and ``run --repeat`` takes the median of several runs.  ``synth``
+writes a synthetic clip, and ``--pose synthetic`` replaces MediaPipe with a
+generated squat cycle, so the suite also runs on a GPU-less box without any
+recordings.
+
+Inference-size sweep: replays a recorded clip through MediaPipe Pose and one
+exercise evaluator at several inference widths, and reports per-frame
+inference latency against rep-count accuracy (compared to full resolution).
+
+Usage:
+    python benchmark.py synth ci_clip.avi --frames 300
+    python benchmark.py run ci_clip.avi --pose synthetic --repeat 5 --json base.json
+    python benchmark.py run clip.avi --exercise Squats --json new.json
+    python benchmark.py compare base.json new.json --threshold 0.15
+    python benchmark.py sizes clip.avi --exercise Squats --widths 0 960 640 480 320
+"""
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from overlay import put_text
+from perf import percentile as _percentile
+from pose_engine import LocalPoseEngine, InferenceScaler
+from utils import EXERCISE_EVALUATORS as EXERCISES, resolve_sides
+
+try:
+    import resource
+except ImportError:          # Windows
+    resource = None
+
+STAGES = ("decode", "cvtColor", "inference", "exercise", "overlay", "qimage")
+
+
+# ─── Helpers ─────────────────────────────────────────────────────────────────
+
+def _iter_clip(path: str, max_frames: int = 0):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open clip: {path}")
+    n = 0
+    try:
+        while True:
+            ret, bgr = cap.read()
+            if not ret:
+                break
+            yield bgr
+            n += 1
+            if max_frames and n >= max_frames:
+                break
+    finally:
+        cap.release()
+
+
+def _stage_stats(values: list) -> dict | None:
+    if not values:
+        return None
+    return {
+        "mean": round(statistics.fmean(values), 3),
+        "p50": round(_percentile(values, 50), 3),
+        "p95": round(_percentile(values, 95), 3),
+        "p99": round(_percentile(values, 99), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ─── Synthetic input ─────────────────────────────────────────────────────────
+
+def synthetic_pose(i: int, period: int = 60) -> np.ndarray:
+    """(33, 4) landmarks of a side-on squat cycle, right side facing the camera."""
+    phase = (1.0 - math.cos(2.0 * math.pi * i / period)) / 2.0
+    knee = math.radians(175.0 - 75.0 * phase)     # interior knee angle
+    a = (math.pi - knee) / 2.0                    # shin / thigh tilt from vertical
+    ankle = np.array([0.5, 0.9])
+    knee_pt = ankle + 0.22 * np.array([math.sin(a), -math.cos(a)])
+    hip = knee_pt + 0.22 * np.array([-math.sin(a), -math.cos(a)])
+    shoulder = hip + 0.30 * np.array([math.sin(a / 2), -math.cos(a / 2)])
+
+    lm = np.zeros((33, 4), dtype=np.float32)
+    lm[:, :2] = shoulder - [0.0, 0.08]            # head / arms: near the nose
+    lm[:, 3] = 0.9
+    for right, left, pt in ((12, 11, shoulder), (24, 23, hip), (26, 25, knee_pt),
+                            (28, 27, ankle), (30, 29, ankle - [0.03, 0.0]),
+                            (32, 31, ankle + [0.06, 0.0])):
+        lm[right, :2] = pt
+        lm[left, :2] = pt + [0.01, 0.0]
+        lm[left, 3] = 0.4
+    return lm
+
+
+def synth_clip(path: str, frames: int = 300, width: int = 640, height: int = 480,
+               fps: float = 30.0):
+    """Write a synthetic MJPG clip (textured background + a moving stick figure)."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise SystemExit(f"Could not write clip: {path}")
+    rng = np.random.default_rng(0)
+    background = rng.integers(40, 200, size=(height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (0, 0), 5)
+    bones = ((12, 24), (24, 26), (26, 28), (28, 32), (30, 32), (0, 12))
+    try:
+        for i in range(frames):
+            frame = background.copy()
+            pts = (synthetic_pose(i)[:, :2] * (width, height)).astype(int).tolist()
+            for p1, p2 in bones:
+                cv2.line(frame, tuple(pts[p1]), tuple(pts[p2]), (230, 230, 230), 12)
+            cv2.circle(frame, tuple(pts[0]), 24, (200, 180, 160), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+# ─── Pipeline run ────────────────────────────────────────────────────────────
+
+def run_pipeline(path: str, exercise: str = "Squats", pose: str = "mediapipe",
+                 model_complexity: int = 1, width: int = 0, max_frames: int = 0,
+                 warmup: int = 10) -> dict:
+    """Time each CameraThread stage over one clip (first ``warmup`` frames dropped)."""
+    try:
+        from PyQt6.QtGui import QImage
+    except ImportError:
+        QImage = None
+
+    engine = LocalPoseEngine(model_complexity) if pose == "mediapipe" else None
+    scaler = InferenceScaler(width)
+    evaluator = EXERCISES[exercise]()
+    timings = {name: [] for name in STAGES}
+    totals = []
+    detected = 0
+    rgb = None
+    frame_shape = None
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open clip: {path}")
+    try:
+        i = 0
+        while not max_frames or i < max_frames:
+            t0 = time.perf_counter()
+            ret, bgr = cap.read()
+            t1 = time.perf_counter()
+            if not ret:
+                break
+            if rgb is None or rgb.shape != bgr.shape:
+                rgb = np.empty_like(bgr)
+                frame_shape = bgr.shape
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+            t2 = time.perf_counter()
+
+            if engine is not None:
+                lm = engine.process(scaler.scale(rgb))
+            else:
+                lm = synthetic_pose(i)
+            t3 = time.perf_counter()
+
+            knee = 0.0
+            debug_str = ""
+            if lm is not None:
+                detected += 1
+                sides = resolve_sides(lm)
+                knee = evaluator.update(lm, rgb, "auto", sides)[0]
+                debug_str = sides.debug_text()
+            t4 = time.perf_counter()
+
+            # Same overlay CameraThread draws on every frame
+            h, w, ch = rgb.shape
+            put_text(rgb, f"Repetition: {evaluator.rep_count}", (30, 40),
+                     1.2, (255, 255, 0), 3)
+            put_text(rgb, f"Angle: {int(knee)}", (30, 80), 1.2, (255, 255, 0), 3,
+                     cache=False)
+            put_text(rgb, debug_str, (10, h - 14), 0.55, (220, 220, 0), 1, cache=False)
+            t5 = time.perf_counter()
+
+            if QImage is not None:
+                QImage(rgb.data, w, h, ch * w, QImage.Format.Format_RGB888)
+            t6 = time.perf_counter()
+
+            if i >= warmup:
+                marks = (t0, t1, t2, t3, t4, t5, t6)
+                for name, start, end in zip(STAGES, marks, marks[1:]):
+                    timings[name].append((end - start) * 1000.0)
+                totals.append((t6 - t0) * 1000.0)
+            i += 1
+    finally:
+        cap.release()
+        if engine is not None:
+            engine.close()
+
+    if QImage is None:
+        timings["qimage"] = []
+    if engine is None:
+        # No real inference happened; keep the stage out of comparisons
+        timings["inference"] = []
+    busy_s = sum(totals) / 1000.0
+    return {
+        "clip": path,
+        "exercise": exercise,
+        "pose": pose,
+        "model_complexity": model_complexity if engine is not None else None,
+        "inference_width": width,
+        "frame_size": [frame_shape[1], frame_shape[0]] if frame_shape else None,
+        "frames": len(totals),
+        "detected_frames": detected,
+        "rep_count": evaluator.rep_count,
+        "total_rep_count": evaluator.total_rep_count,
+        "throughput_fps": round(len(totals) / busy_s, 2) if busy_s else 0.0,
+        "stages": {name: _stage_stats(v) for name, v in timings.items()},
+        "frame_total": _stage_stats(totals),
+        "peak_rss_mb": _peak_rss_mb(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "machine": platform.platform(),
+    }
+
+
+def median_run(runs: list) -> dict:
+    """Combine repeated run_pipeline() results: the median of every statistic.
+
+    One slow run (another process waking up, a cold cache) then moves
+    nothing, which is what makes a CI gate on two back-to-back runs usable.
+    ``frames`` becomes the total timed over all repeats.
+    """
+    if len(runs) == 1:
+        return runs[0]
+    out = dict(runs[-1])
+
+    def med(values):
+        values = [v for v in values if v is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    def med_stats(stats):
+        if any(st is None for st in stats):
+            return None
+        return {k: med([st[k] for st in stats]) for k in stats[0]}
+
+    out["stages"] = {name: med_stats([r["stages"][name] for r in runs])
+                     for name in runs[0]["stages"]}
+    out["frame_total"] = med_stats([r["frame_total"] for r in runs])
+    out["throughput_fps"] = med([r["throughput_fps"] for r in runs])
+    out["peak_rss_mb"] = max((r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None),
+                             default=None)
+    out["frames"] = sum(r["frames"] for r in runs)
+    out["repeats"] = len(runs)
+    return out
+
+
+def _print_run(run: dict):
+    print(f"{run['clip']}: {run['frames']} frames, {run['throughput_fps']:.1f} fps, "
+          f"peak RSS {run['peak_rss_mb']} MB, reps {run['rep_count']}/{run['total_rep_count']}")
+    print(f"{'stage':>10} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    rows = list(run["stages"].items()) + [("total", run["frame_total"])]
+    for name, st in rows:
+        if st is None:
+            print(f"{name:>10} {'—':>8}")
+            continue
+        print(f"{name:>10} {st['mean']:>8.3f} {st['p50']:>8.3f} {st['p95']:>8.3f} "
+              f"{st['p99']:>8.3f} {st['max']:>8.3f}")
+
+
+# ─── Run comparison ──────────────────────────────────────────────────────────
+
+def compare_runs(base: dict, new: dict, threshold: float = 0.10,
+                 min_ms: float = 0.25, min_p99_frames: int = 1000) -> list:
+    """Rows of (metric, base, new, change, regressed) between two run() results.
+
+    A p50/p95 latency counts as regressed when it grew by more than
+    ``threshold`` (fraction) and by more than ``min_ms``; throughput when it
+    dropped by more than ``threshold``; peak RSS when it grew by more than
+    ``threshold``.  p99 is only gated when both runs timed at least
+    ``min_p99_frames`` frames: over a few hundred frames it is a handful of
+    samples, and two identical runs differ by tens of percent.
+    """
+    rows = []
+    gate_p99 = min(base.get("frames", 0), new.get("frames", 0)) >= min_p99_frames
+
+    def add(metric, old, cur, worse_if_higher=True, floor=0.0, gate=True):
+        if old is None or cur is None:
+            return
+        change = (cur - old) / old if old else 0.0
+        delta = cur - old if worse_if_higher else old - cur
+        grown = change if worse_if_higher else -change
+        rows.append((metric, old, cur, change, gate and grown > threshold and delta > floor))
+
+    stages = list(STAGES) + ["total"]
+    for name in stages:
+        b = base["frame_total"] if name == "total" else base["stages"].get(name)
+        n = new["frame_total"] if name == "total" else new["stages"].get(name)
+        if not b or not n:
+            continue
+        for pct in ("p50", "p95", "p99"):
+            add(f"{name}.{pct}_ms", b[pct], n[pct], floor=min_ms,
+                gate=pct != "p99" or gate_p99)
+    add("throughput_fps", base["throughput_fps"], new["throughput_fps"],
+        worse_if_higher=False)
+    add("peak_rss_mb", base.get("peak_rss_mb"), new.get("peak_rss_mb"))
+    return rows
+
+
+def _print_compare(rows: list):
+    print(f"{'metric':>22} {'base':>10} {'new':>10} {'change':>8}")
+    for metric, old, cur, change, bad in rows:
+        flag = "  REGRESSION" if bad else ""
+        print(f"{metric:>22} {old:>10.3f} {cur:>10.3f} {change * 100:>+7.1f}%{flag}")
+
+
+# ─── Inference-size sweep ────────────────────────────────────────────────────
+
+def run_size(path: str, exercise: str, width: int, model_complexity: int = 1,
+             max_frames: int = 0) -> dict:
+    """Score one clip at one inference width. Returns latency + rep stats."""
+    engine = LocalPoseEngine(model_complexity)
+    scaler = InferenceScaler(width)
+    evaluator = EXERCISES[exercise]()
+
+    latencies = []
+    knee_series = []
+    detected = 0
+    frame_w = 0
+    try:
+        for bgr in _iter_clip(path, max_frames):
+            frame_w = bgr.shape[1]
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+            t0 = time.perf_counter()
+            lm = engine.process(scaler.scale(rgb))
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+            knee = None
+            if lm is not None:
+                detected += 1
+                out = evaluator.update(lm, rgb)
+                knee = float(out[0])
+            knee_series.append(knee)
+    finally:
+        engine.close()
+
+    return {
+        "width": width or frame_w,
+        "frames": len(latencies),
+        "detected_frames": detected,
+        "latency_ms_mean": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "latency_ms_p95": round(_percentile(latencies, 95), 2),
+        "rep_count": evaluator.rep_count,
+        "total_rep_count": evaluator.total_rep_count,
+        "knee_series": knee_series,
+    }
+
+
+def sweep_sizes(path: str, exercise: str, widths: list, model_complexity: int = 1,
+                max_frames: int = 0) -> list:
+    """Run every width; the first entry is the accuracy reference."""
+    rows = [run_size(path, exercise, w, model_complexity, max_frames) for w in widths]
+    ref = rows[0]
+    for row in rows:
+        diffs = [
+            abs(a - b) for a, b in zip(row["knee_series"], ref["knee_series"])
+            if a is not None and b is not None
+        ]
+        row["knee_mae_deg"] = round(statistics.fmean(diffs), 2) if diffs else None
+        row["rep_error"] = row["total_rep_count"] - ref["total_rep_count"]
+        del row["knee_series"]
+    return rows
+
+
+def _print_sizes(rows: list):
+    print(f"{'width':>6} {'mean ms':>8} {'p95 ms':>8} {'reps':>5} {'total':>6} "
+          f"{'rep err':>8} {'knee MAE':>9} {'detected':>9}")
+    for r in rows:
+        mae = "—" if r["knee_mae_deg"] is None else f"{r['knee_mae_deg']:.2f}"
+        print(f"{r['width']:>6} {r['latency_ms_mean']:>8.2f} {r['latency_ms_p95']:>8.2f} "
+              f"{r['rep_count']:>5} {r['total_rep_count']:>6} {r['rep_error']:>8} "
+              f"{mae:>9} {r['detected_frames']:>5}/{r['frames']}")
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KneeConnect vision benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_sizes = sub.add_parser("sizes", help="latency vs rep accuracy per inference width")
+    p_sizes.add_argument("clip", help="recorded exercise video")
+    p_sizes.add_argument("--exercise", choices=sorted(EXERCISES), default="Squats")
+    p_sizes.add_argument("--widths", type=int, nargs="+", default=[0, 960, 640, 480, 320],
+                         help="inference widths; the first one is the reference (0 = full)")
+    p_sizes.add_argument("--complexity", type=int, default=1, choices=(0, 1, 2))
+    p_sizes.add_argument("--max-frames", type=int, default=0)
+    p_sizes.add_argument("--json", dest="json_out", help="also write results to this file")
+
+    p_run = sub.add_parser("run", help="per-stage latency, throughput and peak RSS")
+    p_run.add_argument("clip", help="reference video (see `synth` for a synthetic one)")
+    p_run.add_argument("--exercise", choices=sorted(EXERCISES), default="Squats")
+    p_run.add_argument("--pose", choices=("mediapipe", "synthetic"), default="mediapipe",
+                       help="synthetic = generated landmarks, no MediaPipe")
+    p_run.add_argument("--complexity", type=int, default=1, choices=(0, 1, 2))
+    p_run.add_argument("--width", type=int, default=0, help="inference width (0 = full)")
+    p_run.add_argument("--max-frames", type=int, default=0)
+    p_run.add_argument("--warmup", type=int, default=10)
+    p_run.add_argument("--repeat", type=int, default=1,
+                       help="run the clip N times and keep the median of each statistic")
+    p_run.add_argument("--json", dest="json_out", help="write the run to this file")
+
+    p_cmp = sub.add_parser("compare", help="flag regressions between two `run` results")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.10,
+                       help="allowed relative slowdown (0.10 = 10%%)")
+    p_cmp.add_argument("--min-ms", type=float, default=0.25,
+                       help="ignore latency changes smaller than this")
+    p_cmp.add_argument("--min-p99-frames", type=int, default=1000,
+                       help="only gate on p99 when both runs timed this many frames")
+
+    p_synth = sub.add_parser("synth", help="write a synthetic benchmark clip")
+    p_synth.add_argument("clip", help="output .avi path")
+    p_synth.add_argument("--frames", type=int, default=300)
+    p_synth.add_argument("--size", type=int, nargs=2, default=[640, 480],
+                         metavar=("W", "H"))
+    p_synth.add_argument("--fps", type=float, default=30.0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run = median_run([run_pipeline(args.clip, args.exercise, args.pose, args.complexity,
+                                       args.width, args.max_frames, args.warmup)
+                          for _ in range(max(1, args.repeat))])
+        _print_run(run)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(run, f, indent=2)
+
+    elif args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare_runs(base, new, args.threshold, args.min_ms, args.min_p99_frames)
+        _print_compare(rows)
+        if min(base.get("frames", 0), new.get("frames", 0)) < args.min_p99_frames:
+            print(f"p99 reported only: fewer than {args.min_p99_frames} frames per run")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+    elif args.command == "synth":
+        synth_clip(args.clip, args.frames, args.size[0], args.size[1], args.fps)
+        print(f"Wrote {args.frames} frames → {args.clip}")
+
+    elif args.command == "sizes":
+        rows = sweep_sizes(args.clip, args.exercise, args.widths,
+                           args.complexity, args.max_frames)
+        _print_sizes(rows)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+capture.py — KneeConnect camera capture helpers.
+
+LatestFrameGrabber reads a cv2.VideoCapture on its own thread and keeps only
+the newest frame in a single slot.  The vision thread always picks up the
+freshest frame; anything it was too slow to look at is dropped and counted
+instead of piling up in the driver buffer.
+
+Frames are read straight into pooled buffers (see frame_pool.py), so the
+steady-state capture loop does not allocate.
+
+open_camera() remembers the device that worked last time (index, backend,
+resolution, fps) in a small JSON file next to the app and opens it directly;
+the full (index, backend) probe only runs when that fails, on a background
+thread that concurrent callers share.  Candidates are per
+platform (V4L2 on Linux, DSHOW/MSMF on Windows), so no time is spent on
+backends that cannot work.
+
+The same file's "capture" section is the station's requested format:
+FOURCC (MJPG by default — uncompressed YUYV caps many UVC webcams at a low
+frame rate), resolution, fps and driver buffer size (1 = no stale frames
+queued in the driver).  configure_capture() applies it and reads back what
+the driver granted, which is logged and stored with the cached device.
+
+ClipRecorder writes SetupPage's exercise clips from the thread that owns the
+frames (SimpleCameraThread, or SetupPreview's worker on the shared camera),
+so every processed frame reaches the file in order (the GUI only ever sees
+the newest one).  Frames are paced to the wall clock at the clip's nominal fps:
+a frame the camera or vision loop dropped repeats the previous one instead
+of shortening (and speeding up) the clip.
+
+Public API:
+    LatestFrameGrabber(cap, loop_video=False, pace_fps=0.0)
+        .start() / .stop()
+        .read(timeout) -> (ok, PooledFrame)   caller must frame.release()
+        .captured_frames / .dropped_frames / .finished / .fps / .has_frame
+    open_camera(config_path, should_stop=None) -> (cap or None, description)
+    configure_capture(cap, settings) -> granted settings dict
+    DEFAULT_CAPTURE
+    camera_candidates(indices=(0, 1)) -> [(index, backend_name), ...]
+    load_camera_config(path) / save_camera_config(path, config)
+    ClipRecorder(fps=20.0)
+        .start(path, frame_size) -> bool / .write(bgr, t=None) / .stop() -> frames
+        .recording / .frames
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+from frame_pool import FramePool
+
+
+# ─── Latest-frame grabber ────────────────────────────────────────────────────
+
+class LatestFrameGrabber:
+    """Continuously reads frames and keeps only the most recent one.
+
+    Uses a plain threading.Thread (like TTSWorker) so the blocking cap.read()
+    never stalls pose inference in the QThread that consumes the frames.
+
+    For video files there is no driver clock, so ``pace_fps`` throttles reads
+    to the file's frame rate; otherwise the whole clip would be decoded (and
+    dropped) in a few seconds.
+    """
+
+    def __init__(self, cap, loop_video: bool = False, pace_fps: float = 0.0):
+        self._cap = cap
+        self._loop_video = loop_video
+        self._frame_interval = 1.0 / pace_fps if pace_fps and pace_fps > 0 else 0.0
+
+        self._cond = threading.Condition()
+        self._slot = None          # newest unread PooledFrame
+        # writer + slot + reader each hold at most one buffer, plus one spare
+        # for the hand-off; shared-camera subscribers copy what they keep
+        self._pool = FramePool(max_frames=4)
+        self._run_flag = True
+        self._thread = None
+
+        self.finished = False      # source ran out of frames (or failed)
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.fps = 0.0             # smoothed capture rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_due = time.perf_counter()
+        last_t = None
+        shape = None
+        while self._run_flag:
+            if shape is not None:
+                frame = self._pool.acquire(shape)
+                ret, img = self._cap.read(frame.array)
+            else:
+                frame = None
+                ret, img = self._cap.read()
+
+            if not ret:
+                if frame is not None:
+                    frame.release()
+                if self._loop_video:
+                    self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                break
+
+            if frame is None or img is not frame.array:
+                # First frame, or the driver changed resolution under us
+                if frame is not None:
+                    frame.release()
+                frame = self._pool.adopt(img)
+                shape = img.shape
+
+            now = time.perf_counter()
+            if last_t is not None and now > last_t:
+                inst = 1.0 / (now - last_t)
+                self.fps = inst if not self.fps else self.fps + 0.1 * (inst - self.fps)
+            last_t = now
+
+            with self._cond:
+                if self._slot is not None:
+                    self.dropped_frames += 1
+                    self._slot.release()
+                self._slot = frame
+                self.captured_frames += 1
+                self._cond.notify()
+
+            if self._frame_interval:
+                next_due += self._frame_interval
+                delay = next_due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.perf_counter()
+
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def read(self, timeout: float = 1.0):
+        """Return (True, frame) with the newest unread PooledFrame.
+
+        The caller owns the frame and must release() it once done with it.
+        Blocks up to ``timeout`` seconds for a new frame.  Returns (False, None)
+        on timeout or once the source is finished and the slot is empty.
+        """
+        with self._cond:
+            if self._slot is None and not self.finished:
+                self._cond.wait(timeout)
+            frame = self._slot
+            self._slot = None
+        if frame is None:
+            return False, None
+        return True, frame
+
+    @property
+    def has_frame(self) -> bool:
+        """A frame is waiting to be read."""
+        return self._slot is not None
+
+    def stop(self):
+        self._run_flag = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=3.0)
+        with self._cond:
+            if self._slot is not None:
+                self._slot.release()
+                self._slot = None
+
+
+# ─── Setup clip recording ────────────────────────────────────────────────────
+
+class ClipRecorder:
+    """cv2.VideoWriter fed from a camera thread, paced to the wall clock.
+
+    start() / stop() are called from the GUI thread, write() from the frame
+    thread for every frame it processes.
+    """
+
+    def __init__(self, fps: float = 20.0):
+        self.fps = fps
+        self.frames = 0            # frames in the file, repeats included
+        self._writer = None
+        self._size = None
+        self._t0 = None
+        self._lock = threading.Lock()
+
+    @property
+    def recording(self) -> bool:
+        return self._writer is not None
+
+    def start(self, path, frame_size: tuple) -> bool:
+        """Open ``path`` for (w, h) frames; False if the codec is unavailable."""
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"),
+                                 self.fps, tuple(frame_size))
+        if not writer.isOpened():
+            writer.release()
+            return False
+        with self._lock:
+            if self._writer is not None:
+                self._writer.release()
+            self._writer = writer
+            self._size = tuple(frame_size)
+            self._t0 = None
+            self.frames = 0
+        return True
+
+    def write(self, bgr, t: float = None):
+        with self._lock:
+            writer = self._writer
+            if writer is None or (bgr.shape[1], bgr.shape[0]) != self._size:
+                return
+            t = time.perf_counter() if t is None else t
+            if self._t0 is None:
+                self._t0 = t
+            # Frames the clip should hold by now; after a stall catch up at
+            # most one second per call
+            due = int((t - self._t0) * self.fps) + 1
+            for _ in range(min(due - self.frames, int(self.fps))):
+                writer.write(bgr)
+                self.frames += 1
+
+    def stop(self) -> int:
+        """Close the file; returns the number of frames written."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.release()
+        return self.frames
+
+
+# ─── Camera discovery ────────────────────────────────────────────────────────
+
+# Next to the app, not the launch directory, so every start finds the cache
+DEFAULT_CAMERA_CONFIG = str(Path(__file__).resolve().parent / "camera.json")
+
+# Requested capture format; per station via the config's "capture" section.
+# 0 / "" leaves a setting at the driver default.
+DEFAULT_CAPTURE = {
+    "fourcc": "MJPG",
+    "width": 1280,
+    "height": 720,
+    "fps": 30,
+    "buffer_size": 1,
+}
+
+# Serializes opens of the cached device: SetupPage and the main view must not
+# grab it at the same time.  Never held during the (slow) probe.
+_OPEN_LOCK = threading.Lock()
+
+# The background probe shared by every open_camera() caller
+_PROBE_LOCK = threading.Lock()
+_probe_thread = None
+_probe_done = None
+
+
+def camera_candidates(indices=(0, 1)) -> list:
+    """(index, backend name) pairs worth trying on this platform, in order."""
+    if sys.platform.startswith("linux"):
+        backends = ("V4L2", "ANY")
+    elif sys.platform == "win32":
+        backends = ("DSHOW", "MSMF", "ANY")
+    elif sys.platform == "darwin":
+        backends = ("AVFOUNDATION", "ANY")
+    else:
+        backends = ("ANY",)
+    return [(idx, name) for idx in indices for name in backends]
+
+
+def load_camera_config(path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return config if isinstance(config, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_camera_config(path, config: dict):
+    try:
+        path = Path(path)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+        tmp.replace(path)
+    except OSError as e:
+        print(f"save_camera_config error: {e}")
+
+
+def _fourcc_str(value: float) -> str:
+    code = int(value)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def configure_capture(cap, settings: dict) -> dict:
+    """Request a capture format and return what the driver actually granted.
+
+    FOURCC goes first: many drivers only offer high resolutions / frame
+    rates once MJPG is selected.  Unsupported requests are not errors, the
+    driver just keeps (and reports) its own choice.
+    """
+    fourcc = settings.get("fourcc") or ""
+    if len(fourcc) == 4:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    if settings.get("width") and settings.get("height"):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, int(settings["width"]))
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, int(settings["height"]))
+    if settings.get("fps"):
+        cap.set(cv2.CAP_PROP_FPS, float(settings["fps"]))
+    if settings.get("buffer_size"):
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, int(settings["buffer_size"]))
+    return {
+        "fourcc": _fourcc_str(cap.get(cv2.CAP_PROP_FOURCC)),
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "fps": round(float(cap.get(cv2.CAP_PROP_FPS) or 0.0), 2),
+        "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+    }
+
+
+def _format_text(s: dict) -> str:
+    return (f"{s.get('fourcc') or 'default'} {s.get('width') or '?'}x{s.get('height') or '?'} "
+            f"@ {s.get('fps') or '?'} fps, buffer {s.get('buffer_size') or 'default'}")
+
+
+def _try_open(index: int, backend: str, settings: dict):
+    """Open, negotiate the format and read one test frame.
+
+    Returns (cap, granted settings) or (None, None).
+    """
+    api = getattr(cv2, f"CAP_{backend}", None)
+    if api is None:
+        return None, None
+    cap = cv2.VideoCapture(index, api)
+    if not cap.isOpened():
+        cap.release()
+        return None, None
+    granted = configure_capture(cap, settings)
+    ret, frame = cap.read()
+    if not ret or frame is None:
+        cap.release()
+        return None, None
+    print(f"Camera {index} ({backend}): requested {_format_text(settings)}; "
+          f"granted {_format_text(granted)}")
+    return cap, granted
+
+
+def _open_cached(config_path, settings: dict):
+    """Open the device the last probe recorded. (cap, description) or (None, "")."""
+    config = load_camera_config(config_path)
+    cached = config.get("probe")
+    if not isinstance(cached, dict) or cached.get("platform") != sys.platform:
+        return None, ""
+    index, backend = cached.get("index"), cached.get("backend")
+    if not isinstance(index, int) or not isinstance(backend, str):
+        return None, ""     # hand-edited or partial entry: let the probe rebuild it
+    cap, granted = _try_open(index, backend, settings)
+    if cap is None:
+        print(f"Cached camera {index} ({backend}) failed, probing...")
+        return None, ""
+    if any(cached.get(k) != v for k, v in granted.items()):
+        config["probe"] = dict(cached, **granted)
+        save_camera_config(config_path, config)
+    return cap, f"camera {index} ({backend}, cached) {_format_text(granted)}"
+
+
+def _probe(config_path, settings: dict, done: threading.Event):
+    try:
+        for index, backend in camera_candidates():
+            print(f"Trying to open camera {index} ({backend})...")
+            cap, granted = _try_open(index, backend, settings)
+            if cap is None:
+                continue
+            cap.release()       # the waiting callers reopen it as the cached device
+            config = load_camera_config(config_path)
+            config.setdefault("capture", dict(DEFAULT_CAPTURE))  # editable per station
+            config["probe"] = dict(index=index, backend=backend,
+                                   platform=sys.platform, **granted)
+            save_camera_config(config_path, config)
+            return
+        print("Camera probe found no working device")
+    except Exception as e:
+        print(f"Camera probe error: {e}")
+    finally:
+        done.set()
+
+
+def _start_probe(config_path, settings: dict) -> threading.Event:
+    """Run the full probe on a background thread (one at a time); its done event."""
+    global _probe_thread, _probe_done
+    with _PROBE_LOCK:
+        if _probe_thread is None or not _probe_thread.is_alive():
+            _probe_done = threading.Event()
+            _probe_thread = threading.Thread(target=_probe, name="camera-probe", daemon=True,
+                                             args=(config_path, settings, _probe_done))
+            _probe_thread.start()
+        return _probe_done
+
+
+def _probe_running() -> bool:
+    with _PROBE_LOCK:
+        return _probe_thread is not None and _probe_thread.is_alive()
+
+
+def open_camera(config_path=DEFAULT_CAMERA_CONFIG, should_stop=None):
+    """Open the station's webcam, cached device first, in the station's format.
+
+    If the cached device fails (or none is recorded) the full probe runs on
+    a shared background thread; callers only wait for it, polling
+    ``should_stop()``, and then open whatever it recorded.  Call from a
+    worker thread.  Returns (cap, description) or (None, "").
+    """
+    config = load_camera_config(config_path)
+    settings = dict(DEFAULT_CAPTURE, **config.get("capture", {}))
+    if not _probe_running():
+        with _OPEN_LOCK:
+            cap, desc = _open_cached(config_path, settings)
+        if cap is not None:
+            return cap, desc
+
+    done = _start_probe(config_path, settings)
+    while not done.wait(0.1):
+        if should_stop is not None and should_stop():
+            return None, ""
+    with _OPEN_LOCK:
+        return _open_cached(config_path, settings)
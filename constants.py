@@ -7,35 +7,13 @@ from PyQt6.QtGui import QPixmap, QIcon, QFont, QColor, QPainter, QPen, QBrush
 
 from theme import ModernTheme
 import storage
+from storage import canonical_exercise
 
 
 # ─────────────────────────── CONSTANTS ───────────────────────────────────────
 PATIENT_ASSETS_FOLDER = "patients_assets"
 
 
-def canonical_exercise(name: str) -> str:
-    """Normalize exercise names so 'Straight Leg Raise(s)' map to one key, etc."""
-    s = (name or "").strip().lower()
-
-    # common variations in your UI
-    s = s.replace("_", " ").replace("-", " ")
-    s = " ".join(s.split())
-
-    # Map variations → a stable canonical key used in JSON
-    aliases = {
-        "squats": "Squats",
-        "mini squats": "Squats",
-        "mini-squats": "Squats",
-        "seated knee bending": "Seated Knee Bending",
-        "straight leg raise": "Straight Leg Raises",
-        "straight leg raises": "Straight Leg Raises",
-        "straight leg raising": "Straight Leg Raises",
-        "initial assessment": "Initial Assessment",
-        "general": "General",
-    }
-    return aliases.get(s, name.strip() if name else "")
-
-
 # ─────────────────────────── GLOBAL DATA ──────────────────────────────────────
 PATIENT_DATA_STORE = {
     "merged_info": {}, "exercise_schedule": {}, "consent": {},
@@ -45,6 +23,56 @@ PATIENT_DATA_STORE = {
 # "patient" or "admin" — set at login, read everywhere that needs role-gating
 CURRENT_USER_ROLE = "patient"
 
+# Where MediaPipe Pose runs for the main camera: "thread" (inside the vision
+# QThread) or "process" (separate worker process, frees the GUI's GIL)
+VISION_INFERENCE_MODE = os.environ.get("KNEECONNECT_INFERENCE", "thread")
+
+# MediaPipe Pose model_complexity for the main camera (0 lite, 1 full, 2 heavy);
+# also the level prewarm.py builds during the start-up dialogs
+VISION_MODEL_COMPLEXITY = int(os.environ.get("KNEECONNECT_MODEL_COMPLEXITY", "1") or 1)
+
+# Frame width (px) used for pose inference; 0 = full camera resolution
+VISION_INFERENCE_WIDTH = int(os.environ.get("KNEECONNECT_INFERENCE_WIDTH", "0") or 0)
+
+# Run pose inference on a padded crop around the patient once they are found.
+# Off by default: each box move changes the coordinate frame under
+# MediaPipe's own tracking and landmark filter; KNEECONNECT_ROI_TRACKING=1 opts in
+VISION_ROI_TRACKING = os.environ.get("KNEECONNECT_ROI_TRACKING", "0") == "1"
+
+# Inference time budget (ms) for the model_complexity governor.  Off by
+# default (0 keeps the configured complexity); a station opts in with e.g.
+# KNEECONNECT_FRAME_BUDGET_MS=33, accepting that pose accuracy may drop mid-session
+VISION_FRAME_BUDGET_MS = float(os.environ.get("KNEECONNECT_FRAME_BUDGET_MS", "0") or 0)
+
+# Pose inference every Nth frame with landmark extrapolation in between.
+# Default 1 infers every frame; opt in with KNEECONNECT_INFERENCE_STRIDE=N
+# (fixed stride) or 0 (automatic from measured latency)
+VISION_INFERENCE_STRIDE = int(os.environ.get("KNEECONNECT_INFERENCE_STRIDE", "1") or 1)
+
+# Per-session landmark recording next to sessions.json: "float32" (exact, so
+# replay reproduces the live rep counts), "float16" (half the size, but may
+# flip angle-threshold crossings on replay), or "off"
+VISION_LANDMARK_LOG = os.environ.get("KNEECONNECT_LANDMARK_LOG", "float32")
+
+# Draw fps / inference ms / dropped frames on the camera feeds
+VISION_PERF_HUD = os.environ.get("KNEECONNECT_PERF_HUD", "0") == "1"
+
+# One Euro landmark smoothing between inference and the exercise evaluators.
+# Off by default: MediaPipe already smooths (smooth_landmarks=True) and a
+# second filter adds lag to the rep thresholds.  KNEECONNECT_SMOOTHING=1 opts
+# in; the cutoff (Hz, still joint) and beta (how fast it opens with speed)
+# are untuned starting points
+VISION_SMOOTHING = os.environ.get("KNEECONNECT_SMOOTHING", "0") == "1"
+VISION_SMOOTHING_MIN_CUTOFF = float(os.environ.get("KNEECONNECT_SMOOTHING_MIN_CUTOFF", "1.0"))
+VISION_SMOOTHING_BETA = float(os.environ.get("KNEECONNECT_SMOOTHING_BETA", "5.0"))
+
+# Per-station camera config: requested capture format ("capture": fourcc,
+# width, height, fps, buffer_size) and the last working device (index,
+# backend, granted format), cached so later starts skip the probe.  Kept next
+# to the app so the cache does not depend on the launch directory
+VISION_CAMERA_CONFIG = (os.environ.get("KNEECONNECT_CAMERA_CONFIG")
+                        or str(Path(__file__).resolve().parent / "camera.json"))
+
 
 # ─────────────────────────── SESSION MANAGER ──────────────────────────────────
 class SessionManager:
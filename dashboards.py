@@ -6,18 +6,17 @@ from pathlib import Path
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFrame, QSizePolicy, QInputDialog, QDialog,
-    QComboBox, QLineEdit, QMessageBox, QStackedWidget, QListWidget, QGridLayout,
+    QComboBox, QLineEdit, QStackedWidget, QListWidget, QGridLayout,
 )
-from PyQt6.QtCore import Qt, QUrl, pyqtSlot
-from PyQt6.QtGui import QImage, QPixmap, QFont
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PyQt6.QtMultimediaWidgets import QVideoWidget
-
-from vision_thread import CameraThread as VisionCameraThread
+from PyQt6.QtCore import Qt, QUrl, QEvent, QSize, pyqtSlot
+from PyQt6.QtGui import QPixmap
 from voice_thread import TTSWorker
 
 from theme import ModernTheme
 import constants
+import storage
+from frame_pool import fit_size
+from tracing import traced
 from constants import (
     PATIENT_ASSETS_FOLDER, PATIENT_DATA_STORE,
     canonical_exercise, SessionManager, create_app_icon,
@@ -168,7 +167,12 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(create_app_icon())
         self.resize(1200, 750)
 
-        self.thread_cam: VisionCameraThread | None = None
+        # Heavy subsystems load with the window that needs them (the doctor
+        # path never does): QtMultimedia here, cv2/MediaPipe with the camera
+        from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+        from PyQt6.QtMultimediaWidgets import QVideoWidget
+
+        self.thread_cam = None   # vision_thread.CameraThread
         self.is_running = False
         self.camera_on = True
         self._loop_video = True
@@ -188,6 +192,16 @@ class MainWindow(QMainWindow):
         self.session_right_correct = 0
         self.session_right_total = 0
 
+        # MediaPipe accuracy tier(s) used for the current session
+        self.model_complexity: int | None = None
+        self.session_complexity_levels: set[int] = set()
+
+        # Latest CameraThread perf snapshot (see perf.py)
+        self.perf_stats: dict = {}
+
+        # Landmark recording of the current session (see landmark_log.py)
+        self._landmark_recorder = None   # landmark_log.LandmarkRecorder
+
         central = QWidget()
         self.setCentralWidget(central)
         root = QVBoxLayout(central)
@@ -255,6 +269,7 @@ class MainWindow(QMainWindow):
         self.feed_label.setStyleSheet("color: #555; border: none;")
         self.feed_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.feed_label.setMinimumSize(480, 320)
+        self.feed_label.installEventFilter(self)   # report resizes to the vision thread
         cam_card_layout.addWidget(self.feed_label, stretch=1)
 
         instr_card = QFrame()
@@ -424,8 +439,24 @@ class MainWindow(QMainWindow):
     def start_camera_thread(self):
         if self.thread_cam is None:
             try:
+                from vision_thread import CameraThread as VisionCameraThread
+                from pose_engine import LandmarkSmoother
+                import vision_service
                 self.thread_cam = VisionCameraThread()
                 self.thread_cam.use_webcam = True
+                self.thread_cam.camera_config = constants.VISION_CAMERA_CONFIG
+                self.thread_cam.inference_mode = constants.VISION_INFERENCE_MODE
+                self.thread_cam.model_complexity = constants.VISION_MODEL_COMPLEXITY
+                self.thread_cam.inference_width = constants.VISION_INFERENCE_WIDTH
+                self.thread_cam.roi_tracking = constants.VISION_ROI_TRACKING
+                self.thread_cam.frame_budget_ms = constants.VISION_FRAME_BUDGET_MS
+                self.thread_cam.inference_stride = constants.VISION_INFERENCE_STRIDE
+                self.thread_cam.smoother = (
+                    LandmarkSmoother(constants.VISION_SMOOTHING_MIN_CUTOFF,
+                                     constants.VISION_SMOOTHING_BETA)
+                    if constants.VISION_SMOOTHING else None
+                )
+                self.thread_cam.show_hud = constants.VISION_PERF_HUD
                 self.thread_cam.process_enabled = False
                 self.thread_cam.item = ""
                 self.thread_cam.change_pixmap_signal.connect(self.update_image)
@@ -433,7 +464,13 @@ class MainWindow(QMainWindow):
                 self.thread_cam.side_reps_signal.connect(self.update_side_reps)
                 self.thread_cam.say_signal.connect(self.tts_worker.enqueue)
                 self.thread_cam.camera_status_signal.connect(self._on_camera_status)
+                self.thread_cam.complexity_signal.connect(self._on_complexity_changed)
+                self.thread_cam.perf_signal.connect(self._on_perf_stats)
+                self.thread_cam.recorder = self._landmark_recorder
+                self.thread_cam.set_display_size(*self._feed_device_size())
                 self.thread_cam.start()
+                # SetupPage (admin dashboard) subscribes to this camera and pose
+                vision_service.register(self.thread_cam)
                 self.lbl_status.setText("Camera starting...")
                 print("Vision camera thread started (webcam)")
             except Exception as e:
@@ -443,6 +480,8 @@ class MainWindow(QMainWindow):
 
     def stop_camera_thread(self):
         if self.thread_cam is not None:
+            import vision_service
+            vision_service.unregister(self.thread_cam)
             try:
                 self.thread_cam.change_pixmap_signal.disconnect()
             except Exception:
@@ -462,9 +501,29 @@ class MainWindow(QMainWindow):
             self.lbl_status.setText("Camera Active")
             self.feed_label.setText("")
         else:
+            import vision_service
+            vision_service.unregister(self.thread_cam)
             self.lbl_status.setText(status)
             self.feed_label.setText(status + "\nClick 'Camera Off' then 'Camera On' to retry")
 
+    @pyqtSlot(int)
+    def _on_complexity_changed(self, level: int):
+        self.model_complexity = level
+        if self.session_start_time is not None:
+            self.session_complexity_levels.add(level)
+
+    @pyqtSlot(dict)
+    def _on_perf_stats(self, stats: dict):
+        # Hover the feed to see where the frame time goes
+        self.perf_stats = stats
+        lines = [f"{stats['fps']:.1f} fps (camera {stats.get('capture_fps', 0):.1f}), "
+                 f"dropped {stats.get('dropped', 0)}, "
+                 f"not displayed {stats.get('display_dropped', 0)}, "
+                 f"GUI backlog {stats.get('display_overflow', 0)}"]
+        for name, st in stats["stages"].items():
+            lines.append(f"{name}: {st['mean_ms']:.1f} ms (p95 {st['p95_ms']:.1f})")
+        self.feed_label.setToolTip("\n".join(lines))
+
     def toggle_camera_power(self):
         self.camera_on = not self.camera_on
         if self.camera_on:
@@ -514,6 +573,7 @@ class MainWindow(QMainWindow):
             self.thread_cam.item = item
             self.thread_cam.reset_exercise()
 
+        self._finish_landmark_recording(discard=True)
         self.session_correct_reps = 0
         self.session_total_reps = 0
         self.session_min_knee = float("inf")
@@ -523,6 +583,7 @@ class MainWindow(QMainWindow):
         self.session_left_total = 0
         self.session_right_correct = 0
         self.session_right_total = 0
+        self.session_complexity_levels = set()
 
         self.lbl_reps.setText("—")
         self.lbl_knee_angle.setText("—")
@@ -594,9 +655,8 @@ class MainWindow(QMainWindow):
     def _on_media_error(self, error, error_string):
         print("Media player error:", error, error_string)
 
-    @pyqtSlot(QMediaPlayer.MediaStatus)
     def _on_media_status(self, status):
-        if status == QMediaPlayer.MediaStatus.EndOfMedia:
+        if status == type(self.media_player).MediaStatus.EndOfMedia:
             if self._loop_video and self.is_running:
                 self.media_player.setPosition(0)
                 self.media_player.play()
@@ -608,6 +668,9 @@ class MainWindow(QMainWindow):
         self.lbl_status.setText("Get ready — countdown starting…")
         if self.session_start_time is None:
             self.session_start_time = time.time()
+            if self.model_complexity is not None:
+                self.session_complexity_levels = {self.model_complexity}
+            self._start_landmark_recording()
         if self.thread_cam is not None:
             self.thread_cam.process_enabled = False
             self.thread_cam.countdown_state = "waiting"
@@ -640,6 +703,7 @@ class MainWindow(QMainWindow):
             self.thread_cam.process_enabled = False
             self.thread_cam.countdown_state = "idle"
 
+        landmarks_file = self._finish_landmark_recording()
         if self.session_start_time is not None and self.session_exercise:
             duration = time.time() - self.session_start_time
             now = datetime.now()
@@ -660,6 +724,12 @@ class MainWindow(QMainWindow):
                 session_data["left_total_reps"] = self.session_left_total
                 session_data["right_correct_reps"] = self.session_right_correct
                 session_data["right_total_reps"] = self.session_right_total
+            if self.model_complexity is not None:
+                session_data["model_complexity"] = self.model_complexity
+                if len(self.session_complexity_levels) > 1:
+                    session_data["model_complexity_levels"] = sorted(self.session_complexity_levels)
+            if landmarks_file:
+                session_data["landmarks_file"] = landmarks_file
             SessionManager.save(session_data)
 
         self.session_start_time = None
@@ -671,6 +741,7 @@ class MainWindow(QMainWindow):
         self.session_left_total = 0
         self.session_right_correct = 0
         self.session_right_total = 0
+        self.session_complexity_levels = set()
 
         self.lbl_reps.setText("—")
         self.lbl_knee_angle.setText("—")
@@ -682,56 +753,71 @@ class MainWindow(QMainWindow):
         except Exception:
             pass
 
+    # ── Landmark recording ──
+    def _start_landmark_recording(self):
+        self._finish_landmark_recording(discard=True)
+        dtype = constants.VISION_LANDMARK_LOG
+        if dtype not in ("float16", "float32") or not self.session_exercise:
+            return
+        info = PATIENT_DATA_STORE.get("merged_info", {})
+        started = datetime.now()
+        name = f"{started:%Y%m%d_%H%M%S}_{self.session_exercise.replace(' ', '_')}.kclm"
+        try:
+            path = storage.get_landmarks_folder(info) / name
+        except Exception as e:
+            print(f"Landmark recording disabled: {e}")
+            return
+        from landmark_log import LandmarkRecorder
+        self._landmark_recorder = LandmarkRecorder(path, {
+            "patient_id": storage.get_patient_id(info),
+            "exercise": self.session_exercise,
+            "started_at": started.isoformat(timespec="seconds"),
+        }, dtype=dtype)
+        if self.thread_cam is not None:
+            self.thread_cam.recorder = self._landmark_recorder
+
+    def _finish_landmark_recording(self, discard: bool = False) -> str:
+        """Close the session's recording; returns its file name ("" if none)."""
+        rec, self._landmark_recorder = self._landmark_recorder, None
+        if self.thread_cam is not None:
+            self.thread_cam.recorder = None
+        if rec is None:
+            return ""
+        rec.close(discard=discard or rec.frames == 0)
+        if discard or rec.frames == 0:
+            return ""
+        print(f"Landmarks recorded: {rec.frames} frames → {rec.path}")
+        return rec.path.name
+
     # ── Patient Dashboard / My Profile ──
     def open_patient_admin(self):
         if constants.CURRENT_USER_ROLE == "admin":
-            if self.thread_cam is not None:
-                try:
-                    self.thread_cam.change_pixmap_signal.disconnect()
-                except Exception:
-                    pass
-                self.thread_cam.stop()
-                self.thread_cam = None
-
+            # SetupPage shares the running camera thread (vision_service), so
+            # the camera stays open and the pose model stays loaded
             data = PATIENT_DATA_STORE.get("merged_info", {})
             dashboard = PatientDashboard(self)
             if data:
                 dashboard._load_patient(data)
             dashboard.exec()
-
-            if self.camera_on:
-                self.start_camera_thread()
-                if self.is_running and self.thread_cam is not None:
-                    self.thread_cam.process_enabled = True
         else:
             dlg = PatientDashboardLite(self)
             dlg.exec()
 
     def show_progress(self):
         if constants.CURRENT_USER_ROLE == "admin":
-            if self.thread_cam is not None:
-                try:
-                    self.thread_cam.change_pixmap_signal.disconnect()
-                except Exception:
-                    pass
-                self.thread_cam.stop()
-                self.thread_cam = None
             data = PATIENT_DATA_STORE.get("merged_info", {})
             dashboard = PatientDashboard(self)
             if data:
                 dashboard._load_patient(data)
             dashboard.list_widget.setCurrentRow(PatientDashboard.PAGE_REPORTS)
             dashboard.exec()
-            if self.camera_on:
-                self.start_camera_thread()
-                if self.is_running and self.thread_cam is not None:
-                    self.thread_cam.process_enabled = True
         else:
             dlg = ProgressDialog(self)
             dlg.exec()
 
     # ── Stats update ──
     @pyqtSlot(int, int, float, float)
+    @traced()
     def update_stats(self, correct_reps: int, total_reps: int, knee: float, hip: float):
         self.session_correct_reps = correct_reps
         self.session_total_reps = total_reps
@@ -744,6 +830,7 @@ class MainWindow(QMainWindow):
         self.lbl_hip_angle.setText(f"{hip:.1f}" if hip > 0 else "—")
 
     @pyqtSlot(int, int, int, int)
+    @traced()
     def update_side_reps(self, left_correct: int, left_total: int, right_correct: int, right_total: int):
         self.session_left_correct = left_correct
         self.session_left_total = left_total
@@ -752,20 +839,44 @@ class MainWindow(QMainWindow):
         self.lbl_left_reps.setText(f"{left_correct}/{left_total}")
         self.lbl_right_reps.setText(f"{right_correct}/{right_total}")
 
-    @pyqtSlot(QImage)
-    def update_image(self, qt_img: QImage):
-        if not self.camera_on:
+    @pyqtSlot(object)
+    @traced()
+    def update_image(self, frames):
+        frame = frames.take()
+        if frame is None:
             return
-        pixmap = QPixmap.fromImage(qt_img)
-        scaled = pixmap.scaled(
-            self.feed_label.size(),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation,
-        )
-        self.feed_label.setPixmap(scaled)
+        try:
+            if not self.camera_on:
+                return
+            pixmap = QPixmap.fromImage(frame.image)
+            iw, ih = pixmap.width(), pixmap.height()
+            tw, th = fit_size(iw, ih, *self._feed_device_size())
+            if abs(tw - iw) > 1 and abs(th - ih) > 1:
+                # Not pre-scaled yet (first frames after a resize) or upscaling
+                pixmap = pixmap.scaled(
+                    QSize(tw, th),
+                    Qt.AspectRatioMode.KeepAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation,
+                )
+            pixmap.setDevicePixelRatio(self.feed_label.devicePixelRatioF())
+            self.feed_label.setPixmap(pixmap)
+        finally:
+            frame.release()  # buffer goes back to the vision thread's pool
+
+    def _feed_device_size(self) -> tuple:
+        dpr = self.feed_label.devicePixelRatioF()
+        return round(self.feed_label.width() * dpr), round(self.feed_label.height() * dpr)
+
+    def eventFilter(self, obj, event):
+        if (obj is self.feed_label and event.type() == QEvent.Type.Resize
+                and getattr(self, "thread_cam", None) is not None):
+            # The vision thread scales frames to this size (INTER_AREA)
+            self.thread_cam.set_display_size(*self._feed_device_size())
+        return super().eventFilter(obj, event)
 
     def closeEvent(self, event):
         self.stop_camera_thread()
+        self._finish_landmark_recording()
         self.tts_worker.stop()
         try:
             self.media_player.stop()
@@ -0,0 +1,214 @@
+"""
+frame_pool.py — KneeConnect reusable frame buffers.
+
+The vision threads used to allocate (and copy) every frame several times on
+its way to the GUI.  A FramePool hands out preallocated, reference-counted
+numpy buffers instead; a buffer goes back to the pool once every holder has
+called release(), e.g. after the GUI has painted it.
+
+Each PooledFrame also caches a QImage view over its buffer (``frame.image``),
+created once per buffer, so emitting a frame to Qt copies nothing.
+
+DisplayScaler shrinks finished frames to the size of the widget showing
+them, on the vision thread, so the GUI thread only has to blit.
+
+FrameMailbox is the hand-off to the GUI: one slot, newest frame wins, and at
+most one queued signal in flight, so a busy GUI thread (a modal dialog, a
+report being built) costs dropped frames instead of a growing event queue.
+
+Public API:
+    FramePool(max_frames=4)
+        .acquire(shape) -> PooledFrame
+        .adopt(array)   -> PooledFrame
+    PooledFrame.array / .image / .retain() / .release()
+    DisplayScaler().set_size(w, h) / .scale(frame) -> PooledFrame
+    FrameMailbox().put(frame) -> bool / .take() -> PooledFrame | None
+        .delivered / .dropped
+    fit_size(w, h, box_w, box_h) -> (w, h)
+"""
+
+import threading
+
+import numpy as np
+
+
+class PooledFrame:
+    """A pooled numpy buffer with a reference count."""
+    __slots__ = ("array", "image", "_pool", "_refs")
+
+    def __init__(self, pool, array):
+        self.array = array
+        self.image = None      # QImage view over ``array``, set by the producer
+        self._pool = pool
+        self._refs = 0
+
+    def retain(self):
+        with self._pool._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        self._pool._release(self)
+
+
+class FramePool:
+    """Fixed-size pool of same-shaped uint8 frame buffers.
+
+    If every buffer is in use (a slow consumer holding on to frames), acquire()
+    hands out a fresh buffer that is not kept afterwards instead of blocking
+    the vision thread; ``overflow`` counts how often that happened.
+    """
+
+    def __init__(self, max_frames: int = 4):
+        self._lock = threading.Lock()
+        self._max = max_frames
+        self._shape = None
+        self._free: list[PooledFrame] = []
+        self._owned = 0          # pooled buffers currently allocated
+        self.overflow = 0
+
+    def _reset_shape(self, shape: tuple):
+        # Frame size changed: forget the old buffers, holders keep theirs alive
+        self._shape = shape
+        self._free.clear()
+        self._owned = 0
+
+    def acquire(self, shape: tuple) -> PooledFrame:
+        shape = tuple(shape)
+        with self._lock:
+            if shape != self._shape:
+                self._reset_shape(shape)
+            if self._free:
+                frame = self._free.pop()
+            elif self._owned < self._max:
+                self._owned += 1
+                frame = PooledFrame(self, np.empty(shape, dtype=np.uint8))
+            else:
+                self.overflow += 1
+                frame = PooledFrame(_UNPOOLED, np.empty(shape, dtype=np.uint8))
+            frame._refs = 1
+        return frame
+
+    def adopt(self, array) -> PooledFrame:
+        """Take ownership of an array allocated elsewhere (e.g. by cap.read)."""
+        with self._lock:
+            if array.shape != self._shape:
+                self._reset_shape(array.shape)
+            if self._owned < self._max:
+                self._owned += 1
+                frame = PooledFrame(self, array)
+            else:
+                frame = PooledFrame(_UNPOOLED, array)
+            frame._refs = 1
+        return frame
+
+    def _release(self, frame: PooledFrame):
+        with self._lock:
+            frame._refs -= 1
+            if frame._refs > 0:
+                return
+            if frame._refs < 0:
+                frame._refs = 0
+                return
+            if frame.array.shape == self._shape and len(self._free) < self._max:
+                self._free.append(frame)
+
+
+class _Unpooled:
+    """Owner of overflow buffers: they are simply dropped on release."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _release(self, frame):
+        with self._lock:
+            frame._refs = max(frame._refs - 1, 0)
+
+
+_UNPOOLED = _Unpooled()
+
+
+# ─── Display scaling ─────────────────────────────────────────────────────────
+
+def fit_size(w: int, h: int, box_w: int, box_h: int) -> tuple:
+    """Largest (w, h) with the frame's aspect ratio that fits in the box."""
+    scale = min(box_w / w, box_h / h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+class DisplayScaler:
+    """Downscales frames to the display widget's size with INTER_AREA.
+
+    The GUI calls set_size() from its own thread whenever the widget is
+    resized (a single tuple assignment, so no lock); the vision thread calls
+    scale() on every finished frame.  Frames are never upscaled here.
+    """
+
+    def __init__(self, max_frames: int = 4):
+        self.size = None              # (w, h) in device pixels, None = full frame
+        self._pool = FramePool(max_frames)
+
+    def set_size(self, w: int, h: int):
+        self.size = (int(w), int(h)) if w > 0 and h > 0 else None
+
+    def scale(self, frame: PooledFrame) -> PooledFrame:
+        """Return a display-sized frame; ``frame`` is released if replaced."""
+        size = self.size
+        if size is None:
+            return frame
+        h, w = frame.array.shape[:2]
+        tw, th = fit_size(w, h, *size)
+        if tw >= w or th >= h:
+            return frame
+        import cv2   # only vision threads scale; keeps this module light for the GUI
+        out = self._pool.acquire((th, tw) + frame.array.shape[2:])
+        cv2.resize(frame.array, (tw, th), dst=out.array, interpolation=cv2.INTER_AREA)
+        frame.release()
+        return out
+
+
+# ─── GUI hand-off ────────────────────────────────────────────────────────────
+
+class FrameMailbox:
+    """Credit-based, latest-wins hand-off from a vision thread to the GUI.
+
+    The producer calls put() and emits its signal (carrying the mailbox) only
+    when put() returns True, i.e. when the GUI has taken the previous frame.
+    Otherwise the waiting frame is replaced and released, so whatever the
+    consumer's speed, at most one frame waits here and one signal is queued.
+    The GUI slot calls take(), which hands over the newest frame and returns
+    the credit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._signalled = False
+        self.delivered = 0
+        self.dropped = 0          # frames replaced before the GUI took them
+
+    def put(self, frame: PooledFrame) -> bool:
+        """Store ``frame`` (ownership passes here); True = emit a wake-up."""
+        with self._lock:
+            old, self._frame = self._frame, frame
+            wake = not self._signalled
+            self._signalled = True
+            if old is not None:
+                self.dropped += 1
+        if old is not None:
+            old.release()
+        return wake
+
+    def take(self):
+        """Newest frame (the caller must release() it), or None."""
+        with self._lock:
+            frame, self._frame = self._frame, None
+            self._signalled = False
+            if frame is not None:
+                self.delivered += 1
+        return frame
+
+    def clear(self):
+        frame = self.take()
+        if frame is not None:
+            frame.release()
@@ -0,0 +1,130 @@
+"""
+import_report.py — KneeConnect start-up import report and budget check.
+
+Imports the entry point (everything knee_connect.py loads before the first
+dialog) in a fresh interpreter under ``-X importtime``, prints the slowest
+modules, and exits non-zero when the import time goes over budget or a
+module that should load on first use (MediaPipe, cv2, reportlab,
+QtMultimedia, the camera pipeline) was pulled in at start-up.
+tests/test_import_budget.py runs the same check under pytest; use this
+script to see where the time goes.  ``--repeat`` takes the best of several
+runs to separate code changes from disk-cache noise.
+
+Usage:
+    python import_report.py
+    python import_report.py --budget-ms 600 --top 30
+    python import_report.py --module dashboards --allow cv2 --allow vision_thread
+    python import_report.py --json imports.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Loaded on first use, never before the first dialog
+DEFERRED_MODULES = (
+    "mediapipe",
+    "cv2",
+    "reportlab",
+    "PyQt6.QtMultimedia",
+    "PyQt6.QtMultimediaWidgets",
+    "vision_thread",
+    "pose_engine",
+    "dashboards",
+    "reports",
+)
+
+DEFAULT_BUDGET_MS = float(os.environ.get("KNEECONNECT_IMPORT_BUDGET_MS", "1000"))
+
+
+def measure_imports(module: str = "knee_connect") -> dict:
+    """Import ``module`` in a clean interpreter; per-module times in ms."""
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True,
+                          cwd=Path(__file__).resolve().parent)
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, raw = line[len("import time:"):].split("|", 2)
+        name = raw.strip()
+        modules[name] = {
+            "self_ms": int(self_us) / 1000.0,
+            "cumulative_ms": int(cum_us) / 1000.0,
+            "depth": (len(raw) - len(raw.lstrip()) - 1) // 2,   # nesting level
+        }
+    return {
+        "module": module,
+        "total_ms": modules.get(module, {}).get("cumulative_ms", 0.0),
+        "wall_ms": round(wall_ms, 1),
+        "modules": modules,
+    }
+
+
+def check(report: dict, budget_ms: float, allow=()) -> list:
+    """Problems with ``report``: over budget, or deferred modules imported."""
+    problems = []
+    if report["total_ms"] > budget_ms:
+        problems.append(f"import {report['module']} took {report['total_ms']:.0f} ms "
+                        f"(budget {budget_ms:.0f} ms)")
+    for name in DEFERRED_MODULES:
+        if name in allow:
+            continue
+        if name in report["modules"]:
+            problems.append(f"{name} is imported at start-up "
+                            f"({report['modules'][name]['cumulative_ms']:.0f} ms)")
+    return problems
+
+
+def _print_report(report: dict, top: int):
+    print(f"import {report['module']}: {report['total_ms']:.1f} ms "
+          f"(interpreter wall time {report['wall_ms']:.0f} ms, "
+          f"{len(report['modules'])} modules)")
+    rows = sorted(report["modules"].items(), key=lambda kv: kv[1]["cumulative_ms"],
+                  reverse=True)[:top]
+    print(f"  {'cumulative':>10}  {'self':>8}  module")
+    for name, st in rows:
+        print(f"  {st['cumulative_ms']:8.1f}ms  {st['self_ms']:6.1f}ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KneeConnect start-up import report")
+    parser.add_argument("--module", default="knee_connect",
+                        help="module to import (default: the app entry point)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--top", type=int, default=20, help="slowest modules to list")
+    parser.add_argument("--allow", action="append", default=[],
+                        help="deferred module that may be imported (repeatable)")
+    parser.add_argument("--json", dest="json_out", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    reports = [measure_imports(args.module) for _ in range(max(1, args.repeat))]
+    report = min(reports, key=lambda r: r["total_ms"])
+    report["runs_ms"] = [round(r["total_ms"], 1) for r in reports]
+    _print_report(report, args.top)
+
+    problems = check(report, args.budget_ms, args.allow)
+    report["problems"] = problems
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+    if problems:
+        for p in problems:
+            print(f"FAIL: {p}")
+        sys.exit(1)
+    print(f"OK: within {args.budget_ms:.0f} ms, no deferred module imported")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,21 @@
 import sys
+import multiprocessing
 
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication, QDialog
 
 from theme import ModernTheme
 from constants import PATIENT_DATA_STORE, create_app_icon
 import constants
+import prewarm
 from dialogs import TermsDialog, RoleSelectionDialog, PatientLoginDialog
-from dashboards import MainWindow, AdminPatientBrowser
+# dashboards (and through it the camera, pose and report modules) is imported
+# once the role is known, so the first dialog appears without waiting for it
 
 
 # ─────────────────────────── ENTRY POINT ─────────────────────────────────────
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # pose worker process in frozen builds
     app = QApplication(sys.argv)
     app.setStyleSheet(ModernTheme.STYLESHEET)
     app.setWindowIcon(create_app_icon())
@@ -20,6 +25,12 @@ if __name__ == "__main__":
     terms.show()
     terms.raise_()
     terms.activateWindow()
+
+    # Build + warm the pose model and check the camera while the dialogs are
+    # up; queued so the warm-up's imports start once the first dialog is on screen
+    QTimer.singleShot(0, lambda: prewarm.start(constants.VISION_INFERENCE_MODE,
+                                               constants.VISION_MODEL_COMPLEXITY,
+                                               constants.VISION_CAMERA_CONFIG))
     if terms.exec() != QDialog.DialogCode.Accepted:
         sys.exit()
 
@@ -36,6 +47,8 @@ if __name__ == "__main__":
     # ── Doctor / Physiotherapist path ──
     if role == RoleSelectionDialog.DOCTOR:
         constants.CURRENT_USER_ROLE = "admin"
+        prewarm.discard()   # no live exercise view on this path
+        from dashboards import AdminPatientBrowser
         browser = AdminPatientBrowser()
         browser.show()
         browser.raise_()
@@ -54,6 +67,7 @@ if __name__ == "__main__":
     if patient_data:
         PATIENT_DATA_STORE["merged_info"] = patient_data
 
+    from dashboards import MainWindow
     window = MainWindow()
     window.show()
     window.raise_()
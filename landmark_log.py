@@ -0,0 +1,162 @@
+"""
+landmark_log.py — KneeConnect compact per-frame landmark recordings.
+
+CameraThread appends every processed frame's (33, 4) landmark array and
+timestamp to a small binary file next to the patient's sessions.json
+(``patients_assets/<pid>/landmarks/*.kclm``).  replay.py feeds them back
+through the exercise evaluators without a camera or MediaPipe.
+
+File layout:
+    b"KCLM" | uint32 header length | JSON header (space padded) | records
+
+Each record is a fixed-size numpy structured row
+(t float64, side uint8, lm (33, 4) float16|float32); frames without a pose
+are stored as NaN.  Readers memory-map the record block, so opening a long
+session is instant and a file cut short by a crash loses at most its last
+partial record.
+
+Public API:
+    LandmarkRecorder(path, meta, dtype="float32")
+        .write(t, landmarks_or_None, frame_shape, target_leg) / .close()
+        .frames
+    LandmarkLog(path)
+        .meta / .t / .side / .aspect / .landmarks(i) / .stack() / len()
+"""
+
+import json
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from utils import NUM_LANDMARKS
+
+MAGIC = b"KCLM"
+VERSION = 1
+
+# target_leg <-> side byte stored per record
+SIDE_CODES = {"auto": 0, "right": 1, "left": 2}
+SIDE_NAMES = {v: k for k, v in SIDE_CODES.items()}
+
+
+def record_dtype(dtype: str = "float32") -> np.dtype:
+    return np.dtype([
+        ("t", "<f8"),
+        ("side", "u1"),
+        ("lm", np.dtype(dtype).newbyteorder("<"), (NUM_LANDMARKS, 4)),
+    ])
+
+
+# ─── Writer ──────────────────────────────────────────────────────────────────
+
+class LandmarkRecorder:
+    """Appends landmark records to ``path``; safe to close from another thread.
+
+    The file (and its header, which needs the frame size) is created on the
+    first write, so a session that never processed a frame leaves nothing
+    behind.
+    """
+
+    def __init__(self, path, meta: dict = None, dtype: str = "float32"):
+        self.path = Path(path)
+        self.meta = dict(meta or {})
+        self._dtype = record_dtype(dtype)
+        self._row = np.zeros(1, dtype=self._dtype)
+        self._lock = threading.Lock()
+        self._file = None
+        self._closed = False
+        self._t0 = None
+        self.frames = 0
+
+    def _open(self, frame_shape: tuple):
+        header = dict(self.meta)
+        header.update({
+            "version": VERSION,
+            "dtype": self._dtype["lm"].base.name,
+            "frame_width": int(frame_shape[1]),
+            "frame_height": int(frame_shape[0]),
+        })
+        raw = json.dumps(header).encode("utf-8")
+        # Pad so the record block starts 16-byte aligned
+        raw += b" " * (-(len(MAGIC) + 4 + len(raw)) % 16)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb")
+        self._file.write(MAGIC + struct.pack("<I", len(raw)) + raw)
+
+    def write(self, t: float, landmarks, frame_shape: tuple, target_leg: str = "auto"):
+        """Append one frame; ``t`` is any monotonic clock (stored from 0)."""
+        with self._lock:
+            if self._closed:
+                return
+            if self._file is None:
+                self._open(frame_shape)
+                self._t0 = t
+            row = self._row
+            row["t"][0] = t - self._t0
+            row["side"][0] = SIDE_CODES.get(target_leg, 0)
+            row["lm"][0] = np.nan if landmarks is None else landmarks
+            self._file.write(self._row.tobytes())
+            self.frames += 1
+
+    def close(self, discard: bool = False):
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if discard and self.path.exists():
+                self.path.unlink()
+
+
+# ─── Reader ──────────────────────────────────────────────────────────────────
+
+def _read_header(path: Path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        (size,) = struct.unpack("<I", f.read(4))
+        meta = json.loads(f.read(size).decode("utf-8"))
+    return meta, len(MAGIC) + 4 + size
+
+
+class LandmarkLog:
+    """Read-only, memory-mapped view of a recording."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta, offset = _read_header(self.path)
+        dtype = record_dtype(self.meta.get("dtype", "float32"))
+        count = (self.path.stat().st_size - offset) // dtype.itemsize
+        if count > 0:
+            self._records = np.memmap(self.path, dtype=dtype, mode="r",
+                                      offset=offset, shape=(count,))
+        else:
+            self._records = np.zeros(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def t(self) -> np.ndarray:
+        return self._records["t"]
+
+    @property
+    def side(self) -> np.ndarray:
+        return self._records["side"]
+
+    @property
+    def aspect(self) -> float:
+        h = self.meta.get("frame_height") or 1
+        return (self.meta.get("frame_width") or h) / h
+
+    def landmarks(self, i: int):
+        """Frame ``i`` as a (33, 4) float32 array, or None if no pose was found."""
+        lm = self._records["lm"][i].astype(np.float32)
+        if np.isnan(lm[0, 0]):
+            return None
+        return lm
+
+    def stack(self) -> np.ndarray:
+        """Every frame as one (N, 33, 4) float32 array (NaN = no pose)."""
+        return self._records["lm"].astype(np.float32)
@@ -0,0 +1,153 @@
+"""
+overlay.py — KneeConnect cached text overlays.
+
+Antialiased cv2.putText is expensive at the large scales the feeds use
+(rep counter, countdown digits with a shadow pass), and the same strings are
+drawn frame after frame.  TextSpriteCache rasterizes each distinct
+(text, font, scale, colour, thickness, shadow) once into a small
+premultiplied colour + alpha sprite, and later frames only alpha-blend that
+sprite into place.  The cache is an LRU bounded by ``max_sprites``.
+
+put_text() takes the same arguments as cv2.putText (``org`` is the baseline
+start) and draws identically, so call sites swap over one to one.  Text that
+changes every frame (angle readouts, side-debug values, the perf HUD) passes
+``cache=False``: it would miss on every frame and evict the stable labels,
+and rendering a sprite costs more than a plain cv2.putText.
+
+Public API:
+    put_text(frame, text, org, font_scale, color, thickness=1,
+             line_type=cv2.LINE_AA, shadow=None, font=cv2.FONT_HERSHEY_SIMPLEX,
+             cache=True)
+    put_text_centered(frame, text, font_scale, thickness, color, shadow=None)
+    TextSpriteCache(max_sprites=256) / SPRITES (shared instance)
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class _Sprite:
+    __slots__ = ("premul", "inv_alpha", "dx", "dy")
+
+    def __init__(self, premul, inv_alpha, dx, dy):
+        self.premul = premul          # (h, w, 3) float32 colour * alpha (+0.5 rounding)
+        self.inv_alpha = inv_alpha    # (h, w, 1) float32 1 - alpha
+        self.dx = dx                  # top-left offset from the putText org
+        self.dy = dy
+
+
+def _render(text, font, scale, color, thickness, line_type, shadow) -> _Sprite | None:
+    sx, sy, s_extra, s_color = shadow if shadow else (0, 0, 0, (0, 0, 0))
+    (tw, th), base = cv2.getTextSize(text, font, scale, thickness + s_extra)
+    pad = thickness + s_extra + 2
+    w = tw + 2 * pad + abs(sx)
+    h = th + base + 2 * pad + abs(sy)
+    org = (pad + max(-sx, 0), pad + th + max(-sy, 0))
+
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.putText(mask, text, org, font, scale, 255, thickness, line_type)
+    a_text = mask.astype(np.float32) * (1.0 / 255.0)
+    premul = a_text[..., None] * np.asarray(color[:3], dtype=np.float32)
+    alpha = a_text
+    if shadow:
+        mask[:] = 0
+        cv2.putText(mask, text, (org[0] + sx, org[1] + sy), font, scale, 255,
+                    thickness + s_extra, line_type)
+        a_shadow = mask.astype(np.float32) * (1.0 / 255.0) * (1.0 - a_text)
+        premul += a_shadow[..., None] * np.asarray(s_color[:3], dtype=np.float32)
+        alpha = a_text + a_shadow
+
+    ys, xs = np.nonzero(alpha)
+    if not len(ys):
+        return None
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    premul = np.ascontiguousarray(premul[y0:y1, x0:x1]) + 0.5
+    inv_alpha = np.ascontiguousarray(1.0 - alpha[y0:y1, x0:x1, None])
+    return _Sprite(premul, inv_alpha, int(x0) - org[0], int(y0) - org[1])
+
+
+_MISSING = object()
+
+
+class TextSpriteCache:
+    """LRU of rendered text sprites; safe to share between vision threads."""
+
+    def __init__(self, max_sprites: int = 256):
+        self._max = max_sprites
+        self._sprites = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def get(self, text, font, scale, color, thickness, line_type, shadow):
+        """The sprite for these settings, or None if the text draws nothing."""
+        key = (text, font, scale, tuple(color), thickness, line_type, shadow)
+        with self._lock:
+            sprite = self._sprites.get(key, _MISSING)
+            if sprite is not _MISSING:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+            self.misses += 1
+        # None (nothing visible to draw) is cached too, so it is a hit next time
+        sprite = _render(text, font, scale, color, thickness, line_type, shadow)
+        with self._lock:
+            self._sprites[key] = sprite
+            while len(self._sprites) > self._max:
+                self._sprites.popitem(last=False)
+        return sprite
+
+
+SPRITES = TextSpriteCache()
+
+
+def _blend(frame, sprite: _Sprite, x: int, y: int):
+    h, w = sprite.inv_alpha.shape[:2]
+    fh, fw = frame.shape[:2]
+    fx0, fy0 = max(x, 0), max(y, 0)
+    fx1, fy1 = min(x + w, fw), min(y + h, fh)
+    if fx0 >= fx1 or fy0 >= fy1:
+        return
+    sx, sy = fx0 - x, fy0 - y
+    region = frame[fy0:fy1, fx0:fx1]
+    blended = region * sprite.inv_alpha[sy:sy + fy1 - fy0, sx:sx + fx1 - fx0]
+    blended += sprite.premul[sy:sy + fy1 - fy0, sx:sx + fx1 - fx0]
+    np.copyto(region, blended, casting="unsafe")
+
+
+def put_text(frame, text, org, font_scale, color, thickness=1, line_type=cv2.LINE_AA,
+             shadow=None, font=cv2.FONT_HERSHEY_SIMPLEX, cache=True):
+    """cv2.putText replacement backed by the sprite cache.
+
+    ``shadow`` is (dx, dy, extra_thickness, colour): a second pass drawn
+    underneath, offset by (dx, dy) — e.g. (3, 3, 2, (0, 0, 0)).
+    ``cache=False`` draws straight with cv2.putText, for volatile text.
+    """
+    if frame is None or not text:
+        return
+    if not cache:
+        x, y = int(org[0]), int(org[1])
+        if shadow:
+            sx, sy, s_extra, s_color = shadow
+            cv2.putText(frame, text, (x + sx, y + sy), font, font_scale, s_color,
+                        thickness + s_extra, line_type)
+        cv2.putText(frame, text, (x, y), font, font_scale, color, thickness, line_type)
+        return
+    sprite = SPRITES.get(text, font, font_scale, color, thickness, line_type, shadow)
+    if sprite is not None:
+        _blend(frame, sprite, int(org[0]) + sprite.dx, int(org[1]) + sprite.dy)
+
+
+def put_text_centered(frame, text, font_scale, thickness, color, shadow=None,
+                      font=cv2.FONT_HERSHEY_SIMPLEX):
+    """Draw ``text`` centred on the frame (countdown digits, GO!)."""
+    h, w = frame.shape[:2]
+    (tw, th), _ = cv2.getTextSize(text, font, font_scale, thickness)
+    put_text(frame, text, ((w - tw) // 2, (h + th) // 2), font_scale, color,
+             thickness, shadow=shadow, font=font)
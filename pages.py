@@ -11,11 +11,11 @@ from PyQt6.QtWidgets import (
     QFileDialog, QSpinBox, QInputDialog, QApplication,
 )
 from PyQt6.QtCore import Qt, pyqtSlot, QDate
-from PyQt6.QtGui import QImage, QPixmap, QDoubleValidator, QFont
+from PyQt6.QtGui import QPixmap, QDoubleValidator
 
 from theme import ModernTheme
 from constants import (
-    PATIENT_ASSETS_FOLDER, PATIENT_DATA_STORE,
+    PATIENT_ASSETS_FOLDER, PATIENT_DATA_STORE, VISION_PERF_HUD,
     canonical_exercise, create_app_icon,
 )
 from widgets import (
@@ -24,9 +24,10 @@ from widgets import (
 )
 from dialogs import DatePickerDialog
 
-import cv2
 import storage
-import reports
+from tracing import traced
+# cv2, reports (reportlab) and vision_service are imported where they are used,
+# so opening a dialog never pays for them
 
 
 # ─────────────────────────── PATIENT INFO FORM ───────────────────────────────
@@ -321,10 +322,10 @@ class SetupPage(QWidget):
         self.video_slots: list[VideoSlotWidget] = []
         self.recording = False
         self.current_frame_bgr = None
-        self._video_writer = None
+        self._current_bgr_frame = None   # PooledFrame backing current_frame_bgr
         self._recording_path: str | None = None
         self._thumb_path: str | None = None
-        self._record_frame_count = 0
+        self._record_secs = 0
         self.thread: SimpleCameraThread | None = None
 
         self._knee_samples: list[float] = []
@@ -584,6 +585,7 @@ class SetupPage(QWidget):
                 return {}
         return {}
 
+    @traced(cat="storage")
     def _write_patient_json(self, pid: str, data: dict) -> bool:
         jp = Path(PATIENT_ASSETS_FOLDER) / pid / "patient.json"
         jp.parent.mkdir(parents=True, exist_ok=True)
@@ -952,13 +954,21 @@ class SetupPage(QWidget):
             self._hip_samples.append(hip)
 
     @pyqtSlot(object)
-    def _on_bgr_frame(self, bgr):
-        self.current_frame_bgr = bgr
-        if self._video_writer and self._video_writer.isOpened():
-            self._video_writer.write(bgr)
-            self._record_frame_count += 1
-            if self._record_frame_count % 20 == 0:
-                secs = self._record_frame_count // 20
+    def _on_bgr_frame(self, frames):
+        # Hold the latest pooled frame (thumbnail source), recycle the previous one
+        frame = frames.take()
+        if frame is None:
+            return
+        if self._current_bgr_frame is not None:
+            self._current_bgr_frame.release()
+        self._current_bgr_frame = frame
+        self.current_frame_bgr = frame.array
+        # The clip itself is written on the vision thread (thread.clip_recorder)
+        if self.recording and self.thread is not None:
+            recorder = self.thread.clip_recorder
+            secs = int(recorder.frames / recorder.fps)
+            if secs != self._record_secs:
+                self._record_secs = secs
                 self.lbl_rec_status.setText(f"⏺  {secs}s recorded")
 
     def toggle_recording(self):
@@ -968,7 +978,7 @@ class SetupPage(QWidget):
             self._stop_recording()
 
     def _start_recording(self):
-        if self.current_frame_bgr is None:
+        if self.current_frame_bgr is None or self.thread is None:
             QMessageBox.warning(self, "No Camera", "Camera not ready. Please wait.")
             return
 
@@ -992,16 +1002,13 @@ class SetupPage(QWidget):
         video_path = vid_dir / filename
 
         h, w = self.current_frame_bgr.shape[:2]
-        fourcc = cv2.VideoWriter_fourcc(*"MJPG")
-        self._video_writer = cv2.VideoWriter(str(video_path), fourcc, 20.0, (w, h))
-        if not self._video_writer.isOpened():
+        if not self.thread.clip_recorder.start(video_path, (w, h)):
             QMessageBox.warning(self, "Error", "Could not open VideoWriter. Check codec support.")
-            self._video_writer = None
             return
 
         self._recording_path = str(video_path)
         self._thumb_path = str(thumb_dir / f"{Path(filename).stem}.jpg")
-        self._record_frame_count = 0
+        self._record_secs = 0
         self._knee_samples.clear()
         self._hip_samples.clear()
         self.recording = True
@@ -1014,9 +1021,10 @@ class SetupPage(QWidget):
         self.lbl_rec_status.setText("⏺  Recording...")
 
     def _stop_recording(self):
-        if self._video_writer:
-            self._video_writer.release()
-            self._video_writer = None
+        secs = 0
+        if self.thread is not None:
+            recorder = self.thread.clip_recorder
+            secs = int(recorder.stop() / recorder.fps)
         self.recording = False
 
         self.btn_rec.setText("⏺  START RECORDING")
@@ -1024,11 +1032,11 @@ class SetupPage(QWidget):
             f"background-color: {ModernTheme.ACCENT_SUCCESS}; color: white; "
             "font-weight: bold; border-radius: 6px;"
         )
-        secs = self._record_frame_count // 20
         self.lbl_rec_status.setText(f"Saved ({secs}s)")
 
         if self.current_frame_bgr is not None and self._thumb_path:
             try:
+                import cv2
                 thumb = cv2.resize(self.current_frame_bgr, (160, 100))
                 cv2.imwrite(self._thumb_path, thumb)
             except Exception as e:
@@ -1070,10 +1078,16 @@ class SetupPage(QWidget):
 
     def start_camera(self):
         if self.thread is None:
-            self.thread = SimpleCameraThread()
+            import vision_service
+            # Share the main window's camera and pose model when it is running
+            shared = vision_service.current()
+            self.thread = vision_service.SetupPreview(shared) if shared else SimpleCameraThread()
+            self.thread.show_hud = VISION_PERF_HUD
             self.thread.change_pixmap_signal.connect(self.update_image)
             self.thread.bgr_frame_signal.connect(self._on_bgr_frame)
             self.thread.angles_signal.connect(self._on_angles)
+            self.thread.set_display_size(*self.cam_frame.device_size())
+            self.cam_frame.resized.connect(self.thread.set_display_size)
             self.thread.start()
         self.refresh_patient()
 
@@ -1085,16 +1099,25 @@ class SetupPage(QWidget):
                 self.thread.change_pixmap_signal.disconnect()
                 self.thread.bgr_frame_signal.disconnect()
                 self.thread.angles_signal.disconnect()
+                self.cam_frame.resized.disconnect(self.thread.set_display_size)
             except Exception:
                 pass
             self.thread.stop()
             self.thread = None
+        # Hand the last frame back to its pool (the shared camera keeps running)
+        if self._current_bgr_frame is not None:
+            self._current_bgr_frame.release()
+            self._current_bgr_frame = None
+        self.current_frame_bgr = None
         self.lbl_setup_knee.setText("—")
         self.lbl_setup_hip.setText("—")
 
-    @pyqtSlot(QImage)
-    def update_image(self, qt_img: QImage):
-        self.cam_frame.set_image(qt_img)
+    @pyqtSlot(object)
+    @traced()
+    def update_image(self, frames):
+        frame = frames.take()
+        if frame is not None:
+            self.cam_frame.set_image(frame)
 
 
 # ─────────────────────────── EXERCISE FORM ───────────────────────────────────
@@ -1620,6 +1643,7 @@ class ReportsPage(QWidget):
         month = self._selected_date.month()
         self._lbl_monthly_status.setText("Generating…")
         QApplication.processEvents()
+        import reports
         out = reports.generate_monthly_report(self._patient_data, sessions, year, month)
         if out:
             self._lbl_monthly_status.setText(f"Saved: {out.name}")
@@ -1640,6 +1664,7 @@ class ReportsPage(QWidget):
         sessions = storage.load_sessions(self._patient_data)
         self._lbl_full_status.setText("Generating…")
         QApplication.processEvents()
+        import reports
         out = reports.generate_full_record(merged, sessions)
         if out:
             self._lbl_full_status.setText(f"Saved: {out.name}")
@@ -1863,6 +1888,7 @@ class PatientFilePage(QWidget):
         merged = {**self._patient_data, **pj}
         sessions = storage.load_sessions(self._patient_data)
         QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        import reports
         out = reports.generate_full_record(merged, sessions)
         QApplication.restoreOverrideCursor()
         if out:
@@ -0,0 +1,111 @@
+"""
+perf.py — KneeConnect lightweight vision-loop instrumentation.
+
+StageTimer keeps rolling per-stage timings for a camera loop (capture,
+colour conversion, inference, exercise update, overlay, emit) at the cost of
+one perf_counter() call per stage.  About once a second the loop publishes a
+snapshot (fps, per-stage mean/p95, dropped frames) on a Qt signal and can
+draw a small HUD on the frame, so a slow camera (capture wait), a slow CPU
+(inference) and a blocked GUI (frames piling up unpainted) can be told apart
+without a profiler.  With tracing on (tracing.py) every lap is also a span.
+
+Public API:
+    StageTimer(stages, window=120, interval=1.0)
+        .begin() / .lap(stage, record=True) / .add(stage, ms) / .end()
+        .due() -> bool;  .snapshot(**extra) -> dict
+    draw_hud(frame, stats, inference_stage="inference")
+    percentile(values, pct)
+"""
+
+import time
+from collections import deque
+
+import cv2
+
+import tracing
+from overlay import put_text
+
+# Stage names used by CameraThread / SimpleCameraThread
+VISION_STAGES = ("capture", "convert", "inference", "exercise", "overlay", "emit")
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class StageTimer:
+    """Rolling per-stage latency for one loop; not thread-safe (one owner)."""
+
+    def __init__(self, stages=VISION_STAGES, window: int = 120, interval: float = 1.0):
+        self.stages = tuple(stages)
+        self._samples = {name: deque(maxlen=window) for name in self.stages}
+        self._totals = deque(maxlen=window)
+        self._interval = interval
+        self._mark = self._frame_start = time.perf_counter()
+        self._last_snapshot = self._mark
+        self._frames = 0           # frames since the last snapshot
+        self.last = None           # most recent snapshot, for the HUD
+
+    def begin(self):
+        self._mark = self._frame_start = time.perf_counter()
+
+    def lap(self, stage: str, record: bool = True):
+        """Close ``stage`` at now; ``record=False`` just moves the mark on."""
+        now = time.perf_counter()
+        if record:
+            self._samples[stage].append((now - self._mark) * 1000.0)
+        if tracing.ENABLED:
+            tracing.complete(stage, self._mark, now)
+        self._mark = now
+
+    def add(self, stage: str, ms: float):
+        """Record a duration measured elsewhere (e.g. in the pose worker)."""
+        self._samples[stage].append(ms)
+
+    def end(self):
+        self._totals.append((time.perf_counter() - self._frame_start) * 1000.0)
+        self._frames += 1
+
+    def due(self) -> bool:
+        return time.perf_counter() - self._last_snapshot >= self._interval
+
+    def snapshot(self, **extra) -> dict:
+        """Stats since the last snapshot (fps) and over the rolling window."""
+        now = time.perf_counter()
+        elapsed = now - self._last_snapshot
+        stats = {
+            "fps": round(self._frames / elapsed, 1) if elapsed > 0 else 0.0,
+            "frame_ms": round(sum(self._totals) / len(self._totals), 2) if self._totals else 0.0,
+            "stages": {
+                name: {
+                    "mean_ms": round(sum(v) / len(v), 2),
+                    "p95_ms": round(percentile(v, 95), 2),
+                }
+                for name, v in self._samples.items() if v
+            },
+        }
+        stats.update(extra)
+        self._frames = 0
+        self._last_snapshot = now
+        self.last = stats
+        return stats
+
+
+def draw_hud(frame, stats: dict, inference_stage: str = "inference"):
+    """Draw 'fps | inference ms | dropped' in the top-right corner of ``frame``."""
+    if not stats:
+        return
+    inf = stats["stages"].get(inference_stage)
+    text = (f"{stats['fps']:.1f} fps | inf "
+            f"{inf['mean_ms']:.1f} ms | drop {stats.get('dropped', 0)}"
+            if inf else f"{stats['fps']:.1f} fps | drop {stats.get('dropped', 0)}")
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 1)
+    x = frame.shape[1] - tw - 12
+    cv2.rectangle(frame, (x - 6, 8), (x + tw + 6, 16 + th), (0, 0, 0), -1)
+    put_text(frame, text, (x, 12 + th), 0.55, (255, 255, 255), 1, cache=False)
@@ -0,0 +1,627 @@
+"""
+pose_engine.py — KneeConnect pose inference engines.
+
+Two interchangeable engines sit behind the same ``process(rgb)`` call used by
+CameraThread.  Both return the pose as a (33, 4) float32 landmark array
+(x, y, z, visibility — see utils.py), or None when nobody was found:
+
+    LocalPoseEngine    MediaPipe Pose running in the calling thread
+    ProcessPoseEngine  MediaPipe Pose owned by a separate process; frames go
+                       in through a preallocated shared-memory ring and the
+                       landmarks come back as a compact (33, 4) float32 array
+
+Running inference in its own process keeps it off the GIL the Qt GUI, the
+QPixmap scaling and the TTS thread are all competing for.
+
+InferenceScaler downscales frames once before inference.  MediaPipe returns
+normalized landmarks, so results from the small frame map straight back onto
+the full-resolution display frame.
+
+RoiTracker crops inference to a padded box around the previous frame's
+landmarks and maps the results back to full-frame coordinates.
+
+ComplexityGovernor watches rolling inference latency and picks MediaPipe's
+model_complexity (0, 1 or 2) to stay inside a frame-time budget.  Engines
+build the next Pose graph in the background and swap when it is ready.
+
+InferenceScheduler and LandmarkExtrapolator let inference run only on some
+frames (every Nth, or whenever the worker process is free); the frames in
+between get landmarks extrapolated at constant velocity.
+
+LandmarkSmoother is a One Euro filter over all 33 landmarks at once: heavy
+smoothing while a joint is still (no jitter across the rep thresholds),
+little lag while it moves.
+
+Public API:
+    create_pose_engine(mode="thread", model_complexity=1) -> engine
+    engine.process(rgb) -> (33, 4) float32 landmark array, or None
+    engine.set_complexity(level) / engine.model_complexity
+    engine.close()
+    ProcessPoseEngine.submit(rgb) / .poll() -> (ready, landmarks) / .busy
+    ComplexityGovernor(budget_ms, level).record(latency_ms) -> new level | None
+    InferenceScaler(width).scale(rgb) -> frame to run inference on
+    RoiTracker().crop(rgb) -> (frame, box);  .update(landmarks, shape, box)
+    LandmarkSmoother(min_cutoff, beta)(landmarks, t) -> smoothed;  .reset()
+"""
+
+import multiprocessing as mp_proc
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from utils import landmarks_to_array, X, Y, Z, VIS
+
+RING_SLOTS = 3
+
+POSE_OPTIONS = dict(
+    static_image_mode=False,
+    smooth_landmarks=True,
+    min_detection_confidence=0.5,
+    min_tracking_confidence=0.5,
+)
+
+
+# ─── Inference resolution ────────────────────────────────────────────────────
+
+class InferenceScaler:
+    """Downscale frames to ``width`` pixels wide (aspect kept) for inference.
+
+    ``width`` of 0, or any width >= the frame width, passes frames through.
+    The output buffer is reused between calls.
+    """
+
+    def __init__(self, width: int = 0):
+        self.width = width
+        self._buf = None
+
+    def scale(self, rgb):
+        h, w = rgb.shape[:2]
+        if not self.width or self.width >= w:
+            return rgb
+        out_w = int(self.width)
+        out_h = max(1, round(h * out_w / w))
+        shape = (out_h, out_w, rgb.shape[2])
+        if self._buf is None or self._buf.shape != shape:
+            self._buf = np.empty(shape, dtype=np.uint8)
+        cv2.resize(rgb, (out_w, out_h), dst=self._buf, interpolation=cv2.INTER_AREA)
+        return self._buf
+
+
+# ─── ROI tracking ────────────────────────────────────────────────────────────
+
+class RoiTracker:
+    """Keep inference on a padded box around the patient.
+
+    After a detection, the next frame is cropped to the landmarks' bounding
+    box plus ``padding`` (fraction of the box size on each side).  The box is
+    only moved when the landmarks leave its inner margin, so the crop stays
+    the same size for long stretches and MediaPipe's own tracking is not
+    disturbed every frame.  Tracking falls back to the full frame when the
+    pose is lost or the padded box reaches the frame edge.
+    """
+
+    def __init__(self, padding: float = 0.25, min_visibility: float = 0.5,
+                 min_size: int = 96):
+        self.padding = padding
+        self.min_visibility = min_visibility
+        self.min_size = min_size
+        self.box = None        # (x0, y0, x1, y1) in full-frame pixels
+        self._buf = None
+
+    def reset(self):
+        self.box = None
+
+    def crop(self, rgb):
+        """Return (frame for inference, box used or None for the full frame)."""
+        if self.box is None:
+            return rgb, None
+        x0, y0, x1, y1 = self.box
+        view = rgb[y0:y1, x0:x1]
+        # MediaPipe needs a contiguous image; reuse the buffer while the box is stable
+        if self._buf is None or self._buf.shape != view.shape:
+            self._buf = np.empty(view.shape, dtype=np.uint8)
+        np.copyto(self._buf, view)
+        return self._buf, self.box
+
+    def update(self, landmarks, frame_shape, box):
+        """Map ``landmarks`` (in place) from ``box`` to the full frame, then move the box."""
+        if landmarks is None:
+            self.box = None
+            return
+        h, w = frame_shape[:2]
+
+        if box is not None:
+            x0, y0, x1, y1 = box
+            sx, sy = (x1 - x0) / w, (y1 - y0) / h
+            landmarks[:, X] = landmarks[:, X] * sx + x0 / w
+            landmarks[:, Y] = landmarks[:, Y] * sy + y0 / h
+            landmarks[:, Z] *= sx
+
+        visible = landmarks[landmarks[:, VIS] >= self.min_visibility]
+        if len(visible) < 4:
+            self.box = None
+            return
+
+        bx0, by0 = visible[:, :2].min(axis=0).tolist()
+        bx1, by1 = visible[:, :2].max(axis=0).tolist()
+        bx0, bx1 = bx0 * w, bx1 * w
+        by0, by1 = by0 * h, by1 * h
+
+        # Landmarks still comfortably inside the current box: keep it
+        if self.box is not None:
+            cx0, cy0, cx1, cy1 = self.box
+            mx = (cx1 - cx0) * self.padding * 0.25
+            my = (cy1 - cy0) * self.padding * 0.25
+            if bx0 >= cx0 + mx and bx1 <= cx1 - mx and by0 >= cy0 + my and by1 <= cy1 - my:
+                return
+
+        pad_x = max((bx1 - bx0) * self.padding, self.min_size / 2)
+        pad_y = max((by1 - by0) * self.padding, self.min_size / 2)
+        nx0, ny0 = int(bx0 - pad_x), int(by0 - pad_y)
+        nx1, ny1 = int(bx1 + pad_x), int(by1 + pad_y)
+
+        if nx0 <= 0 or ny0 <= 0 or nx1 >= w or ny1 >= h:
+            self.box = None     # patient fills the frame or is at the edge
+        else:
+            self.box = (nx0, ny0, nx1, ny1)
+
+
+# ─── Complexity governor ─────────────────────────────────────────────────────
+
+class ComplexityGovernor:
+    """Choose model_complexity from rolling inference latency, with hysteresis.
+
+    Steps down when the mean latency over ``window`` frames exceeds the
+    budget.  Steps up only when the latency predicted for the heavier model
+    (``COST_RATIO`` times the current one) fits in ``UP_MARGIN`` of the
+    budget.  After every switch the window restarts and no further switch is
+    considered for ``cooldown`` seconds; a step up that immediately has to be
+    undone doubles that cooldown so the level does not oscillate.
+    """
+
+    COST_RATIO = 2.0     # rough latency ratio between adjacent complexity levels
+    UP_MARGIN = 0.7
+
+    def __init__(self, budget_ms: float = 33.0, level: int = 1, window: int = 30,
+                 min_level: int = 0, max_level: int = 2, cooldown: float = 5.0):
+        self.budget_ms = budget_ms
+        self.level = level
+        self.min_level = min_level
+        self.max_level = max_level
+        self._samples = deque(maxlen=window)
+        self._base_cooldown = cooldown
+        self._cooldown = cooldown
+        self._last_switch = time.perf_counter()
+        self._last_direction = 0
+
+    def record(self, latency_ms: float):
+        """Add one inference latency; return the new level if it should change."""
+        self._samples.append(latency_ms)
+        if len(self._samples) < self._samples.maxlen:
+            return None
+        if time.perf_counter() - self._last_switch < self._cooldown:
+            return None
+
+        mean = sum(self._samples) / len(self._samples)
+        if mean > self.budget_ms and self.level > self.min_level:
+            # an upgrade that did not fit: back off and wait longer next time
+            self._cooldown = self._cooldown * 2 if self._last_direction > 0 else self._base_cooldown
+            return self._switch(self.level - 1, -1)
+        if (self.level < self.max_level
+                and mean * self.COST_RATIO < self.budget_ms * self.UP_MARGIN):
+            return self._switch(self.level + 1, +1)
+        return None
+
+    def _switch(self, level: int, direction: int) -> int:
+        self.level = level
+        self._last_direction = direction
+        self._last_switch = time.perf_counter()
+        self._samples.clear()
+        return level
+
+
+# ─── Frame skipping ──────────────────────────────────────────────────────────
+
+class InferenceScheduler:
+    """Run inference on every ``stride``-th frame.
+
+    ``stride`` 0 means automatic: stride = ceil(inference ms / frame interval),
+    so the display keeps up with the camera, capped so inference still runs at
+    least MIN_INFERENCE_HZ — the exercise state machines only need joint
+    angles at roughly 10-15 Hz to count reps correctly.
+    """
+
+    MIN_INFERENCE_HZ = 10.0
+    EMA_ALPHA = 0.1
+
+    def __init__(self, stride: int = 1):
+        self.auto = stride == 0
+        self.stride = max(int(stride), 1)
+        self._count = 0
+        self._infer_ms = None
+
+    def tick(self) -> bool:
+        """Call once per frame; True if this frame should run inference."""
+        self._count += 1
+        if self._count >= self.stride:
+            self._count = 0
+            return True
+        return False
+
+    def record(self, infer_ms: float, frame_interval_ms: float):
+        """Feed one measured inference latency and the camera frame interval."""
+        if self._infer_ms is None:
+            self._infer_ms = infer_ms
+        else:
+            self._infer_ms += self.EMA_ALPHA * (infer_ms - self._infer_ms)
+        if not self.auto or frame_interval_ms <= 0:
+            return
+        wanted = -(-self._infer_ms // frame_interval_ms)          # ceil
+        cap = max(1, int((1000.0 / frame_interval_ms) / self.MIN_INFERENCE_HZ))
+        self.stride = int(min(max(wanted, 1), cap))
+
+
+class LandmarkExtrapolator:
+    """Constant-velocity prediction from the last two inferred poses."""
+
+    MAX_HORIZON = 0.25     # seconds; beyond this hold the last pose
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._prev = None      # (t, array)
+        self._last = None
+
+    def observe(self, arr, t: float):
+        if arr is None:
+            self.reset()
+            return
+        self._prev, self._last = self._last, (t, arr)
+
+    def predict(self, t: float):
+        """Return a (33, 4) array extrapolated to ``t``, or None without history."""
+        if self._last is None:
+            return None
+        t1, a1 = self._last
+        if self._prev is None:
+            return a1
+        t0, a0 = self._prev
+        dt = t1 - t0
+        if dt <= 0:
+            return a1
+        k = min(t - t1, self.MAX_HORIZON) / dt
+        out = a1 + (a1 - a0) * k
+        out[:, 3] = a1[:, 3]           # visibility is not extrapolated
+        return out
+
+
+# ─── Temporal smoothing ──────────────────────────────────────────────────────
+
+class LandmarkSmoother:
+    """One Euro filter (Casiez et al., CHI 2012), vectorized over (33, 3).
+
+    The cutoff frequency rises with the (filtered) speed of each coordinate:
+    ``min_cutoff`` (Hz) sets how hard a still joint is smoothed, ``beta`` how
+    quickly the filter opens up when it moves (landmark units are normalized
+    frame coordinates per second).  Visibility passes through unfiltered.
+    reset() may be called from another thread; the next pose starts fresh.
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 5.0, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._state = None     # (t, x_hat, dx_hat), swapped as one tuple
+
+    def reset(self):
+        self._state = None
+
+    @staticmethod
+    def _alpha(dt: float, cutoff):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, arr, t: float):
+        """Smoothed copy of ``arr`` at time ``t`` (seconds); None resets."""
+        if arr is None:
+            self._state = None
+            return None
+        state = self._state
+        x = arr[:, :3]
+        if state is None or t <= state[0]:
+            self._state = (t, x.copy(), np.zeros_like(x))
+            return arr
+        t0, x_prev, dx_prev = state
+        dt = t - t0
+        a_d = self._alpha(dt, self.d_cutoff)
+        dx_hat = dx_prev + a_d * ((x - x_prev) / dt - dx_prev)
+        a = self._alpha(dt, self.min_cutoff + self.beta * np.abs(dx_hat))
+        x_hat = x_prev + a * (x - x_prev)
+        self._state = (t, x_hat, dx_hat)
+        out = arr.copy()
+        out[:, :3] = x_hat
+        return out
+
+
+# ─── In-thread engine ────────────────────────────────────────────────────────
+
+def _build_pose(model_complexity: int):
+    import mediapipe as mp
+    return mp.solutions.pose.Pose(model_complexity=model_complexity, **POSE_OPTIONS)
+
+
+class LocalPoseEngine:
+    """MediaPipe Pose in the caller's thread (the original behaviour)."""
+
+    def __init__(self, model_complexity: int = 1):
+        self.model_complexity = model_complexity
+        self._pose = _build_pose(model_complexity)
+        self._lock = threading.Lock()
+        self._pending = None       # (level, Pose) built in the background
+        self._building = None      # level currently being built
+
+    def set_complexity(self, level: int):
+        """Build a Pose for ``level`` in the background; swapped in when ready."""
+        if level == self.model_complexity or level == self._building:
+            return
+        self._building = level
+        threading.Thread(target=self._prebuild, args=(level,), daemon=True).start()
+
+    def _prebuild(self, level: int):
+        try:
+            pose = _build_pose(level)
+        except Exception as e:
+            print(f"Pose rebuild (complexity {level}) failed: {e}")
+            self._building = None
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending[1].close()
+            self._pending = (level, pose)
+
+    def _swap_if_ready(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        level, pose = pending
+        old, self._pose = self._pose, pose
+        self.model_complexity = level
+        if self._building == level:
+            self._building = None
+        old.close()
+
+    def process(self, rgb):
+        if self._pending is not None:
+            self._swap_if_ready()
+        rgb.flags.writeable = False
+        try:
+            res = self._pose.process(rgb)
+        finally:
+            rgb.flags.writeable = True
+        if not res.pose_landmarks:
+            return None
+        return landmarks_to_array(res.pose_landmarks.landmark)
+
+    def reset(self):
+        """Forget landmark tracking state, e.g. before an unrelated clip."""
+        self._swap_if_ready()
+        self._pose.reset()
+
+    def close(self):
+        self._swap_if_ready()
+        try:
+            self._pose.close()
+        except Exception:
+            pass
+
+
+# ─── Out-of-process engine ───────────────────────────────────────────────────
+
+def _attach_ring(name: str, slot_bytes: int, slots: int):
+    shm = shared_memory.SharedMemory(name=name)
+    # The parent owns (and unlinks) the segment; stop this process's resource
+    # tracker from unlinking it again on exit.
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    ring = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=shm.buf)
+    return shm, ring
+
+
+def _pose_worker_main(requests, results, model_complexity: int):
+    """Entry point of the inference process. Owns the only Pose instance."""
+    # LocalPoseEngine already knows how to pre-build and swap graphs
+    engine = LocalPoseEngine(model_complexity)
+    results.put(("ready", None, None))
+    level = model_complexity
+
+    shm = None
+    ring = None
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        kind = msg[0]
+
+        if kind == "ring":
+            _, name, slot_bytes, slots = msg
+            ring = None
+            if shm is not None:
+                shm.close()
+            shm, ring = _attach_ring(name, slot_bytes, slots)
+
+        elif kind == "complexity":
+            engine.set_complexity(msg[1])
+
+        elif kind == "frame":
+            _, seq, slot, shape = msg
+            out = None
+            try:
+                # Frames (ROI crops especially) vary in size; each one sits at
+                # the start of its fixed-size slot
+                frame = ring[slot, :int(np.prod(shape))].reshape(shape)
+                out = engine.process(frame)
+            except Exception as e:
+                print(f"Pose worker error: {e}")
+            if engine.model_complexity != level:
+                level = engine.model_complexity
+                results.put(("complexity", None, level))
+            results.put(("result", seq, out))
+
+    ring = None
+    if shm is not None:
+        shm.close()
+    engine.close()
+
+
+class ProcessPoseEngine:
+    """MediaPipe Pose in a child process fed through shared memory."""
+
+    START_TIMEOUT = 60.0     # first graph build can be slow on clinic PCs
+    RESULT_TIMEOUT = 5.0
+
+    def __init__(self, model_complexity: int = 1, slots: int = RING_SLOTS):
+        self.model_complexity = model_complexity
+        self._slots = slots
+        # spawn: forking a process that already runs Qt threads is unsafe
+        ctx = mp_proc.get_context("spawn")
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._proc = ctx.Process(
+            target=_pose_worker_main,
+            args=(self._requests, self._results, model_complexity),
+            daemon=True,
+        )
+        self._proc.start()
+
+        self._shm = None
+        self._ring = None          # (slots, slot_bytes) uint8 view of the segment
+        self._slot_bytes = 0
+        self._seq = 0
+        self._inflight = None      # seq of the frame the worker is processing
+        self._stalled = False      # a timeout was logged; quiet until a result arrives
+        self._inflight_t = 0.0
+
+        kind, _, _ = self._results.get(timeout=self.START_TIMEOUT)
+        if kind != "ready":
+            raise RuntimeError("Pose worker failed to start")
+
+    def _ensure_ring(self, nbytes: int):
+        # Sized once for the largest frame (the full inference frame, sent
+        # before the ROI tracker locks on); smaller crops reuse the same slots.
+        # Only a bigger frame, e.g. after a resolution change, reallocates.
+        if nbytes <= self._slot_bytes:
+            return
+        self._release_ring()
+        self._shm = shared_memory.SharedMemory(create=True, size=self._slots * nbytes)
+        self._ring = np.ndarray((self._slots, nbytes), dtype=np.uint8, buffer=self._shm.buf)
+        self._slot_bytes = nbytes
+        self._requests.put(("ring", self._shm.name, nbytes, self._slots))
+
+    def _release_ring(self):
+        self._ring = None
+        self._slot_bytes = 0
+        if self._shm is not None:
+            try:
+                self._shm.close()
+                self._shm.unlink()
+            except Exception:
+                pass
+            self._shm = None
+
+    @property
+    def busy(self) -> bool:
+        """True while a submitted frame has not been answered yet."""
+        if self._inflight is not None and time.perf_counter() - self._inflight_t > self.RESULT_TIMEOUT:
+            self._timed_out()
+        return self._inflight is not None
+
+    def _timed_out(self):
+        # Abandon the frame; logged once until the worker answers again
+        if not self._stalled:
+            print(f"Pose worker error: no result within {self.RESULT_TIMEOUT:.0f} s "
+                  f"(frame {self._inflight})")
+            self._stalled = True
+        self._inflight = None
+
+    def submit(self, rgb) -> bool:
+        """Queue ``rgb`` for inference without waiting. False if the worker is busy."""
+        if self.busy:
+            return False
+        self._ensure_ring(rgb.nbytes)
+        self._seq += 1
+        slot = self._seq % self._slots
+        self._ring[slot, :rgb.nbytes].reshape(rgb.shape)[...] = rgb
+        self._inflight = self._seq
+        self._inflight_t = time.perf_counter()
+        self._requests.put(("frame", self._seq, slot, rgb.shape))
+        return True
+
+    def poll(self, timeout: float = 0.0):
+        """Return (ready, landmarks) for the submitted frame.
+
+        ``ready`` is False while the worker is still busy; once True,
+        ``landmarks`` is the (33, 4) array or None if no pose was found.
+        """
+        while self._inflight is not None:
+            try:
+                if timeout:
+                    kind, got, arr = self._results.get(timeout=timeout)
+                else:
+                    kind, got, arr = self._results.get_nowait()
+            except queue.Empty:
+                return False, None
+            if kind == "complexity":
+                self.model_complexity = arr
+            elif kind == "result" and got == self._inflight:
+                self._inflight = None
+                self._stalled = False
+                return True, arr
+        return False, None
+
+    def process(self, rgb):
+        if self._inflight is not None:
+            self.poll(timeout=self.RESULT_TIMEOUT)   # finish any async frame first
+            self._inflight = None
+        self.submit(rgb)
+        ready, landmarks = self.poll(timeout=self.RESULT_TIMEOUT)
+        if not ready:
+            self._timed_out()
+        return landmarks
+
+    def set_complexity(self, level: int):
+        """Ask the worker to pre-build and switch to ``level``."""
+        if level != self.model_complexity:
+            self._requests.put(("complexity", level))
+
+    def close(self):
+        try:
+            self._requests.put(None)
+            self._proc.join(timeout=3.0)
+            if self._proc.is_alive():
+                self._proc.terminate()
+        except Exception as e:
+            print(f"Pose worker shutdown error: {e}")
+        self._release_ring()
+
+
+def create_pose_engine(mode: str = "thread", model_complexity: int = 1):
+    """Build the pose engine for ``mode`` ("thread" or "process").
+
+    Falls back to the in-thread engine if the worker process cannot start.
+    """
+    if mode == "process":
+        try:
+            return ProcessPoseEngine(model_complexity)
+        except Exception as e:
+            print(f"Pose worker unavailable ({e}), using in-thread inference")
+    return LocalPoseEngine(model_complexity)
@@ -0,0 +1,106 @@
+"""
+prewarm.py — KneeConnect start-up warm-up of the pose model and camera.
+
+Building the MediaPipe graph and running its first inference takes seconds,
+and so can a camera probe.  knee_connect.py calls start() once the first
+dialog is on screen (queued with QTimer.singleShot, so the warm-up's imports
+never delay that first paint), with the configured model_complexity, so both
+happen in the background while the user reads the terms and logs in.
+CameraThread then takes the ready engine instead of building its own, and
+its camera open hits the cached device (capture.py).
+
+Public API:
+    start(mode, model_complexity, camera_config=None)
+    take_pose_engine(mode, model_complexity, timeout=30.0) -> engine | None
+    discard()      close an engine nobody took (e.g. the doctor path)
+"""
+
+import atexit
+import threading
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_engine = None
+_key = None          # (mode, model_complexity) being warmed
+_started = False
+_discarded = False
+
+
+def _warm_pose(mode: str, model_complexity: int):
+    global _engine
+    engine = None
+    try:
+        # Imported here: this thread also takes cv2 / MediaPipe's import cost
+        # off the GUI thread while the first dialog is up
+        import numpy as np
+        from pose_engine import create_pose_engine
+        engine = create_pose_engine(mode, model_complexity)
+        # The first process() call initializes the graph; a blank frame is enough
+        engine.process(np.zeros((256, 256, 3), dtype=np.uint8))
+        if hasattr(engine, "reset"):
+            engine.reset()
+        print(f"Pose model pre-warmed ({mode}, complexity {model_complexity})")
+    except Exception as e:
+        print(f"Pose pre-warm failed: {e}")
+        if engine is not None:
+            engine.close()
+        engine = None
+    with _lock:
+        if _discarded:
+            stale = engine          # nobody will take it any more
+        else:
+            _engine, stale = engine, None
+    if stale is not None:
+        stale.close()
+    _ready.set()
+
+
+def _warm_camera(camera_config: str):
+    # Validates (or rebuilds) the cached device so the real open is fast
+    from capture import open_camera
+    cap, desc = open_camera(camera_config)
+    if cap is not None:
+        cap.release()
+        print(f"Camera pre-checked: {desc}")
+
+
+def start(mode: str, model_complexity: int, camera_config: str = None):
+    """Warm the pose engine (and check the camera) on background threads."""
+    global _key, _started
+    with _lock:
+        if _started or _discarded:
+            return
+        _started = True
+        _key = (mode, model_complexity)
+    atexit.register(discard)   # e.g. the user quits at the login dialog
+    threading.Thread(target=_warm_pose, args=(mode, model_complexity),
+                     name="prewarm-pose", daemon=True).start()
+    if camera_config:
+        threading.Thread(target=_warm_camera, args=(camera_config,),
+                         name="prewarm-camera", daemon=True).start()
+
+
+def take_pose_engine(mode: str, model_complexity: int, timeout: float = 30.0):
+    """The pre-warmed engine if it matches, waiting for it if still building.
+
+    Each engine is handed out once; returns None if nothing was pre-warmed
+    for this (mode, model_complexity).
+    """
+    global _engine
+    with _lock:
+        if not _started or _key != (mode, model_complexity):
+            return None
+    if not _ready.wait(timeout):
+        return None
+    with _lock:
+        engine, _engine = _engine, None
+    return engine
+
+
+def discard():
+    global _engine, _discarded
+    with _lock:
+        _discarded = True
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.close()
@@ -0,0 +1,115 @@
+"""
+replay.py — KneeConnect deterministic replay of recorded landmark sessions.
+
+Feeds a landmark recording (see landmark_log.py) back through the exercise
+evaluators from utils.py: no camera, no MediaPipe, no drawing.  The same
+file and code always produce the same counts, so a reported false rep can
+be reproduced frame by frame, and a change to utils.py can be checked
+against real sessions in milliseconds.
+
+Usage:
+    python replay.py patients_assets/P001/landmarks/20250101_101500_Squats.kclm
+    python replay.py patients_assets/P001/landmarks/*.kclm --json replay.json
+    python replay.py session.kclm --exercise "Seated Knee Bending" --side left
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from landmark_log import LandmarkLog, SIDE_NAMES
+from storage import canonical_exercise
+from utils import EXERCISE_EVALUATORS, resolve_sides
+
+
+def replay(log, exercise: str = "", preferred_side: str = "") -> dict:
+    """Run one recording through a fresh evaluator.
+
+    ``log`` is a LandmarkLog or a path.  ``exercise`` and ``preferred_side``
+    override what was recorded (the per-frame leg choice by default).
+    Returns rep counts plus one event per counted repetition.
+    """
+    if not isinstance(log, LandmarkLog):
+        log = LandmarkLog(log)
+    exercise = canonical_exercise(exercise or log.meta.get("exercise", ""))
+    if exercise not in EXERCISE_EVALUATORS:
+        raise ValueError(f"No evaluator for exercise '{exercise}'")
+
+    evaluator = EXERCISE_EVALUATORS[exercise]()
+    aspect = log.aspect
+    t = np.asarray(log.t)
+    legs = np.asarray(log.side)
+    stack = log.stack()
+    detected = np.flatnonzero(~np.isnan(stack[:, 0, 0]))
+
+    events = []
+    last_total = last_correct = 0
+    t0 = time.perf_counter()
+    for i in detected:
+        lm = stack[i]
+        leg = preferred_side or SIDE_NAMES.get(int(legs[i]), "auto")
+        evaluator.update(lm, None, leg, resolve_sides(lm, leg), aspect)
+        if evaluator.total_rep_count != last_total:
+            events.append({
+                "frame": int(i),
+                "t": round(float(t[i]), 3),
+                "correct": evaluator.rep_count != last_correct,
+                "side": getattr(evaluator, "current_side", None),
+            })
+        last_total = evaluator.total_rep_count
+        last_correct = evaluator.rep_count
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+    result = {
+        "file": str(log.path),
+        "exercise": exercise,
+        "frames": len(log),
+        "detected_frames": int(len(detected)),
+        "duration_s": round(float(t[-1]), 1) if len(t) else 0.0,
+        "rep_count": evaluator.rep_count,
+        "total_rep_count": evaluator.total_rep_count,
+        "rep_events": events,
+        "replay_ms": round(elapsed_ms, 2),
+    }
+    if exercise == "Straight Leg Raises":
+        for key in ("left_rep_count", "left_total_rep_count",
+                    "right_rep_count", "right_total_rep_count"):
+            result[key] = getattr(evaluator, key)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded landmark sessions")
+    parser.add_argument("files", nargs="+", help="*.kclm landmark recordings")
+    parser.add_argument("--exercise", choices=sorted(EXERCISE_EVALUATORS),
+                        help="score as this exercise instead of the recorded one")
+    parser.add_argument("--side", choices=("auto", "left", "right"),
+                        help="override the recorded leg selection")
+    parser.add_argument("--events", action="store_true", help="print every counted rep")
+    parser.add_argument("--json", dest="json_out", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for path in args.files:
+        try:
+            r = replay(path, args.exercise or "", args.side or "")
+        except Exception as e:
+            print(f"{path}: ERROR {e}")
+            continue
+        results.append(r)
+        print(f"{path}: {r['exercise']}  reps {r['rep_count']}/{r['total_rep_count']}  "
+              f"{r['detected_frames']}/{r['frames']} frames  {r['replay_ms']:.1f} ms")
+        if args.events:
+            for ev in r["rep_events"]:
+                mark = "ok " if ev["correct"] else "bad"
+                print(f"    {mark} t={ev['t']:8.3f}s  frame {ev['frame']}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
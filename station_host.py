@@ -0,0 +1,407 @@
+"""
+station_host.py — KneeConnect headless multi-station host.
+
+Drives several exercise stations from one process without Qt: every station
+has its own capture source (webcam index, or a video file standing in for
+one), its own exercise evaluator from utils.py, optional landmark smoother,
+patient and session.  Pose inference for all stations runs on a shared set
+of worker processes, and finished sessions are saved with
+storage.save_session exactly like the desktop app does.
+
+Scheduling: stations are split into shards, one per worker process, and a
+station always runs on its shard's worker.  That worker keeps the station's
+MediaPipe Pose, which sees every one of the station's inferred frames in
+order, so tracking state neither mixes between stations nor skips around
+(and there is one Pose graph per station, not one per worker and station).
+Each station's capture keeps only its newest frame
+(capture.LatestFrameGrabber); a worker takes one frame at a time,
+round-robin across its shard's stations, so a fast camera cannot build a
+queue — frames it produces while its previous frame is being inferred are
+dropped and counted.
+
+This trades fairness for tracking: round-robin is only fair within a
+shard, not across the host.  With more stations than workers, and a count
+that does not divide evenly, stations on the larger shards get a smaller
+share of inference.  A station whose frames infer slowly (bigger --width,
+more people in view) slows only its shard-mates, and an idle worker never
+takes frames from a busy shard, so one finished or disconnected station
+leaves its worker's time unused while others drop frames.  With one
+worker per station (the default up to CPUs - 1) none of this applies.
+
+Every ``--report`` seconds the host prints, per station, processed fps,
+capture fps, inference ms, frames in flight / waiting (queue depth), dropped
+frames and rep counts; ``--status`` also writes that to a JSON file.
+
+Stations file (JSON list):
+    [{"name": "bay1", "source": 0, "exercise": "Squats", "side": "auto",
+      "patient": {"id": "P001", "name": "Jane Doe"}},
+     {"name": "bay2", "source": "clips/knee_bend.mp4",
+      "exercise": "Seated Knee Bending", "patient": {"id": "P002"}, "loop": true}]
+
+Usage:
+    python station_host.py stations.json --workers 3
+    python station_host.py --video clips/squat.mp4 --video clips/slr.mp4 --duration 60
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import time
+from datetime import datetime
+
+import cv2
+
+import storage
+from capture import LatestFrameGrabber, DEFAULT_CAPTURE, camera_candidates, configure_capture
+from pose_engine import LocalPoseEngine, LandmarkSmoother
+from utils import EXERCISE_EVALUATORS, resolve_sides
+
+DEFAULT_WIDTH = 640     # inference width; frames are pickled to the workers
+
+
+# ─── Worker ──────────────────────────────────────────────────────────────────
+
+_poses = {}             # station name -> LocalPoseEngine, for this worker's shard
+_model_complexity = 1
+
+
+def _init_worker(model_complexity: int):
+    global _model_complexity
+    # One process per core already; keep OpenCV from oversubscribing
+    cv2.setNumThreads(1)
+    _model_complexity = model_complexity
+
+
+def _infer(task):
+    """Pose for one station frame: (station, landmarks or None, inference ms)."""
+    station, rgb = task
+    engine = _poses.get(station)
+    if engine is None:
+        engine = _poses[station] = LocalPoseEngine(_model_complexity)
+    t0 = time.perf_counter()
+    lm = engine.process(rgb)
+    return station, lm, (time.perf_counter() - t0) * 1000.0
+
+
+# ─── Station ─────────────────────────────────────────────────────────────────
+
+class Station:
+    """One exercise station: capture, per-patient exercise state and session."""
+
+    def __init__(self, name: str, source, exercise: str, patient: dict,
+                 side: str = "auto", loop: bool = False, width: int = DEFAULT_WIDTH,
+                 capture_settings: dict = None, smoothing: bool = False):
+        exercise = storage.canonical_exercise(exercise)
+        if exercise not in EXERCISE_EVALUATORS:
+            raise ValueError(f"{name}: no evaluator for exercise '{exercise}'")
+        self.name = name
+        self.source = source
+        self.exercise = exercise
+        self.patient = dict(patient or {})
+        self.side = side
+        self.width = width
+        self.evaluator = EXERCISE_EVALUATORS[exercise]()
+        self.smoother = LandmarkSmoother() if smoothing else None
+
+        self._cap = self._open(source, capture_settings)
+        is_file = not isinstance(source, int)
+        pace = (self._cap.get(cv2.CAP_PROP_FPS) or 30.0) if is_file else 0.0
+        self.grabber = LatestFrameGrabber(self._cap, loop_video=is_file and loop,
+                                          pace_fps=pace)
+
+        self.in_flight = False
+        self.aspect = 1.0
+        self.started = None
+        self.finished_at = None
+        self.processed = 0
+        self.detected = 0
+        self.min_knee = float("inf")
+        self.max_knee = 0.0
+        self.infer_ms = 0.0          # smoothed
+        self._window_frames = 0      # processed since the last report
+
+    @staticmethod
+    def _open(source, capture_settings):
+        if isinstance(source, int):
+            # Explicit index per station; the platform's preferred backend
+            backend = camera_candidates((source,))[0][1]
+            cap = cv2.VideoCapture(source, getattr(cv2, f"CAP_{backend}"))
+            if cap.isOpened():
+                configure_capture(cap, dict(DEFAULT_CAPTURE, **(capture_settings or {})))
+        else:
+            cap = cv2.VideoCapture(str(source))
+        if not cap.isOpened():
+            cap.release()
+            raise IOError(f"could not open source {source!r}")
+        return cap
+
+    def start(self):
+        self.started = time.time()
+        self.grabber.start()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def next_task(self):
+        """(name, rgb) for the pool if a new frame is waiting, else None."""
+        ok, frame = self.grabber.read(timeout=0)
+        if not ok:
+            if self.grabber.finished and not self.in_flight:
+                self.finished_at = time.time()
+            return None
+        bgr = frame.array
+        h, w = bgr.shape[:2]
+        self.aspect = w / h
+        if self.width and w > self.width:
+            bgr = cv2.resize(bgr, (self.width, max(1, round(h * self.width / w))),
+                             interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)   # fresh array, safe to pickle later
+        frame.release()
+        self.in_flight = True
+        return self.name, rgb
+
+    def on_result(self, lm, infer_ms: float):
+        self.in_flight = False
+        self.processed += 1
+        self._window_frames += 1
+        self.infer_ms = infer_ms if not self.infer_ms else self.infer_ms + 0.1 * (infer_ms - self.infer_ms)
+        if self.smoother is not None:
+            lm = self.smoother(lm, time.perf_counter())
+        if lm is None:
+            return
+        self.detected += 1
+        sides = resolve_sides(lm, self.side)
+        knee = float(self.evaluator.update(lm, None, self.side, sides, self.aspect)[0])
+        self.min_knee = min(self.min_knee, knee)
+        self.max_knee = max(self.max_knee, knee)
+
+    def status(self, elapsed: float) -> dict:
+        ev = self.evaluator
+        fps = self._window_frames / elapsed if elapsed > 0 else 0.0
+        self._window_frames = 0
+        return {
+            "station": self.name,
+            "patient_id": storage.get_patient_id(self.patient),
+            "exercise": self.exercise,
+            "fps": round(fps, 1),
+            "capture_fps": round(self.grabber.fps, 1),
+            "inference_ms": round(self.infer_ms, 1),
+            # 1 in the pool + 1 waiting in the grabber slot at most
+            "queue_depth": int(self.in_flight) + int(self.grabber.has_frame),
+            "dropped": self.grabber.dropped_frames,
+            "reps": ev.rep_count,
+            "total_reps": ev.total_rep_count,
+            "done": self.done,
+        }
+
+    def session(self) -> dict:
+        """Session record in the same shape MainWindow.stop_process saves."""
+        end = self.finished_at or time.time()
+        started = datetime.fromtimestamp(self.started or end)
+        ev = self.evaluator
+        data = {
+            "date": started.strftime("%Y-%m-%d"),
+            "time": started.strftime("%H:%M:%S"),
+            "exercise": self.exercise,
+            "duration_seconds": round(end - (self.started or end), 1),
+            "correct_reps": ev.rep_count,
+            "total_reps": ev.total_rep_count,
+            "min_knee_angle": round(self.min_knee if self.min_knee != float("inf") else 0, 1),
+            "max_knee_angle": round(self.max_knee, 1),
+            "station": self.name,
+        }
+        if self.exercise == "Straight Leg Raises":
+            data["left_correct_reps"] = ev.left_rep_count
+            data["left_total_reps"] = ev.left_total_rep_count
+            data["right_correct_reps"] = ev.right_rep_count
+            data["right_total_reps"] = ev.right_total_rep_count
+        return data
+
+    def close(self):
+        self.grabber.stop()
+        self._cap.release()
+
+
+# ─── Host ────────────────────────────────────────────────────────────────────
+
+class StationHost:
+    """Runs stations on sharded pose workers until stopped or done."""
+
+    def __init__(self, stations: list, workers: int = 0, model_complexity: int = 1):
+        self.stations = {s.name: s for s in stations}
+        workers = workers or (os.cpu_count() or 2) - 1
+        self.workers = max(1, min(len(stations), workers))
+        self.model_complexity = model_complexity
+        order = list(self.stations)
+        # Station i always runs on worker i % workers
+        self._shards = [order[k::self.workers] for k in range(self.workers)]
+        self._shard_of = {name: k for k, names in enumerate(self._shards) for name in names}
+        self._busy = [False] * self.workers
+        self._next = [0] * self.workers     # round-robin start within each shard
+        self._results = queue.Queue()
+
+    def _dispatch(self, pools):
+        """Give each idle worker the next waiting frame of its own shard."""
+        for k, names in enumerate(self._shards):
+            if self._busy[k]:
+                continue
+            n = len(names)
+            for i in range(n):
+                st = self.stations[names[(self._next[k] + i) % n]]
+                if st.done:
+                    continue
+                task = st.next_task()
+                if task is None:
+                    continue
+                pools[k].apply_async(
+                    _infer, (task,), callback=self._results.put,
+                    error_callback=lambda e, name=st.name: self._results.put((name, e, 0.0)))
+                self._busy[k] = True
+                self._next[k] = (self._next[k] + i + 1) % n
+                break
+
+    def _collect(self, timeout: float):
+        try:
+            name, lm, infer_ms = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self._busy[self._shard_of[name]] = False
+        st = self.stations[name]
+        if isinstance(lm, Exception):
+            print(f"{name}: inference error: {lm}")
+            st.in_flight = False
+            return
+        try:
+            st.on_result(lm, infer_ms)
+        except Exception as e:
+            print(f"{name}: exercise processing error: {e}")
+
+    def report(self, elapsed: float, status_path: str = "") -> list:
+        rows = [st.status(elapsed) for st in self.stations.values()]
+        for r in rows:
+            print(f"  {r['station']:<10} {r['fps']:5.1f} fps (camera {r['capture_fps']:5.1f})  "
+                  f"inf {r['inference_ms']:5.1f} ms  queue {r['queue_depth']}  "
+                  f"dropped {r['dropped']:<6} reps {r['reps']}/{r['total_reps']}"
+                  f"{'  done' if r['done'] else ''}")
+        if status_path:
+            with open(status_path, "w") as f:
+                json.dump({"time": datetime.now().isoformat(timespec="seconds"),
+                           "pool_in_flight": sum(self._busy), "stations": rows}, f, indent=2)
+        return rows
+
+    def run(self, duration: float = 0.0, report_every: float = 5.0, status_path: str = ""):
+        ctx = multiprocessing.get_context("spawn")
+        print(f"{len(self.stations)} station(s), {self.workers} pose worker(s): "
+              + "; ".join(", ".join(names) for names in self._shards))
+        # One single-process pool per shard pins its stations to one worker
+        pools = [ctx.Pool(1, initializer=_init_worker, initargs=(self.model_complexity,))
+                 for _ in self._shards]
+        for st in self.stations.values():
+            st.start()
+        t0 = last_report = time.perf_counter()
+        try:
+            while not all(st.done for st in self.stations.values()):
+                now = time.perf_counter()
+                if duration and now - t0 >= duration:
+                    break
+                self._dispatch(pools)
+                self._collect(timeout=0.005)
+                if now - last_report >= report_every:
+                    self.report(now - last_report, status_path)
+                    last_report = now
+        except KeyboardInterrupt:
+            print("Stopping...")
+        finally:
+            for st in self.stations.values():
+                if not st.done:
+                    st.finished_at = time.time()
+                st.close()
+            self.report(time.perf_counter() - last_report, status_path)
+            for pool in pools:
+                pool.terminate()
+        self.save_sessions()
+
+    def save_sessions(self):
+        for st in self.stations.values():
+            if not st.processed:
+                print(f"{st.name}: no frames processed, session not saved")
+                continue
+            session = st.session()
+            ok = storage.save_session(st.patient, session)
+            print(f"{st.name}: {session['exercise']} reps {session['correct_reps']}/"
+                  f"{session['total_reps']} → {storage.get_patient_id(st.patient)}"
+                  f"{'' if ok else ' (save FAILED)'}")
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+
+def load_stations(path: str, width: int, smoothing: bool) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    stations = []
+    try:
+        for i, e in enumerate(entries, 1):
+            source = e["source"]
+            if isinstance(source, str) and source.isdigit():
+                source = int(source)
+            stations.append(Station(
+                e.get("name") or f"station{i}", source, e.get("exercise", "Squats"),
+                e.get("patient") or {"id": f"STATION{i}"}, e.get("side", "auto"),
+                e.get("loop", False), width, e.get("capture"), smoothing,
+            ))
+    except BaseException:
+        # Don't keep the cameras opened so far when a later station fails
+        close_stations(stations)
+        raise
+    return stations
+
+
+def close_stations(stations: list):
+    for st in stations:
+        st.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless multi-station exercise host")
+    parser.add_argument("stations", nargs="?", help="stations JSON file")
+    parser.add_argument("--video", action="append", default=[],
+                        help="add a video-file station (repeatable; for testing)")
+    parser.add_argument("--exercise", choices=sorted(EXERCISE_EVALUATORS), default="Squats",
+                        help="exercise for --video stations")
+    parser.add_argument("--loop", action="store_true", help="loop --video stations")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="pose worker processes, stations split between them "
+                             "(0 = one per station, up to CPUs - 1)")
+    parser.add_argument("--complexity", type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH,
+                        help="inference width in px (0 = full resolution)")
+    parser.add_argument("--smoothing", action="store_true",
+                        help="One Euro landmark smoothing on top of MediaPipe's own")
+    parser.add_argument("--duration", type=float, default=0.0,
+                        help="seconds to run (0 = until Ctrl+C or every source ends)")
+    parser.add_argument("--report", type=float, default=5.0, help="report interval (s)")
+    parser.add_argument("--status", default="", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    smoothing = args.smoothing
+    stations = load_stations(args.stations, args.width, smoothing) if args.stations else []
+    try:
+        for i, path in enumerate(args.video, len(stations) + 1):
+            stations.append(Station(f"video{i}", path, args.exercise, {"id": f"TEST{i:03d}"},
+                                    loop=args.loop, width=args.width, smoothing=smoothing))
+    except BaseException:
+        close_stations(stations)
+        raise
+    if not stations:
+        parser.error("no stations: give a stations file or --video")
+
+    StationHost(stations, args.workers, args.complexity).run(
+        args.duration, args.report, args.status)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
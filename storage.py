@@ -10,6 +10,7 @@ Canonical folder structure:
             thumbs/             <- JPEG thumbnails
             documents/          <- uploaded PDFs / scans
             reports/            <- generated PDF reports
+            landmarks/          <- per-session landmark recordings (*.kclm)
 """
 
 import json
@@ -17,6 +18,8 @@ import os
 import shutil
 from pathlib import Path
 
+from tracing import traced
+
 ASSETS_DIR = "patients_assets"
 
 
@@ -42,6 +45,35 @@ def ensure_patient_folder(patient_data: dict) -> Path:
     return folder
 
 
+def get_videos_folder(patient_data: dict) -> Path:
+    return get_patient_folder(patient_data) / "videos"
+
+
+# ─── Exercise names ──────────────────────────────────────────────────────────
+
+def canonical_exercise(name: str) -> str:
+    """Normalize exercise names so 'Straight Leg Raise(s)' map to one key, etc."""
+    s = (name or "").strip().lower()
+
+    # common variations in your UI
+    s = s.replace("_", " ").replace("-", " ")
+    s = " ".join(s.split())
+
+    # Map variations → a stable canonical key used in JSON
+    aliases = {
+        "squats": "Squats",
+        "mini squats": "Squats",
+        "mini-squats": "Squats",
+        "seated knee bending": "Seated Knee Bending",
+        "straight leg raise": "Straight Leg Raises",
+        "straight leg raises": "Straight Leg Raises",
+        "straight leg raising": "Straight Leg Raises",
+        "initial assessment": "Initial Assessment",
+        "general": "General",
+    }
+    return aliases.get(s, name.strip() if name else "")
+
+
 # ─── Sessions ────────────────────────────────────────────────────────────────
 
 def get_sessions_file(patient_data: dict) -> Path:
@@ -62,6 +94,7 @@ def load_sessions(patient_data: dict) -> list:
     return _migrate_old_sessions(patient_data)
 
 
+@traced(cat="storage")
 def save_session(patient_data: dict, session: dict) -> bool:
     """Append session to the patient's sessions.json. Returns True on success."""
     try:
@@ -114,6 +147,7 @@ def load_patient_json(patient_data: dict) -> dict:
     return {}
 
 
+@traced(cat="storage")
 def save_patient_json(patient_data: dict, full_data: dict) -> bool:
     """Overwrite patient.json with full_data."""
     try:
@@ -145,6 +179,7 @@ def get_documents_folder(patient_data: dict) -> Path:
     return folder / "documents"
 
 
+@traced(cat="storage")
 def add_document(patient_data: dict, src_path: str, title: str, description: str = "") -> bool:
     """Copy a file into the patient's documents folder and update the index."""
     try:
@@ -179,6 +214,7 @@ def add_document(patient_data: dict, src_path: str, title: str, description: str
         return False
 
 
+@traced(cat="storage")
 def remove_document(patient_data: dict, filename: str) -> bool:
     """Delete a document file and remove it from the index."""
     try:
@@ -199,3 +235,12 @@ def remove_document(patient_data: dict, filename: str) -> bool:
 def get_reports_folder(patient_data: dict) -> Path:
     folder = ensure_patient_folder(patient_data)
     return folder / "reports"
+
+
+# ─── Landmark recordings ─────────────────────────────────────────────────────
+
+def get_landmarks_folder(patient_data: dict) -> Path:
+    """Per-session landmark recordings (landmark_log.py), next to sessions.json."""
+    folder = get_patient_folder(patient_data) / "landmarks"
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
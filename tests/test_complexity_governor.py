@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+import pose_engine
+from pose_engine import ComplexityGovernor
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(pose_engine, "time", SimpleNamespace(perf_counter=lambda: now[0]))
+    return now
+
+
+def _feed(gov, latency, n):
+    changes = [gov.record(latency) for _ in range(n)]
+    return [c for c in changes if c is not None]
+
+
+def test_governor_steps_down_over_budget(clock):
+    gov = ComplexityGovernor(budget_ms=33.0, level=2, window=5, cooldown=5.0)
+    clock[0] = 10.0
+    assert _feed(gov, 50.0, 5) == [1]
+    assert gov.level == 1
+
+
+def test_governor_waits_for_a_full_window(clock):
+    gov = ComplexityGovernor(budget_ms=33.0, level=2, window=5, cooldown=5.0)
+    clock[0] = 10.0
+    assert _feed(gov, 50.0, 4) == []
+    assert gov.record(50.0) == 1
+
+
+def test_governor_no_switch_inside_startup_cooldown(clock):
+    gov = ComplexityGovernor(budget_ms=33.0, level=2, window=5, cooldown=5.0)
+    clock[0] = 4.9
+    assert _feed(gov, 50.0, 10) == []
+
+
+def test_governor_holds_level_after_switch_during_cooldown(clock):
+    gov = ComplexityGovernor(budget_ms=33.0, level=2, window=5, cooldown=5.0)
+    clock[0] = 10.0
+    assert _feed(gov, 50.0, 5) == [1]
+    clock[0] = 12.0
+    assert _feed(gov, 50.0, 10) == []       # over budget, but cooling down
+    clock[0] = 15.5
+    assert _feed(gov, 50.0, 5) == [0]
+    assert _feed(gov, 50.0, 5) == []        # already at min_level
+
+
+def test_governor_steps_up_with_headroom_and_backs_off_longer(clock):
+    gov = ComplexityGovernor(budget_ms=33.0, level=0, window=5, cooldown=5.0)
+    clock[0] = 10.0
+    assert _feed(gov, 5.0, 5) == [1]        # 5 ms * 2 well inside 70 % of 33 ms
+    clock[0] = 16.0
+    assert _feed(gov, 40.0, 5) == [0]       # the upgrade did not fit
+    clock[0] = 22.0                         # 6 s later: cooldown is now 10 s
+    assert _feed(gov, 5.0, 5) == []
+    clock[0] = 26.5
+    assert _feed(gov, 5.0, 5) == [1]
+
+
+def test_governor_no_step_up_without_margin(clock):
+    gov = ComplexityGovernor(budget_ms=33.0, level=1, window=5, cooldown=0.0)
+    clock[0] = 10.0
+    assert _feed(gov, 15.0, 20) == []       # 15 * 2 > 0.7 * 33
@@ -0,0 +1,96 @@
+import numpy as np
+
+from frame_pool import FramePool, FrameMailbox, DisplayScaler, fit_size
+
+SHAPE = (4, 6, 3)
+
+
+def test_released_buffer_is_reused():
+    pool = FramePool(max_frames=2)
+    frame = pool.acquire(SHAPE)
+    buf = frame.array
+    frame.release()
+    assert pool.acquire(SHAPE).array is buf
+
+
+def test_retain_keeps_buffer_until_last_release():
+    pool = FramePool(max_frames=1)
+    frame = pool.acquire(SHAPE).retain()
+    frame.release()
+    # still held once: the next acquire cannot get it back
+    other = pool.acquire(SHAPE)
+    assert other.array is not frame.array
+    assert pool.overflow == 1
+    frame.release()
+    assert pool.acquire(SHAPE).array is frame.array
+
+
+def test_overflow_buffers_are_not_pooled():
+    pool = FramePool(max_frames=2)
+    held = [pool.acquire(SHAPE) for _ in range(2)]
+    extra = pool.acquire(SHAPE)
+    assert pool.overflow == 1
+    extra.release()
+    for f in held:
+        f.release()
+    again = {id(pool.acquire(SHAPE).array) for _ in range(2)}
+    assert again == {id(f.array) for f in held}
+
+
+def test_shape_change_drops_old_buffers():
+    pool = FramePool(max_frames=2)
+    old = pool.acquire(SHAPE)
+    old.release()
+    new = pool.acquire((8, 8, 3))
+    assert new.array.shape == (8, 8, 3)
+    assert new.array is not old.array
+
+
+def test_fit_size_keeps_aspect():
+    assert fit_size(1280, 720, 640, 640) == (640, 360)
+    assert fit_size(640, 480, 1000, 300) == (400, 300)
+
+
+def test_display_scaler_downscales_only():
+    pool = FramePool(max_frames=2)
+    scaler = DisplayScaler()
+    frame = pool.acquire((480, 640, 3))
+    assert scaler.scale(frame) is frame         # no size set yet
+
+    scaler.set_size(320, 320)
+    small = scaler.scale(frame)
+    assert small.array.shape == (240, 320, 3)
+    assert pool.acquire((480, 640, 3)).array is frame.array     # original released
+
+    scaler.set_size(1280, 960)
+    big = pool.acquire((480, 640, 3))
+    assert scaler.scale(big) is big             # never upscaled
+
+
+def test_mailbox_wakes_once_and_counts_drops():
+    pool = FramePool(max_frames=4)
+    box = FrameMailbox()
+    first, second = pool.acquire(SHAPE), pool.acquire(SHAPE)
+    assert box.put(first) is True
+    assert box.put(second) is False     # signal already queued
+    assert box.dropped == 1
+
+    taken = box.take()
+    assert taken is second
+    assert box.delivered == 1
+    assert box.take() is None
+    # the replaced frame went back to the pool
+    assert pool.acquire(SHAPE).array is first.array
+
+    taken.release()
+    assert box.put(pool.acquire(SHAPE)) is True     # credit returned by take()
+
+
+def test_mailbox_clear_releases_waiting_frame():
+    pool = FramePool(max_frames=1)
+    box = FrameMailbox()
+    frame = pool.acquire(SHAPE)
+    box.put(frame)
+    box.clear()
+    assert pool.acquire(SHAPE).array is frame.array
+    assert pool.overflow == 0
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from pose_engine import InferenceScheduler, LandmarkExtrapolator
+
+
+def _pose(value, vis=0.9):
+    arr = np.full((33, 4), value, dtype=np.float32)
+    arr[:, 3] = vis
+    return arr
+
+
+def test_scheduler_fixed_stride():
+    sched = InferenceScheduler(3)
+    assert [sched.tick() for _ in range(7)] == [False, False, True, False, False, True, False]
+    sched.record(200.0, 33.3)               # fixed stride ignores latency
+    assert sched.stride == 3
+
+
+def test_scheduler_stride_one_runs_every_frame():
+    sched = InferenceScheduler(1)
+    assert all(sched.tick() for _ in range(5))
+
+
+@pytest.mark.parametrize("infer_ms, interval_ms, stride", [
+    (20.0, 33.3, 1),       # faster than the camera
+    (50.0, 33.3, 2),       # ceil(50 / 33.3)
+    (500.0, 33.3, 3),      # capped: 30 fps camera, inference >= 10 Hz
+    (500.0, 16.7, 5),      # capped: 60 fps camera
+])
+def test_scheduler_auto_stride(infer_ms, interval_ms, stride):
+    sched = InferenceScheduler(0)
+    sched.record(infer_ms, interval_ms)
+    assert sched.stride == stride
+
+
+def test_scheduler_auto_stride_follows_latency_average():
+    sched = InferenceScheduler(0)
+    sched.record(20.0, 33.3)
+    sched.record(200.0, 33.3)               # one slow frame barely moves the EMA
+    assert sched.stride == 2
+
+
+# ─── LandmarkExtrapolator ────────────────────────────────────────────────────
+
+def test_extrapolator_needs_history():
+    ex = LandmarkExtrapolator()
+    assert ex.predict(1.0) is None
+    ex.observe(_pose(0.5), 1.0)
+    np.testing.assert_array_equal(ex.predict(1.1), _pose(0.5))
+
+
+def test_extrapolator_constant_velocity():
+    ex = LandmarkExtrapolator()
+    ex.observe(_pose(0.50, vis=0.5), 1.0)
+    ex.observe(_pose(0.52, vis=0.9), 1.1)
+    out = ex.predict(1.15)
+    np.testing.assert_allclose(out[:, :3], 0.53, atol=1e-6)
+    np.testing.assert_allclose(out[:, 3], 0.9)     # visibility not extrapolated
+
+
+def test_extrapolator_horizon_is_capped():
+    ex = LandmarkExtrapolator()
+    ex.observe(_pose(0.50), 1.0)
+    ex.observe(_pose(0.51), 1.1)
+    far = ex.predict(1.1 + 10 * LandmarkExtrapolator.MAX_HORIZON)
+    capped = ex.predict(1.1 + LandmarkExtrapolator.MAX_HORIZON)
+    np.testing.assert_allclose(far, capped)
+    np.testing.assert_allclose(capped[:, :3], 0.51 + 0.01 * 2.5, atol=1e-6)
+
+
+def test_extrapolator_lost_pose_resets():
+    ex = LandmarkExtrapolator()
+    ex.observe(_pose(0.5), 1.0)
+    ex.observe(None, 1.1)
+    assert ex.predict(1.2) is None
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets", reason="the entry point needs PyQt6")
+
+from import_report import DEFAULT_BUDGET_MS, DEFERRED_MODULES, measure_imports
+
+
+@pytest.fixture(scope="module")
+def report():
+    # Best of a few runs, as import_report.py does, so a cold disk cache on
+    # the first run does not fail the budget
+    return min((measure_imports("knee_connect") for _ in range(3)),
+               key=lambda r: r["total_ms"])
+
+
+def test_startup_imports_within_budget(report):
+    assert report["total_ms"] > 0, "knee_connect missing from -X importtime output"
+    assert report["total_ms"] <= DEFAULT_BUDGET_MS, (
+        f"import knee_connect took {report['total_ms']:.0f} ms "
+        f"(budget {DEFAULT_BUDGET_MS:.0f} ms, KNEECONNECT_IMPORT_BUDGET_MS)")
+
+
+@pytest.mark.parametrize("module", DEFERRED_MODULES)
+def test_heavy_module_not_imported_at_startup(report, module):
+    assert module not in report["modules"], (
+        f"{module} is imported at start-up "
+        f"({report['modules'][module]['cumulative_ms']:.0f} ms); import it on first use")
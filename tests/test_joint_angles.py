@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from utils import (
+    joint_angles, calculate_angle, KNEE_ANGLE, HIP_ANGLE, SIDE_RIGHT, SIDE_LEFT,
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE,
+    LEFT_ANKLE, RIGHT_ANKLE,
+)
+
+
+def reference_angle(a, b, c):
+    # calculate_angle() as it was before the batched kernel; it was fed
+    # MediaPipe's Python float coordinates, i.e. float64
+    a, b, c = (np.array(p, dtype=np.float64) for p in (a, b, c))
+    ba = a - b
+    bc = c - b
+    denom = (np.linalg.norm(ba) * np.linalg.norm(bc)) + 1e-8
+    cosine_angle = np.clip(np.dot(ba, bc) / denom, -1.0, 1.0)
+    return np.degrees(np.arccos(cosine_angle))
+
+
+TRIPLETS = [
+    (KNEE_ANGLE, SIDE_RIGHT, (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE)),
+    (KNEE_ANGLE, SIDE_LEFT, (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)),
+    (HIP_ANGLE, SIDE_RIGHT, (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE)),
+    (HIP_ANGLE, SIDE_LEFT, (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE)),
+]
+
+
+@pytest.fixture
+def poses():
+    return np.random.default_rng(7).random((50, 33, 4), dtype=np.float32)
+
+
+def test_joint_angles_match_calculate_angle(poses):
+    for lm in poses:
+        angles = joint_angles(lm)
+        assert angles.shape == (3, 2)
+        for row, col, (a, b, c) in TRIPLETS:
+            expected = reference_angle(lm[a, :2], lm[b, :2], lm[c, :2])
+            assert angles[row, col] == pytest.approx(expected, abs=1e-9)
+            assert calculate_angle(lm[a, :2], lm[b, :2], lm[c, :2]) == pytest.approx(expected, abs=1e-9)
+
+
+def test_joint_angles_batched_equals_per_frame(poses):
+    batched = joint_angles(poses, aspect=16 / 9)
+    assert batched.shape == (50, 3, 2)
+    for lm, angles in zip(poses, batched):
+        np.testing.assert_allclose(angles, joint_angles(lm, aspect=16 / 9))
+
+
+def test_right_angles():
+    lm = np.zeros((33, 4), dtype=np.float32)
+    lm[RIGHT_SHOULDER, :2] = (0.5, 0.2)
+    lm[RIGHT_HIP, :2] = (0.5, 0.5)
+    lm[RIGHT_KNEE, :2] = (0.7, 0.5)     # seated: thigh horizontal
+    lm[RIGHT_ANKLE, :2] = (0.7, 0.8)    # shin vertical
+    angles = joint_angles(lm)
+    assert angles[KNEE_ANGLE, SIDE_RIGHT] == pytest.approx(90.0, abs=1e-4)
+    assert angles[HIP_ANGLE, SIDE_RIGHT] == pytest.approx(90.0, abs=1e-4)
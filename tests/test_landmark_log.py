@@ -0,0 +1,60 @@
+import numpy as np
+
+from landmark_log import LandmarkRecorder, LandmarkLog
+
+
+def _poses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random((n, 33, 4), dtype=np.float32)
+
+
+def _record(path, poses, dtype):
+    rec = LandmarkRecorder(path, {"exercise": "Squats"}, dtype=dtype)
+    for i, lm in enumerate(poses):
+        rec.write(10.0 + i / 30, lm, (720, 1280, 3), "left" if i % 2 else "auto")
+    rec.close()
+    return rec
+
+
+def test_float32_roundtrip_is_exact(tmp_path):
+    poses = _poses(5)
+    poses_with_gap = list(poses)
+    poses_with_gap[2] = None
+    rec = _record(tmp_path / "a.kclm", poses_with_gap, "float32")
+    assert rec.frames == 5
+
+    log = LandmarkLog(tmp_path / "a.kclm")
+    assert len(log) == 5
+    assert log.meta["exercise"] == "Squats"
+    assert log.meta["dtype"] == "float32"
+    assert log.aspect == 1280 / 720
+    np.testing.assert_allclose(log.t, np.arange(5) / 30)
+    assert log.side.tolist() == [0, 2, 0, 2, 0]
+    for i in (0, 1, 3, 4):
+        np.testing.assert_array_equal(log.landmarks(i), poses[i])
+    assert log.landmarks(2) is None
+    stack = log.stack()
+    assert stack.shape == (5, 33, 4)
+    assert np.isnan(stack[2]).all()
+
+
+def test_float16_roundtrip_is_close(tmp_path):
+    poses = _poses(3, seed=1)
+    _record(tmp_path / "b.kclm", poses, "float16")
+    log = LandmarkLog(tmp_path / "b.kclm")
+    assert log.meta["dtype"] == "float16"
+    np.testing.assert_allclose(log.stack(), poses, atol=1e-3)
+
+
+def test_recorder_without_frames_leaves_no_file(tmp_path):
+    rec = LandmarkRecorder(tmp_path / "c.kclm")
+    rec.close()
+    assert not (tmp_path / "c.kclm").exists()
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = tmp_path / "d.kclm"
+    _record(path, _poses(4), "float32")
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 10)
+    assert len(LandmarkLog(path)) == 3
@@ -0,0 +1,38 @@
+import numpy as np
+
+from pose_engine import LandmarkSmoother
+
+
+def _pose(value, vis=0.9):
+    arr = np.full((33, 4), value, dtype=np.float32)
+    arr[:, 3] = vis
+    return arr
+
+
+def test_smoother_first_pose_passes_through():
+    sm = LandmarkSmoother()
+    pose = _pose(0.5)
+    np.testing.assert_array_equal(sm(pose, 1.0), pose)
+
+
+def test_smoother_filters_a_jump():
+    sm = LandmarkSmoother(min_cutoff=1.0, beta=0.0)
+    sm(_pose(0.5), 1.0)
+    out = sm(_pose(0.6, vis=0.3), 1.033)
+    assert np.all((out[:, :3] > 0.5) & (out[:, :3] < 0.6))
+    np.testing.assert_allclose(out[:, 3], 0.3)      # visibility passes through
+
+
+def test_smoother_resets_on_none():
+    sm = LandmarkSmoother(min_cutoff=1.0, beta=0.0)
+    sm(_pose(0.5), 1.0)
+    sm(_pose(0.6), 1.033)
+    assert sm(None, 1.066) is None
+    # the next pose starts fresh instead of blending with the lost one
+    np.testing.assert_array_equal(sm(_pose(0.9), 1.1), _pose(0.9))
+
+
+def test_smoother_restarts_when_time_goes_backwards():
+    sm = LandmarkSmoother()
+    sm(_pose(0.5), 2.0)
+    np.testing.assert_array_equal(sm(_pose(0.7), 1.0), _pose(0.7))
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from pose_engine import RoiTracker
+
+FRAME = (1000, 1000, 3)
+
+
+def _pose(x0, x1, y0, y1, vis=1.0):
+    """33 landmarks spread over the normalized box [x0, x1] x [y0, y1]."""
+    lm = np.zeros((33, 4), dtype=np.float32)
+    lm[:, 0] = np.linspace(x0, x1, 33)
+    lm[:, 1] = np.linspace(y0, y1, 33)
+    lm[:, 3] = vis
+    return lm
+
+
+@pytest.fixture
+def tracker():
+    roi = RoiTracker(padding=0.25, min_size=96)
+    roi.update(_pose(0.375, 0.625, 0.25, 0.75), FRAME, None)
+    return roi
+
+
+def test_full_frame_until_a_pose_is_found():
+    roi = RoiTracker()
+    frame = np.zeros(FRAME, dtype=np.uint8)
+    crop, box = roi.crop(frame)
+    assert crop is frame and box is None
+
+
+def test_box_pads_the_landmarks(tracker):
+    # 250 x 500 px landmark box, 25 % padding on each side
+    assert tracker.box == (312, 125, 687, 875)
+
+
+def test_crop_is_a_contiguous_copy_of_the_box(tracker):
+    frame = np.random.default_rng(0).integers(0, 255, FRAME, dtype=np.uint8)
+    crop, box = tracker.crop(frame)
+    assert box == tracker.box
+    assert crop.flags.c_contiguous
+    np.testing.assert_array_equal(crop, frame[125:875, 312:687])
+
+
+def test_crop_landmarks_map_back_to_the_full_frame(tracker):
+    box = tracker.box
+    lm = np.zeros((33, 4), dtype=np.float32)
+    lm[:, 0] = 0.5           # centre of the crop
+    lm[:, 1] = 0.25
+    lm[:, 2] = 1.0
+    lm[:, 3] = 1.0
+    tracker.update(lm, FRAME, box)
+    np.testing.assert_allclose(lm[:, 0], (312 + 0.5 * 375) / 1000)
+    np.testing.assert_allclose(lm[:, 1], (125 + 0.25 * 750) / 1000)
+    np.testing.assert_allclose(lm[:, 2], 375 / 1000)     # z scales with the crop width
+
+
+def test_small_moves_keep_the_box(tracker):
+    box = tracker.box
+    # inner margin is a quarter of the padding: ~23 px across, ~47 px down
+    tracker.update(_pose(0.385, 0.635, 0.27, 0.77), FRAME, None)
+    assert tracker.box == box
+
+
+def test_leaving_the_inner_margin_moves_the_box(tracker):
+    box = tracker.box
+    tracker.update(_pose(0.3125, 0.5625, 0.25, 0.75), FRAME, None)
+    assert tracker.box != box
+    assert tracker.box == (250, 125, 625, 875)
+
+
+def test_falls_back_to_full_frame_at_the_edge(tracker):
+    tracker.update(_pose(0.0625, 0.5, 0.25, 0.75), FRAME, None)
+    assert tracker.box is None
+
+
+def test_lost_pose_resets(tracker):
+    tracker.update(None, FRAME, tracker.box)
+    assert tracker.box is None
+
+
+def test_too_few_visible_landmarks_resets(tracker):
+    lm = _pose(0.375, 0.625, 0.25, 0.75, vis=0.1)
+    lm[:3, 3] = 0.9
+    tracker.update(lm, FRAME, None)
+    assert tracker.box is None
+
+
+def test_reset(tracker):
+    tracker.reset()
+    frame = np.zeros(FRAME, dtype=np.uint8)
+    assert tracker.crop(frame)[1] is None
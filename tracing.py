@@ -0,0 +1,163 @@
+"""
+tracing.py — KneeConnect opt-in timeline tracing.
+
+Set KNEECONNECT_TRACE=<file.json> to record a trace-event file that
+https://ui.perfetto.dev or chrome://tracing can open.  Every span is tagged
+with the thread it ran on, so the vision thread's stages, GUI slots, TTS
+utterances and storage writes line up on one timeline and stalls between
+them become visible.  The file is written at exit.
+
+Tracing is decided once at import: when it is off, ``traced`` returns the
+function unchanged and ``span`` hands back a shared no-op context manager.
+
+Public API:
+    ENABLED
+    span(name, cat="vision", **args)          context manager
+    traced(name=None, cat="gui")              decorator
+    complete(name, start, end, cat="vision")  span from two perf_counter() stamps
+    instant(name, cat="vision", **args)
+    name_thread(name)                         label the calling thread
+    flush()
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+TRACE_PATH = os.environ.get("KNEECONNECT_TRACE", "")
+# Spawned children (pose worker, batch pool) inherit the environment; only the
+# process that imported this first writes the file.  The environment is only
+# touched when tracing is on.
+ENABLED = False
+if TRACE_PATH:
+    _OWNER = os.environ.setdefault("KNEECONNECT_TRACE_OWNER", str(os.getpid()))
+    ENABLED = _OWNER == str(os.getpid())
+
+# Bound memory for long sessions (~100 bytes per event)
+MAX_EVENTS = 2_000_000
+
+_events = []
+_named_threads = set()
+_lock = threading.Lock()
+_pid = os.getpid()
+_t0 = time.perf_counter()
+
+
+def _us(t: float) -> float:
+    return round((t - _t0) * 1e6, 1)
+
+
+def _tid() -> int:
+    tid = threading.get_ident()
+    if tid not in _named_threads:
+        name = threading.current_thread().name
+        name_thread("GUI" if name == "MainThread" else name)
+    return tid
+
+
+def name_thread(name: str):
+    """Label the calling thread in the trace (e.g. at the top of QThread.run)."""
+    if not ENABLED:
+        return
+    tid = threading.get_ident()
+    with _lock:
+        _named_threads.add(tid)
+        _events.append({"ph": "M", "name": "thread_name", "pid": _pid, "tid": tid,
+                        "args": {"name": name}})
+
+
+def complete(name: str, start: float, end: float, cat: str = "vision", args: dict = None):
+    """Record a span between two time.perf_counter() stamps."""
+    if not ENABLED or len(_events) >= MAX_EVENTS:
+        return
+    ev = {"ph": "X", "name": name, "cat": cat, "pid": _pid, "tid": _tid(),
+          "ts": _us(start), "dur": round((end - start) * 1e6, 1)}
+    if args:
+        ev["args"] = args
+    _events.append(ev)
+
+
+def instant(name: str, cat: str = "vision", **args):
+    if not ENABLED or len(_events) >= MAX_EVENTS:
+        return
+    ev = {"ph": "i", "s": "t", "name": name, "cat": cat, "pid": _pid, "tid": _tid(),
+          "ts": _us(time.perf_counter())}
+    if args:
+        ev["args"] = args
+    _events.append(ev)
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        complete(self.name, self.start, time.perf_counter(), self.cat, self.args)
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, cat: str = "vision", **args):
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, cat, args or None)
+
+
+def traced(name: str = None, cat: str = "gui"):
+    """Decorator: record every call of the function as a span.
+
+    Put it *below* @pyqtSlot so Qt still sees the slot signature.
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                complete(label, start, time.perf_counter(), cat)
+        return wrapper
+    return decorate
+
+
+def flush():
+    """Write everything recorded so far to KNEECONNECT_TRACE."""
+    if not ENABLED:
+        return
+    with _lock:
+        events = list(_events)
+    try:
+        with open(TRACE_PATH, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"Trace written: {len(events)} events → {TRACE_PATH}")
+    except Exception as e:
+        print(f"tracing.flush error: {e}")
+
+
+if ENABLED:
+    atexit.register(flush)
@@ -1,117 +1,223 @@
+from types import MappingProxyType
+from typing import NamedTuple
+
 import cv2
 import numpy as np
-import mediapipe as mp
 
-def calculate_angle(a, b, c):
-    
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    
+from overlay import put_text
+
+# ── Landmark array layout ────────────────────────────────────────────────────
+# Each frame's pose is a (33, 4) float32 array: one row per MediaPipe Pose
+# landmark, columns x, y, z, visibility (x/y normalized to the frame).
+NUM_LANDMARKS = 33
+X, Y, Z, VIS = 0, 1, 2, 3
+
+# MediaPipe PoseLandmark indices (plain ints: no enum lookups in the hot path)
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_HEEL, RIGHT_HEEL = 29, 30
+LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX = 31, 32
+
+
+def landmarks_to_array(landmark) -> np.ndarray:
+    """Pack a MediaPipe landmark list into a (33, 4) float32 array (x, y, z, vis)."""
+    return np.array(
+        [(p.x, p.y, p.z, p.visibility) for p in landmark], dtype=np.float32
+    )
+
+
+# ── Joint-angle kernel ───────────────────────────────────────────────────────
+# joint_angles() returns every angle the exercises use, shaped (..., 3, 2):
+# rows KNEE_ANGLE / HIP_ANGLE / TORSO_LEAN, columns SIDE_RIGHT / SIDE_LEFT.
+KNEE_ANGLE, HIP_ANGLE, TORSO_LEAN = 0, 1, 2
+SIDE_RIGHT, SIDE_LEFT = 0, 1
+
+# (a, b, c) landmark triplets for the angle at b: knee = hip-knee-ankle,
+# hip = shoulder-hip-knee; one column per side
+_JOINT_A = np.array([[RIGHT_HIP, LEFT_HIP], [RIGHT_SHOULDER, LEFT_SHOULDER]])
+_JOINT_B = np.array([[RIGHT_KNEE, LEFT_KNEE], [RIGHT_HIP, LEFT_HIP]])
+_JOINT_C = np.array([[RIGHT_ANKLE, LEFT_ANKLE], [RIGHT_KNEE, LEFT_KNEE]])
+_SHOULDERS = np.array([RIGHT_SHOULDER, LEFT_SHOULDER])
+_HIPS = np.array([RIGHT_HIP, LEFT_HIP])
+
+
+def vector_angles(a, b, c):
+    """Angle at b (degrees) between b->a and b->c, over any leading dimensions."""
     ba = a - b
     bc = c - b
-    
-    denom = (np.linalg.norm(ba) * np.linalg.norm(bc)) + 1e-8
-    cosine_angle = np.dot(ba, bc) / denom
-    cosine_angle = np.clip(cosine_angle, -1.0, 1.0)
-    angle = np.degrees(np.arccos(cosine_angle))
-    
-    return angle
+    denom = np.sqrt((ba * ba).sum(-1) * (bc * bc).sum(-1)) + 1e-8
+    cosine_angle = np.clip((ba * bc).sum(-1) / denom, -1.0, 1.0)
+    return np.degrees(np.arccos(cosine_angle))
+
+
+def joint_angles(lm, aspect=1.0):
+    """Knee, hip and torso-lean angles for both sides in one call.
+
+    ``lm`` is one (33, 4) landmark array or an (N, 33, 4) stack; the result
+    is (3, 2) or (N, 3, 2) float64, indexed [KNEE_ANGLE|HIP_ANGLE|TORSO_LEAN,
+    SIDE_RIGHT|SIDE_LEFT].  Torso lean is the shoulder-hip line's angle from
+    vertical in pixels, so it needs the frame ``aspect`` (width / height).
+    """
+    xy = np.asarray(lm, dtype=np.float64)[..., :2]
+    out = np.empty(xy.shape[:-2] + (3, 2))
+    out[..., :2, :] = vector_angles(
+        xy[..., _JOINT_A, :], xy[..., _JOINT_B, :], xy[..., _JOINT_C, :])
+    v = xy[..., _SHOULDERS, :] - xy[..., _HIPS, :]
+    out[..., TORSO_LEAN, :] = np.abs(np.degrees(np.arctan2(v[..., 0] * aspect, -v[..., 1])))
+    return out
+
+
+def frame_aspect(frame):
+    h, w = frame.shape[:2]
+    return w / h
+
 
-def draw_landmark(frame, lm, color, r=7):
+def calculate_angle(a, b, c):
+    # Scalar form of vector_angles(), kept for existing callers
+    return vector_angles(np.asarray(a, dtype=np.float64),
+                         np.asarray(b, dtype=np.float64),
+                         np.asarray(c, dtype=np.float64))
+
+# The draw helpers do nothing for frame=None (headless replay, see replay.py)
+def draw_landmark(frame, pt, color, r=7):
+    # pt: normalized (x, y[, ...]) landmark row
+    if frame is None:
+        return
     h, w, _ = frame.shape
-    cv2.circle(frame, (int(lm.x*w), int(lm.y*h)), r, color, -1)
+    cv2.circle(frame, (int(pt[0]*w), int(pt[1]*h)), r, color, -1)
 
-def draw_line(frame, lm1, lm2, color, t=4):
+def draw_line(frame, pt1, pt2, color, t=4):
+    if frame is None:
+        return
     h, w, _ = frame.shape
-    p1 = (int(lm1.x*w), int(lm1.y*h))
-    p2 = (int(lm2.x*w), int(lm2.y*h))
+    p1 = (int(pt1[0]*w), int(pt1[1]*h))
+    p2 = (int(pt2[0]*w), int(pt2[1]*h))
     cv2.line(frame, p1, p2, color, t)
 
 def draw_warning(frame, text, y):
-    cv2.putText(frame, text, (30, y),
-                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 0, 0), 3)
-
-def _right_side():
-    mp_pose = mp.solutions.pose.PoseLandmark
-    return {
-        "shoulder": mp_pose.RIGHT_SHOULDER,
-        "hip": mp_pose.RIGHT_HIP,
-        "knee": mp_pose.RIGHT_KNEE,
-        "ankle": mp_pose.RIGHT_ANKLE,
-        "foot_index": mp_pose.RIGHT_FOOT_INDEX,
-        "heel": mp_pose.RIGHT_HEEL,
-    }
+    if frame is None:
+        return
+    put_text(frame, text, (30, y), 1.2, (255, 0, 0), 3, cv2.LINE_8)
+
+# ── Side resolution ──────────────────────────────────────────────────────────
+# Read-only landmark index tables, built once at import.  Every consumer gets
+# the same objects back; nothing is rebuilt per frame.
+_RIGHT_SIDE = MappingProxyType({
+    "shoulder": RIGHT_SHOULDER,
+    "hip": RIGHT_HIP,
+    "knee": RIGHT_KNEE,
+    "ankle": RIGHT_ANKLE,
+    "foot_index": RIGHT_FOOT_INDEX,
+    "heel": RIGHT_HEEL,
+})
+
+_LEFT_SIDE = MappingProxyType({
+    "shoulder": LEFT_SHOULDER,
+    "hip": LEFT_HIP,
+    "knee": LEFT_KNEE,
+    "ankle": LEFT_ANKLE,
+    "foot_index": LEFT_FOOT_INDEX,
+    "heel": LEFT_HEEL,
+})
+
+_SIDE_TABLES = {"right": _RIGHT_SIDE, "left": _LEFT_SIDE}
+
+
+def _point_rows(side):
+    rows = np.array([side["shoulder"], side["hip"], side["knee"], side["ankle"],
+                     side["foot_index"], side["heel"]])
+    rows.flags.writeable = False
+    return rows
+
+
+_POINT_ROWS = {"right": _point_rows(_RIGHT_SIDE), "left": _point_rows(_LEFT_SIDE)}
+
+# Hip/knee/ankle of both legs: visibility decides which side faces the
+# camera, knee/ankle heights which leg is raised
+_LEG_ROWS = np.array([RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE,
+                      LEFT_HIP, LEFT_KNEE, LEFT_ANKLE])
+
+
+class SideResolution(NamedTuple):
+    """One frame's side decision plus everything it was derived from.
+
+    Built once per frame by resolve_sides() and passed to the exercises, the
+    debug overlay and the setup preview, so none of them repeat the lookups.
+    """
+    name: str              # "right" / "left"
+    mode: str              # "MANUAL", "AUTO(vis)" or "AUTO(pos)"
+    right_vis: float       # summed hip/knee/ankle visibility
+    left_vis: float
+    hip_dx: float          # |right hip x - left hip x|, small when sideways
+    raised_leg: str        # leg whose ankle is higher relative to its knee
+
+    @property
+    def table(self):
+        """Landmark index table of the chosen side (read-only mapping)."""
+        return _SIDE_TABLES[self.name]
+
+    @property
+    def rows(self):
+        """(shoulder, hip, knee, ankle, foot_index, heel) landmark indices."""
+        return _POINT_ROWS[self.name]
+
+    @property
+    def col(self):
+        """Column of the chosen side in joint_angles() output."""
+        return SIDE_RIGHT if self.name == "right" else SIDE_LEFT
+
+    def sideways(self, threshold=0.08):
+        return self.hip_dx < threshold
+
+    def debug_text(self) -> str:
+        return (f"{self.mode}->{self.name.upper()}  "
+                f"R:{self.right_vis:.2f} L:{self.left_vis:.2f}")
+
+
+def resolve_sides(lm, preferred_side="auto") -> SideResolution:
+    """Decide which body side to track for this frame (one landmark gather)."""
+    r_hip, r_knee, r_ankle, l_hip, l_knee, l_ankle = lm[_LEG_ROWS].tolist()
 
-def _left_side():
-    mp_pose = mp.solutions.pose.PoseLandmark
-    return {
-        "shoulder": mp_pose.LEFT_SHOULDER,
-        "hip": mp_pose.LEFT_HIP,
-        "knee": mp_pose.LEFT_KNEE,
-        "ankle": mp_pose.LEFT_ANKLE,
-        "foot_index": mp_pose.LEFT_FOOT_INDEX,
-        "heel": mp_pose.LEFT_HEEL,
-    }
+    # Sum visibility of core landmarks for each side
+    r_vis = r_hip[VIS] + r_knee[VIS] + r_ankle[VIS]
+    l_vis = l_hip[VIS] + l_knee[VIS] + l_ankle[VIS]
 
-def get_visible_side(lm, preferred_side="auto"):
-    if preferred_side == "right":
-        return _right_side()
-    elif preferred_side == "left":
-        return _left_side()
+    if preferred_side in ("right", "left"):
+        name, mode = preferred_side, "MANUAL"
+    elif abs(r_vis - l_vis) > 0.3:
+        # Auto: use visibility if the difference is meaningful (> 0.3 total)
+        name = "right" if r_vis > l_vis else "left"
+        mode = "AUTO(vis)"
+    else:
+        # Fall back to hip x-position (smaller x = that side is closer to camera)
+        name = "right" if r_hip[X] < l_hip[X] else "left"
+        mode = "AUTO(pos)"
 
-    # Auto: prefer visibility scores; fall back to hip x-position
-    mp_pose = mp.solutions.pose.PoseLandmark
+    # How high each ankle is relative to its knee (more = leg raised higher)
+    r_raise = r_knee[Y] - r_ankle[Y]
+    l_raise = l_knee[Y] - l_ankle[Y]
 
-    # Sum visibility of core landmarks for each side
-    r_vis = (lm[mp_pose.RIGHT_HIP].visibility +
-             lm[mp_pose.RIGHT_KNEE].visibility +
-             lm[mp_pose.RIGHT_ANKLE].visibility)
-    l_vis = (lm[mp_pose.LEFT_HIP].visibility +
-             lm[mp_pose.LEFT_KNEE].visibility +
-             lm[mp_pose.LEFT_ANKLE].visibility)
+    return SideResolution(
+        name, mode, r_vis, l_vis, abs(r_hip[X] - l_hip[X]),
+        "right" if r_raise > l_raise else "left",
+    )
 
-    # Use visibility if the difference is meaningful (> 0.3 total)
-    if abs(r_vis - l_vis) > 0.3:
-        return _right_side() if r_vis > l_vis else _left_side()
 
-    # Fall back to hip x-position (smaller x = that side is closer to camera)
-    r_hip_x = lm[mp_pose.RIGHT_HIP].x
-    l_hip_x = lm[mp_pose.LEFT_HIP].x
-    return _right_side() if r_hip_x < l_hip_x else _left_side()
+def get_visible_side(lm, preferred_side="auto"):
+    return resolve_sides(lm, preferred_side).table
 
 
 def get_side_debug_info(lm, preferred_side="auto") -> str:
     """Return a one-line debug string showing side selection + visibility scores."""
-    mp_pose = mp.solutions.pose.PoseLandmark
-    r_vis = (lm[mp_pose.RIGHT_HIP].visibility +
-             lm[mp_pose.RIGHT_KNEE].visibility +
-             lm[mp_pose.RIGHT_ANKLE].visibility)
-    l_vis = (lm[mp_pose.LEFT_HIP].visibility +
-             lm[mp_pose.LEFT_KNEE].visibility +
-             lm[mp_pose.LEFT_ANKLE].visibility)
-
-    if preferred_side in ("right", "left"):
-        chosen = preferred_side.upper()
-        mode = "MANUAL"
-    else:
-        if abs(r_vis - l_vis) > 0.3:
-            chosen = "RIGHT" if r_vis > l_vis else "LEFT"
-            mode = "AUTO(vis)"
-        else:
-            r_hip_x = lm[mp_pose.RIGHT_HIP].x
-            l_hip_x = lm[mp_pose.LEFT_HIP].x
-            chosen = "RIGHT" if r_hip_x < l_hip_x else "LEFT"
-            mode = "AUTO(pos)"
-
-    return (f"{mode}->{chosen}  "
-            f"R:{r_vis:.2f} L:{l_vis:.2f}")
+    return resolve_sides(lm, preferred_side).debug_text()
 
 
 def is_side_visible(lm, threshold=0.08):
-    r = lm[mp.solutions.pose.PoseLandmark.RIGHT_HIP]
-    l = lm[mp.solutions.pose.PoseLandmark.LEFT_HIP]
-    return abs(r.x - l.x) < threshold
+    return abs(float(lm[RIGHT_HIP, X] - lm[LEFT_HIP, X])) < threshold
 
 class Squat:
     NEUTRAL = "NEUTRAL"
@@ -135,33 +241,24 @@ class Squat:
         self.HEEL_THRESH = 0.01
         self.KNEE_FWD_THRESH = 0.02
 
-    def torso_lean_excessive(self, lm, frame, side):
-        h, w, _ = frame.shape
-        hip = lm[side["hip"]]
-        sh = lm[side["shoulder"]]
-
-        hip_pt = np.array([hip.x*w, hip.y*h])
-        sh_pt = np.array([sh.x*w, sh.y*h])
-
-        v = sh_pt - hip_pt
-        angle = abs(np.degrees(np.arctan2(v[0], -v[1])))
-
-        return angle > self.TORSO_MAX
+    def torso_lean_excessive(self, lean):
+        # lean: shoulder-hip angle from vertical (joint_angles TORSO_LEAN)
+        return lean > self.TORSO_MAX
 
     def heels_lifted(self, lm, side):
-        foot = lm[side["foot_index"]]
-        heel = lm[side["heel"]]
-        return (foot.y - heel.y) > self.HEEL_THRESH
+        foot_y = lm[side["foot_index"], Y]
+        heel_y = lm[side["heel"], Y]
+        return (foot_y - heel_y) > self.HEEL_THRESH
 
     def knee_too_far_forward(self, lm, side):
-        knee = lm[side["knee"]]
-        foot = lm[side["foot_index"]]
+        knee_x = lm[side["knee"], X]
+        foot_x = lm[side["foot_index"], X]
         # When RIGHT leg faces camera: knee passes foot if knee.x > foot.x (rightward)
         # When LEFT leg faces camera: knee passes foot if knee.x < foot.x (leftward)
-        if side["knee"] == mp.solutions.pose.PoseLandmark.RIGHT_KNEE:
-            return (knee.x - foot.x) > self.KNEE_FWD_THRESH
+        if side["knee"] == RIGHT_KNEE:
+            return (knee_x - foot_x) > self.KNEE_FWD_THRESH
         else:
-            return (foot.x - knee.x) > self.KNEE_FWD_THRESH
+            return (foot_x - knee_x) > self.KNEE_FWD_THRESH
 
     def evaluate_form(self, knee_angle, lean_bad, heels_bad, knee_fwd_bad):
         errors = {
@@ -175,29 +272,22 @@ class Squat:
             return self.BAD, errors
         return self.GOOD, errors
 
-    def update(self, lm, frame, preferred_side="auto"):
+    def update(self, lm, frame, preferred_side="auto", sides=None, aspect=None):
+        # sides: this frame's resolve_sides() result, if the caller has one;
+        # frame may be None (no drawing) when aspect (width / height) is given
+        if sides is None:
+            sides = resolve_sides(lm, preferred_side)
+        side = sides.table
+        side_ok = sides.sideways()
+        angles = joint_angles(lm, aspect or frame_aspect(frame))[:, sides.col]
 
-        side = get_visible_side(lm, preferred_side)
-        side_ok = is_side_visible(lm)
-
-        lean_bad = self.torso_lean_excessive(lm, frame, side)
+        lean_bad = self.torso_lean_excessive(angles[TORSO_LEAN])
         heels_bad = self.heels_lifted(lm, side)
         knee_fwd_bad = self.knee_too_far_forward(lm, side)
 
-        sh_lm = lm[side["shoulder"]]
-
-        hip_lm = lm[side["hip"]]
-        knee_lm = lm[side["knee"]]
-        ankle_lm = lm[side["ankle"]]
-
-        hip = [hip_lm.x, hip_lm.y]
-        knee = [knee_lm.x, knee_lm.y]
-        ankle = [ankle_lm.x, ankle_lm.y]
+        sh_lm, hip_lm, knee_lm, ankle_lm, foot_lm, heel_lm = lm[sides.rows, :2].tolist()
 
-        knee_angle = calculate_angle(hip, knee, ankle)
-
-        foot_lm = lm[side["foot_index"]]
-        heel_lm = lm[side["heel"]]
+        knee_angle = angles[KNEE_ANGLE]
 
         if knee_angle < 120:
             motion = "DOWN"
@@ -286,24 +376,14 @@ class SeatedKneeBend:
         self.TORSO_MAX = 35           # degrees (slightly lenient for seated posture)
         self.HIP_LIFT_THRESH = 0.02
 
-    def torso_lean_excessive(self, lm, frame, side):
-        h, w, _ = frame.shape
-        hip = lm[side["hip"]]
-        sh = lm[side["shoulder"]]
-
-        hip_pt = np.array([hip.x*w, hip.y*h])
-        sh_pt = np.array([sh.x*w, sh.y*h])
-
-        v = sh_pt - hip_pt
-        angle = abs(np.degrees(np.arctan2(v[0], -v[1])))
-
-        return angle > self.TORSO_MAX
+    def torso_lean_excessive(self, lean):
+        # lean: shoulder-hip angle from vertical (joint_angles TORSO_LEAN)
+        return lean > self.TORSO_MAX
 
     def hip_lifted(self, lm, side):
-        hip = lm[side["hip"]]
         if self.hip_ref_y is None:
             return False
-        return abs(hip.y - self.hip_ref_y) > self.HIP_LIFT_THRESH
+        return abs(float(lm[side["hip"], Y]) - self.hip_ref_y) > self.HIP_LIFT_THRESH
 
     def evaluate_form(self, lean_bad, hip_bad):
         errors = {
@@ -315,21 +395,15 @@ class SeatedKneeBend:
             return self.BAD, errors
         return self.GOOD, errors
 
-    def update(self, lm, frame, preferred_side="auto"):
-
-        side = get_visible_side(lm, preferred_side)
-        side_ok = is_side_visible(lm)
+    def update(self, lm, frame, preferred_side="auto", sides=None, aspect=None):
+        if sides is None:
+            sides = resolve_sides(lm, preferred_side)
+        side = sides.table
 
-        sh_lm = lm[side["shoulder"]]
-        hip_lm = lm[side["hip"]]
-        knee_lm = lm[side["knee"]]
-        ankle_lm = lm[side["ankle"]]
+        angles = joint_angles(lm, aspect or frame_aspect(frame))[:, sides.col]
+        sh_lm, hip_lm, knee_lm, ankle_lm = lm[sides.rows[:4], :2].tolist()
 
-        hip = [hip_lm.x, hip_lm.y]
-        knee = [knee_lm.x, knee_lm.y]
-        ankle = [ankle_lm.x, ankle_lm.y]
-
-        knee_angle = calculate_angle(hip, knee, ankle)
+        knee_angle = angles[KNEE_ANGLE]
 
         if knee_angle < self.KNEE_MIN:
             motion = "BENT"
@@ -340,13 +414,13 @@ class SeatedKneeBend:
 
         # Set hip reference when the leg is extended (stable seated position)
         if motion == "EXTENDED" and self.hip_ref_y is None:
-            self.hip_ref_y = hip_lm.y
+            self.hip_ref_y = hip_lm[1]
 
-        lean_bad = self.torso_lean_excessive(lm, frame, side)
+        lean_bad = self.torso_lean_excessive(angles[TORSO_LEAN])
         hip_bad = self.hip_lifted(lm, side)
 
         # Use a more lenient threshold for seated sideways check
-        seated_side_ok = is_side_visible(lm, threshold=0.15)
+        seated_side_ok = sides.sideways(threshold=0.15)
 
         visual_state = self.NEUTRAL
         errors = {}
@@ -422,38 +496,10 @@ class StraightLegRaise:
         self.HIP_RAISE_MIN = 140     # degrees
         self.TORSO_MAX = 20
 
-    def _detect_raised_leg(self, lm):
-        """Auto-detect which leg is being raised by comparing ankle heights.
-        The raised leg's ankle will have a lower y value (higher on screen).
-        """
-        mp_pose = mp.solutions.pose.PoseLandmark
-        r_ankle = lm[mp_pose.RIGHT_ANKLE]
-        l_ankle = lm[mp_pose.LEFT_ANKLE]
-        r_knee = lm[mp_pose.RIGHT_KNEE]
-        l_knee = lm[mp_pose.LEFT_KNEE]
-
-        # Compare how high each ankle is relative to its knee
-        # (more negative = leg raised higher)
-        r_raise = r_knee.y - r_ankle.y
-        l_raise = l_knee.y - l_ankle.y
-
-        if r_raise > l_raise:
-            return "right"
-        else:
-            return "left"
-
-    def torso_lifted(self, lm, frame, side):
-        h, w, _ = frame.shape
-        hip = lm[side["hip"]]
-        sh = lm[side["shoulder"]]
-
-        hip_pt = np.array([hip.x * w, hip.y * h])
-        sh_pt = np.array([sh.x * w, sh.y * h])
-
-        v = sh_pt - hip_pt
-        # Measure angle from horizontal using absolute values — works for both
-        # left and right facing directions
-        angle_from_horiz = abs(np.degrees(np.arctan2(abs(v[1]), abs(v[0]) + 1e-6)))
+    def torso_lifted(self, lean):
+        # Measure the trunk's angle from horizontal (lean is from vertical) —
+        # works for both left and right facing directions
+        angle_from_horiz = abs(90.0 - lean)
         return angle_from_horiz > self.TORSO_MAX
 
     def evaluate_form(self, knee_bad, hip_bad, torso_bad):
@@ -467,29 +513,22 @@ class StraightLegRaise:
             return self.BAD, errors
         return self.GOOD, errors
 
-    def update(self, lm, frame, preferred_side="auto"):
+    def update(self, lm, frame, preferred_side="auto", sides=None, aspect=None):
+        if sides is None:
+            sides = resolve_sides(lm, preferred_side)
 
-        # Auto-detect which leg is raised
+        # Auto: track whichever leg is raised (higher ankle relative to knee)
         if preferred_side == "auto":
-            detected = self._detect_raised_leg(lm)
-            side = get_visible_side(lm, detected)
-            self.current_side = detected
+            self.current_side = sides.raised_leg
+            sides = sides._replace(name=sides.raised_leg, mode="MANUAL")
         else:
-            side = get_visible_side(lm, preferred_side)
             self.current_side = preferred_side
 
-        sh_lm = lm[side["shoulder"]]
-        hip_lm = lm[side["hip"]]
-        knee_lm = lm[side["knee"]]
-        ankle_lm = lm[side["ankle"]]
-
-        shoulder = [sh_lm.x, sh_lm.y]
-        hip = [hip_lm.x, hip_lm.y]
-        knee = [knee_lm.x, knee_lm.y]
-        ankle = [ankle_lm.x, ankle_lm.y]
+        angles = joint_angles(lm, aspect or frame_aspect(frame))[:, sides.col]
+        sh_lm, hip_lm, knee_lm, ankle_lm = lm[sides.rows[:4], :2].tolist()
 
-        knee_angle = calculate_angle(hip, knee, ankle)
-        hip_angle = calculate_angle(shoulder, hip, knee)
+        knee_angle = angles[KNEE_ANGLE]
+        hip_angle = angles[HIP_ANGLE]
 
         # UP = leg resting flat (hip_angle near 180°)
         # DOWN = leg raised (hip_angle decreases as leg lifts)
@@ -500,7 +539,7 @@ class StraightLegRaise:
 
         knee_bad = knee_angle < self.KNEE_STRAIGHT
         hip_bad = hip_angle < self.HIP_RAISE_MIN
-        torso_bad = self.torso_lifted(lm, frame, side)
+        torso_bad = self.torso_lifted(angles[TORSO_LEAN])
 
         visual_state = self.NEUTRAL
         errors = {}
@@ -547,8 +586,8 @@ class StraightLegRaise:
 
         # Show which leg is being tracked
         side_label = "LEFT" if self.current_side == "left" else "RIGHT"
-        cv2.putText(frame, f"Leg: {side_label}", (30, 120),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2, cv2.LINE_AA)
+        if frame is not None:
+            put_text(frame, f"Leg: {side_label}", (30, 120), 1.0, color, 2)
 
         draw_landmark(frame, sh_lm, color)
         draw_line(frame, hip_lm, sh_lm, color)
@@ -563,3 +602,11 @@ class StraightLegRaise:
         self.last_state = motion
 
         return knee_angle, hip_angle, self.rep_count, color, voice_msgs
+
+
+# Evaluator class per canonical exercise key (see storage.canonical_exercise)
+EXERCISE_EVALUATORS = {
+    "Squats": Squat,
+    "Seated Knee Bending": SeatedKneeBend,
+    "Straight Leg Raises": StraightLegRaise,
+}
@@ -0,0 +1,234 @@
+"""
+vision_service.py — KneeConnect shared camera + pose service.
+
+MainWindow's CameraThread is the one place that opens the webcam and runs
+MediaPipe Pose.  Other consumers subscribe to it instead of opening a second
+cv2.VideoCapture with a second Pose graph, so opening the admin dashboard
+(SetupPage preview, setup video recording) costs no camera re-open and no
+model rebuild.
+
+A subscriber's on_frame() runs on the vision thread for every captured
+frame, with the BGR frame and that frame's landmark array (or None).  Its
+time there is added to every frame of the main view, so it should only hand
+the frame off (SetupPreview copies it into a queue and draws on its own
+thread) and talk to the GUI through its own signals.  While any subscriber
+has ``needs_pose`` set, the thread runs inference even when no exercise
+session is active.
+
+Public API:
+    register(thread) / unregister(thread) / current() -> CameraThread | None
+    FrameSubscriber                 base class, on_frame(bgr_frame, landmarks)
+    SetupPreview(thread)            drop-in for widgets.SimpleCameraThread
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from utils import (
+    joint_angles, resolve_sides, KNEE_ANGLE, HIP_ANGLE,
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE,
+    LEFT_ANKLE, RIGHT_ANKLE, LEFT_HEEL, RIGHT_HEEL, LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX,
+)
+from frame_pool import FramePool, DisplayScaler, FrameMailbox
+from capture import ClipRecorder
+from perf import StageTimer, draw_hud
+from overlay import put_text
+
+_lock = threading.Lock()
+_current = None
+
+
+def register(thread):
+    """Make ``thread`` (a running CameraThread) the shared camera."""
+    global _current
+    with _lock:
+        _current = thread
+
+
+def unregister(thread):
+    global _current
+    with _lock:
+        if _current is thread:
+            _current = None
+
+
+def current():
+    """The shared CameraThread, or None when the camera is off."""
+    with _lock:
+        return _current
+
+
+class FrameSubscriber:
+    """One consumer of the shared camera.
+
+    on_frame() is called on the vision thread; ``bgr_frame`` is a pooled
+    frame owned by the caller (retain() it to keep it past the call).
+    """
+    needs_pose = True
+
+    def on_frame(self, bgr_frame, landmarks):
+        """Called for every captured frame; the default ignores it."""
+
+
+# ─── SetupPage preview ───────────────────────────────────────────────────────
+
+# Body and leg segments drawn on the setup preview
+_SKELETON = (
+    (LEFT_SHOULDER, RIGHT_SHOULDER), (LEFT_HIP, RIGHT_HIP),
+    (LEFT_SHOULDER, LEFT_HIP), (RIGHT_SHOULDER, RIGHT_HIP),
+    (LEFT_HIP, LEFT_KNEE), (RIGHT_HIP, RIGHT_KNEE),
+    (LEFT_KNEE, LEFT_ANKLE), (RIGHT_KNEE, RIGHT_ANKLE),
+    (LEFT_ANKLE, LEFT_HEEL), (RIGHT_ANKLE, RIGHT_HEEL),
+    (LEFT_HEEL, LEFT_FOOT_INDEX), (RIGHT_HEEL, RIGHT_FOOT_INDEX),
+    (LEFT_ANKLE, LEFT_FOOT_INDEX), (RIGHT_ANKLE, RIGHT_FOOT_INDEX),
+)
+_SKELETON_POINTS = sorted({i for pair in _SKELETON for i in pair})
+
+
+def _draw_skeleton(rgb, lm):
+    h, w = rgb.shape[:2]
+    pts = (lm[:, :2] * (w, h)).astype(int).tolist()
+    for a, b in _SKELETON:
+        cv2.line(rgb, pts[a], pts[b], (245, 245, 245), 2)
+    for i in _SKELETON_POINTS:
+        cv2.circle(rgb, pts[i], 4, (245, 117, 66), -1)
+
+
+class SetupPreview(QObject, FrameSubscriber):
+    """SetupPage's view of the shared camera.
+
+    Same signals, start()/stop()/set_display_size() and ``clip_recorder`` as
+    SimpleCameraThread, so SetupPage wires either one up the same way.
+
+    on_frame() only copies the frame and landmarks into a short queue; the
+    clip, skeleton, HUD and display scaling run on the preview's own thread,
+    so the main view's frame time does not pay for them.  Clip frames are
+    written in capture order with their capture times; if the queue is full
+    the frame is dropped (``queue_dropped`` in the perf snapshot) and the clip's
+    wall-clock pacing repeats the previous one.  The preview only draws the
+    newest queued frame.
+    """
+    change_pixmap_signal = pyqtSignal(object)   # FrameMailbox of RGB frames
+    bgr_frame_signal = pyqtSignal(object)       # FrameMailbox of BGR frames
+    angles_signal = pyqtSignal(float, float)    # (knee_angle, hip_angle)
+    perf_signal = pyqtSignal(dict)              # perf.StageTimer snapshot, ~1 Hz
+
+    QUEUE_FRAMES = 4
+
+    def __init__(self, thread):
+        super().__init__()
+        self._thread = thread
+        self.show_hud = False
+        self.display_scaler = DisplayScaler()
+        self.frames = FrameMailbox()
+        self.bgr_frames = FrameMailbox()
+        self.clip_recorder = ClipRecorder()
+        # queue + the frame being drawn + bgr mailbox + SetupPage's held frame
+        self._bgr_pool = FramePool(max_frames=self.QUEUE_FRAMES + 3)
+        self._rgb_pool = FramePool(max_frames=4)
+        self._queue = queue.Queue(maxsize=self.QUEUE_FRAMES)
+        self._worker = None
+        self.dropped = 0
+        self._timer = StageTimer(("overlay", "emit"))
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="setup-preview",
+                                            daemon=True)
+            self._worker.start()
+        self._thread.subscribe(self)
+
+    def stop(self):
+        self._thread.unsubscribe(self)
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join(timeout=2.0)
+        self.clip_recorder.stop()
+        self.frames.clear()
+        self.bgr_frames.clear()
+
+    def set_display_size(self, w: int, h: int):
+        self.display_scaler.set_size(w, h)
+
+    def on_frame(self, bgr_frame, landmarks):
+        frame = self._bgr_pool.acquire(bgr_frame.array.shape)
+        frame.array[...] = bgr_frame.array
+        lm = None if landmarks is None else landmarks.copy()
+        try:
+            self._queue.put_nowait((frame, lm, time.perf_counter()))
+        except queue.Full:
+            frame.release()
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, landmarks, t = item
+            try:
+                self.clip_recorder.write(frame.array, t)
+                # Behind: the clip still gets every frame, the preview the newest
+                if self._queue.empty():
+                    self._draw(frame, landmarks)
+            except Exception as e:
+                print(f"Setup preview error: {e}")
+            finally:
+                frame.release()
+        # Frames queued after the stop marker
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].release()
+
+    def _draw(self, bgr_frame, landmarks):
+        timer = self._timer
+        timer.begin()
+        if self.bgr_frames.put(bgr_frame.retain()):
+            self.bgr_frame_signal.emit(self.bgr_frames)
+
+        rgb_frame = self._rgb_pool.acquire(bgr_frame.array.shape)
+        rgb = rgb_frame.array
+        cv2.cvtColor(bgr_frame.array, cv2.COLOR_BGR2RGB, dst=rgb)
+        if landmarks is not None:
+            sides = resolve_sides(landmarks)
+            angles = joint_angles(landmarks)[:, sides.col]
+            knee_angle = float(angles[KNEE_ANGLE])
+            hip_angle = float(angles[HIP_ANGLE])
+            self.angles_signal.emit(knee_angle, hip_angle)
+
+            _draw_skeleton(rgb, landmarks)
+            h_img, w_img = rgb.shape[:2]
+            (hx, hy), (kx, ky) = (landmarks[sides.rows[1:3], :2] * (w_img, h_img)).astype(int).tolist()
+            put_text(rgb, f"Knee:{int(knee_angle)}", (kx - 80, ky - 15), 0.7, (0, 255, 128), 2,
+                     cache=False)
+            put_text(rgb, f"Hip:{int(hip_angle)}", (hx + 10, hy), 0.7, (0, 200, 255), 2,
+                     cache=False)
+        if self.show_hud:
+            draw_hud(rgb, timer.last)
+        timer.lap("overlay")
+
+        rgb_frame = self.display_scaler.scale(rgb_frame)
+        if rgb_frame.image is None:
+            h_img, w_img, ch = rgb_frame.array.shape
+            rgb_frame.image = QImage(rgb_frame.array.data, w_img, h_img, ch * w_img,
+                                     QImage.Format.Format_RGB888)
+        if self.frames.put(rgb_frame):
+            self.change_pixmap_signal.emit(self.frames)
+        timer.lap("emit")
+        timer.end()
+        if timer.due():
+            self.perf_signal.emit(timer.snapshot(
+                dropped=self.bgr_frames.dropped,
+                queue_dropped=self.dropped,
+                display_dropped=self.frames.dropped,
+                display_overflow=self._rgb_pool.overflow))
@@ -5,13 +5,24 @@ import time
 import cv2
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QImage
-import mediapipe as mp
-
 from utils import *
+from capture import LatestFrameGrabber, open_camera, DEFAULT_CAMERA_CONFIG
+from frame_pool import FramePool, DisplayScaler, FrameMailbox
+from perf import StageTimer, draw_hud
+from overlay import put_text, put_text_centered
+import tracing
+import prewarm
+from pose_engine import (
+    create_pose_engine, InferenceScaler, RoiTracker, ComplexityGovernor,
+    InferenceScheduler, LandmarkExtrapolator, ProcessPoseEngine,
+)
 
 
 class CameraThread(QThread):
-    change_pixmap_signal = pyqtSignal(QImage)
+    # emits the frame_pool.FrameMailbox (``self.frames``) when a new frame waits
+    # there; the receiver take()s the PooledFrame (``.image`` is a QImage view)
+    # and must call release() once it has painted it so the buffer is recycled
+    change_pixmap_signal = pyqtSignal(object)
     say_signal = pyqtSignal(str)
     # emits (correct_reps, total_reps, knee_angle, hip_angle) after each processed frame
     stats_signal = pyqtSignal(int, int, float, float)
@@ -19,6 +30,10 @@ class CameraThread(QThread):
     camera_status_signal = pyqtSignal(str)
     # emits (left_correct, left_total, right_correct, right_total) for Straight Leg Raises
     side_reps_signal = pyqtSignal(int, int, int, int)
+    # emits the MediaPipe model_complexity in use (at start and on every switch)
+    complexity_signal = pyqtSignal(int)
+    # emits a perf.StageTimer snapshot (fps, per-stage ms, dropped) about once a second
+    perf_signal = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
@@ -42,18 +57,32 @@ class CameraThread(QThread):
         self.leg_raise = StraightLegRaise()
 
         # MediaPipe Solutions (requires mediapipe==0.10.14)
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        # "thread"  = Pose runs inside this QThread
+        # "process" = Pose runs in a separate worker process (see pose_engine.py)
+        self.inference_mode = "thread"
+        self.model_complexity = 1
+        # Inference frame-time budget for the complexity governor (0 = fixed level)
+        self.frame_budget_ms = 0.0
+        self.pose = None  # built in run() so a worker process lives with the thread
+        # Width frames are downscaled to before inference (0 = full resolution).
+        # Landmarks are normalized, so overlays still land on the full frame.
+        self.inference_width = 0
+        # Crop inference to a padded box around the last detected pose (opt-in)
+        self.roi_tracking = False
+        # Run inference on every Nth frame and extrapolate landmarks in between
+        # (1 = every frame, 0 = pick N from measured latency). With the worker
+        # process, any value other than 1 means "whenever the worker is free".
+        self.inference_stride = 1
+        # Optional One Euro filter (pose_engine.LandmarkSmoother) between
+        # inference and the evaluators; reset with the exercise so a new set
+        # never blends with the last one
+        self.smoother = None
 
         # Video path (used when use_webcam is False)
         self.video_path = r"C:\Users\Mahsa\Downloads\knee_connect-main\knee_connect-main\videos\Seated_Knee_Bending.mp4"
         self.use_webcam = False
+        # Station camera config: cached working device (see capture.open_camera)
+        self.camera_config = DEFAULT_CAMERA_CONFIG
 
         # Countdown state machine
         # "idle"    = no countdown, normal tracking
@@ -65,6 +94,22 @@ class CameraThread(QThread):
         self._countdown_last_num = 0
         self._go_start = 0.0
 
+        # Capture stage stats (frames the vision loop was too slow to process)
+        self.dropped_frames = 0
+        # Draw fps / inference ms / dropped frames on the feed
+        self.show_hud = False
+        # Frames are shrunk to the feed widget's size here, not on the GUI thread
+        self.display_scaler = DisplayScaler()
+        # Hand-off to the GUI: a new frame replaces one the GUI has not taken yet
+        self.frames = FrameMailbox()
+        # vision_service.FrameSubscriber objects sharing this camera and pose
+        # (replaced, never mutated, so the vision thread can read it unlocked)
+        self._subscribers = ()
+
+        # landmark_log.LandmarkRecorder owned by the GUI; while set, every
+        # processed frame's landmarks are appended to it
+        self.recorder = None
+
         # Hand gesture detection
         self._wrist_history = []
         self._WAVE_WINDOW = 45         # frames to keep
@@ -80,6 +125,8 @@ class CameraThread(QThread):
         self.squat_counter = Squat()
         self.knee_bend = SeatedKneeBend()
         self.leg_raise = StraightLegRaise()
+        if self.smoother is not None:
+            self.smoother.reset()
         self._wrist_history = []
         self._hand_raised_since = 0.0
         print(f"Exercise reset for: {self.item}")
@@ -88,20 +135,15 @@ class CameraThread(QThread):
 
     def detect_wave(self, lm):
         """Detect hand wave OR hand held above head for 2 seconds."""
-        mp_pose = mp.solutions.pose.PoseLandmark
-
         # Check both wrists — use whichever is higher
-        r_wrist = lm[mp_pose.RIGHT_WRIST]
-        l_wrist = lm[mp_pose.LEFT_WRIST]
-        r_shoulder = lm[mp_pose.RIGHT_SHOULDER]
-        l_shoulder = lm[mp_pose.LEFT_SHOULDER]
-        nose = lm[mp_pose.NOSE]
+        r_wrist, l_wrist, r_shoulder, l_shoulder, nose = lm[
+            [RIGHT_WRIST, LEFT_WRIST, RIGHT_SHOULDER, LEFT_SHOULDER, NOSE], :2].tolist()
 
-        # Pick the wrist that is raised above its shoulder
+        # Pick the wrist ([x, y]) that is raised above its shoulder
         wrist = None
-        if r_wrist.y < r_shoulder.y:
+        if r_wrist[1] < r_shoulder[1]:
             wrist = r_wrist
-        elif l_wrist.y < l_shoulder.y:
+        elif l_wrist[1] < l_shoulder[1]:
             wrist = l_wrist
 
         if wrist is None:
@@ -112,7 +154,7 @@ class CameraThread(QThread):
         now = time.time()
 
         # --- Fallback: hand held above head for 2 seconds ---
-        hand_above_head = wrist.y < nose.y
+        hand_above_head = wrist[1] < nose[1]
         if hand_above_head:
             if self._hand_raised_since == 0.0:
                 self._hand_raised_since = now
@@ -124,7 +166,7 @@ class CameraThread(QThread):
             self._hand_raised_since = 0.0
 
         # --- Wave detection: horizontal oscillation ---
-        self._wrist_history.append(wrist.x)
+        self._wrist_history.append(wrist[0])
         if len(self._wrist_history) > self._WAVE_WINDOW:
             self._wrist_history.pop(0)
 
@@ -146,45 +188,21 @@ class CameraThread(QThread):
         return False
 
     def _draw_centered_text(self, frame, text, font_scale=4, thickness=8, color=(26, 188, 156)):
-        """Draw large centered text on the frame."""
-        h, w = frame.shape[:2]
-        text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
-        x = (w - text_size[0]) // 2
-        y = (h + text_size[1]) // 2
-        # Shadow
-        cv2.putText(frame, text, (x + 3, y + 3),
-                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness + 2, cv2.LINE_AA)
-        # Main text
-        cv2.putText(frame, text, (x, y),
-                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, thickness, cv2.LINE_AA)
+        """Draw large centered text with a drop shadow (cached sprite, see overlay.py)."""
+        put_text_centered(frame, text, font_scale, thickness, color,
+                          shadow=(3, 3, 2, (0, 0, 0)))
 
     def run(self):
+        tracing.name_thread("CameraThread")
         # --------- Open source ----------
         cap = None
         if self.use_webcam:
-            # Try multiple backends and camera indices
-            attempts = [
-                (0, cv2.CAP_DSHOW, "webcam 0 (DSHOW)"),
-                (0, cv2.CAP_MSMF, "webcam 0 (MSMF)"),
-                (0, cv2.CAP_ANY, "webcam 0 (ANY)"),
-                (1, cv2.CAP_DSHOW, "webcam 1 (DSHOW)"),
-                (1, cv2.CAP_ANY, "webcam 1 (ANY)"),
-            ]
-            for idx, backend, desc in attempts:
-                if not self._run_flag:
-                    return
-                print(f"Trying to open {desc}...")
-                cap = cv2.VideoCapture(idx, backend)
-                if cap.isOpened():
-                    ret, test_frame = cap.read()
-                    if ret and test_frame is not None:
-                        print(f"Camera opened successfully: {desc}")
-                        break
-                    else:
-                        cap.release()
-                        cap = None
-                else:
-                    cap = None
+            # Last working device first (camera config file), full probe if it fails
+            cap, desc = open_camera(self.camera_config, lambda: not self._run_flag)
+            if cap is None and not self._run_flag:
+                return
+            if cap is not None:
+                print(f"Camera opened successfully: {desc}")
         else:
             print("Trying to open video:", self.video_path)
             cap = cv2.VideoCapture(self.video_path)
@@ -197,39 +215,131 @@ class CameraThread(QThread):
         self.camera_status_signal.emit("Camera OK")
         loop_video = True
 
+        if self.pose is None:
+            # Built and warmed during the start-up dialogs if prewarm.start() ran
+            self.pose = (prewarm.take_pose_engine(self.inference_mode, self.model_complexity)
+                         or create_pose_engine(self.inference_mode, self.model_complexity))
+        governor = None
+        if self.frame_budget_ms > 0:
+            governor = ComplexityGovernor(self.frame_budget_ms, self.pose.model_complexity)
+        active_complexity = self.pose.model_complexity
+        self.complexity_signal.emit(active_complexity)
+
+        # Capture runs on its own thread and keeps only the newest frame, so a
+        # slow inference step never makes us display stale buffered frames.
+        pace_fps = 0.0 if self.use_webcam else (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        grabber = LatestFrameGrabber(cap, loop_video=(not self.use_webcam) and loop_video,
+                                     pace_fps=pace_fps)
+        grabber.start()
+
+        # worker frame + queued signal + GUI-held frame, with headroom
+        display_pool = FramePool(max_frames=4)
+        scaler = InferenceScaler(self.inference_width)
+        roi = RoiTracker()
+        scheduler = InferenceScheduler(self.inference_stride)
+        extrapolator = LandmarkExtrapolator()
+        skipping = self.inference_stride != 1
+        async_infer = skipping and isinstance(self.pose, ProcessPoseEngine)
+        pending = None  # (roi box, submit time) of the frame the worker is on
+        timer = StageTimer()
+
         while self._run_flag:
-            ret, cv_img = cap.read()
+            timer.begin()
+            ret, cv_frame = grabber.read(timeout=0.5)
 
             if not ret:
-                if (not self.use_webcam) and loop_video:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                break
-
-            rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-
-            # --------- Pose detection (when tracking is active) ----------
-            results = None
-            if self.process_enabled:
-                rgb_image.flags.writeable = False
-                results = self.pose.process(rgb_image)
-                rgb_image.flags.writeable = True
+                if grabber.finished:
+                    break
+                continue
+
+            self.dropped_frames = grabber.dropped_frames
+            timer.lap("capture")
+
+            out_frame = display_pool.acquire(cv_frame.array.shape)
+            rgb_image = out_frame.array
+            cv2.cvtColor(cv_frame.array, cv2.COLOR_BGR2RGB, dst=rgb_image)
+            timer.lap("convert")
+
+            # --------- Pose detection (when tracking is active or subscribed) ----------
+            # lm: this frame's (33, 4) landmark array (see utils.py), or None
+            lm = None
+            subscribers = self._subscribers
+            if self.process_enabled or any(s.needs_pose for s in subscribers):
+                now = time.perf_counter()
+                fresh = None  # (landmarks, infer_ms, roi box, frame time) of a real inference
+
+                if async_infer:
+                    if not self.pose.busy:
+                        crop, roi_box = roi.crop(rgb_image) if self.roi_tracking else (rgb_image, None)
+                        if self.pose.submit(scaler.scale(crop)):
+                            pending = (roi_box, now)
+                    ready, res = self.pose.poll()
+                    if ready and pending is not None:
+                        roi_box, t_sub = pending
+                        fresh = (res, (time.perf_counter() - t_sub) * 1000.0, roi_box, t_sub)
+                elif scheduler.tick():
+                    crop, roi_box = roi.crop(rgb_image) if self.roi_tracking else (rgb_image, None)
+                    res = self.pose.process(scaler.scale(crop))
+                    fresh = (res, (time.perf_counter() - now) * 1000.0, roi_box, now)
+
+                if fresh is not None:
+                    lm, infer_ms, roi_box, t_frame = fresh
+                    timer.add("inference", infer_ms)
+                    if self.roi_tracking:
+                        roi.update(lm, rgb_image.shape, roi_box)
+                    if skipping:
+                        frame_ms = 1000.0 / grabber.fps if grabber.fps else 33.3
+                        scheduler.record(infer_ms, frame_ms)
+                        extrapolator.observe(lm, t_frame)
+                else:
+                    lm = extrapolator.predict(now)
+                smoother = self.smoother
+                if smoother is not None:
+                    lm = smoother(lm, now)
+
+                if fresh is not None and governor is not None:
+                    level = governor.record(infer_ms)
+                    if level is not None:
+                        print(f"Complexity governor: {infer_ms:.1f} ms vs "
+                              f"{self.frame_budget_ms:.0f} ms budget -> model_complexity {level}")
+                        self.pose.set_complexity(level)
+                if self.pose.model_complexity != active_complexity:
+                    active_complexity = self.pose.model_complexity
+                    self.model_complexity = active_complexity
+                    print(f"Pose model_complexity now {active_complexity}")
+                    self.complexity_signal.emit(active_complexity)
+            else:
+                roi.reset()
+                extrapolator.reset()
+                if self.smoother is not None:
+                    self.smoother.reset()
+            # Only real inferences are recorded (above), not extrapolated frames
+            timer.lap("inference", record=False)
+
+            # --------- Shared-camera subscribers (SetupPage preview, recording) ----------
+            for sub in subscribers:
+                try:
+                    sub.on_frame(cv_frame, lm)
+                except Exception as e:
+                    print(f"Camera subscriber error ({type(sub).__name__}): {e}")
+            cv_frame.release()
 
             # --------- Exercise processing (landmarks + angles) ----------
-            if self.process_enabled and results and results.pose_landmarks:
+            if self.process_enabled and lm is not None:
                 try:
-                    lm = results.pose_landmarks.landmark
+                    # Side decision is made once and shared with the overlay
+                    sides = resolve_sides(lm, self.target_leg)
 
                     if self.item == "Squats":
-                        self.knee_angle, self.reps, self.color, _ = self.squat_counter.update(lm, rgb_image, self.target_leg)
+                        self.knee_angle, self.reps, self.color, _ = self.squat_counter.update(lm, rgb_image, self.target_leg, sides)
                         self.total_reps = self.squat_counter.total_rep_count
 
                     elif self.item == "Seated Knee Bending":
-                        self.knee_angle, self.reps, self.color, _ = self.knee_bend.update(lm, rgb_image, self.target_leg)
+                        self.knee_angle, self.reps, self.color, _ = self.knee_bend.update(lm, rgb_image, self.target_leg, sides)
                         self.total_reps = self.knee_bend.total_rep_count
 
                     elif self.item == "Straight Leg Raises":
-                        self.knee_angle, self.hip_angle, self.reps, self.color, _ = self.leg_raise.update(lm, rgb_image, self.target_leg)
+                        self.knee_angle, self.hip_angle, self.reps, self.color, _ = self.leg_raise.update(lm, rgb_image, self.target_leg, sides)
                         self.total_reps = self.leg_raise.total_rep_count
                         self.side_reps_signal.emit(
                             self.leg_raise.left_rep_count,
@@ -244,17 +354,20 @@ class CameraThread(QThread):
                     self.stats_signal.emit(self.reps, self.total_reps, float(self.knee_angle), float(self.hip_angle))
 
                     # ── Side selection debug overlay ──────────────────────────
-                    debug_str = get_side_debug_info(lm, self.target_leg)
+                    debug_str = sides.debug_text()
                     h_dbg = rgb_image.shape[0]
-                    cv2.putText(rgb_image, debug_str,
-                                (10, h_dbg - 14),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.55,
-                                (220, 220, 0), 1, cv2.LINE_AA)
+                    put_text(rgb_image, debug_str, (10, h_dbg - 14),
+                             0.55, (220, 220, 0), 1, cache=False)
                 except Exception as e:
                     print(f"Exercise processing error ({self.item}): {e}")
                     import traceback
                     traceback.print_exc()
 
+            recorder = self.recorder
+            if recorder is not None and self.process_enabled:
+                recorder.write(time.perf_counter(), lm, rgb_image.shape, self.target_leg)
+            timer.lap("exercise")
+
             # --------- Countdown state machine (overlay) ----------
             if self.countdown_state == "waiting":
                 # Auto-start: immediately begin countdown (no hand gesture required)
@@ -288,20 +401,55 @@ class CameraThread(QThread):
                     self.process_enabled = True
 
             # --------- Overlay text ----------
-            cv2.putText(rgb_image, f"Repetition: {self.reps}", (30, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, self.color, 3, cv2.LINE_AA)
+            put_text(rgb_image, f"Repetition: {self.reps}", (30, 40), 1.2, self.color, 3)
+
+            put_text(rgb_image, f"Angle: {int(self.knee_angle)}", (30, 80), 1.2, self.color, 3,
+                     cache=False)
+            if self.show_hud:
+                draw_hud(rgb_image, timer.last)
+            timer.lap("overlay")
+
+            # --------- Emit frame to PyQt (no copy: QImage views the pooled buffer) ----------
+            out_frame = self.display_scaler.scale(out_frame)
+            if out_frame.image is None:
+                h, w, ch = out_frame.array.shape
+                out_frame.image = QImage(out_frame.array.data, w, h, ch * w,
+                                         QImage.Format.Format_RGB888)
+            if self.frames.put(out_frame):
+                self.change_pixmap_signal.emit(self.frames)
+            timer.lap("emit")
+            timer.end()
+
+            if timer.due():
+                self.perf_signal.emit(timer.snapshot(
+                    dropped=grabber.dropped_frames,
+                    capture_fps=round(grabber.fps, 1),
+                    # frames replaced because the GUI had not taken the previous one
+                    display_dropped=self.frames.dropped,
+                    # frames the GUI had not released yet when we needed a buffer
+                    display_overflow=display_pool.overflow,
+                    model_complexity=active_complexity,
+                ))
+
+        grabber.stop()
+        self.frames.clear()
+        print(f"Capture stopped: {grabber.captured_frames} frames captured, "
+              f"{grabber.dropped_frames} dropped, {self.frames.dropped} not displayed")
+        cap.release()
+        self.pose.close()
+        self.pose = None
 
-            cv2.putText(rgb_image, f"Angle: {int(self.knee_angle)}", (30, 80),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, self.color, 3, cv2.LINE_AA)
+    def subscribe(self, subscriber):
+        """Add a vision_service.FrameSubscriber; GUI thread."""
+        if subscriber not in self._subscribers:
+            self._subscribers = self._subscribers + (subscriber,)
 
-            # --------- Emit frame to PyQt ----------
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-            img_copy = rgb_image.copy()
-            qt_img = QImage(img_copy.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-            self.change_pixmap_signal.emit(qt_img.copy())
+    def unsubscribe(self, subscriber):
+        self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
 
-        cap.release()
+    def set_display_size(self, w: int, h: int):
+        """Target size (device pixels) of the widget showing the feed; GUI thread."""
+        self.display_scaler.set_size(w, h)
 
     def stop(self):
         self._run_flag = False
@@ -3,6 +3,8 @@ import queue
 import threading
 from PyQt6.QtCore import QObject, pyqtSlot
 
+import tracing
+
 
 class TTSWorker(QObject):
     """Background thread that speaks voice feedback using pyttsx3 with cooldown.
@@ -21,7 +23,7 @@ class TTSWorker(QObject):
         self._thread = None
 
     def start(self):
-        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread = threading.Thread(target=self._run, name="TTSWorker", daemon=True)
         self._thread.start()
 
     @pyqtSlot(str)
@@ -65,8 +67,9 @@ class TTSWorker(QObject):
             except queue.Empty:
                 continue
             try:
-                engine.say(msg)
-                engine.runAndWait()
+                with tracing.span("tts.say", cat="tts", text=msg):
+                    engine.say(msg)
+                    engine.runAndWait()
             except Exception as e:
                 print(f"TTS speak error: {e}")
                 # Reinitialize engine on error
@@ -99,7 +102,8 @@ class TTSWorker(QObject):
             except queue.Empty:
                 continue
             try:
-                speaker.Speak(msg)
+                with tracing.span("tts.say", cat="tts", text=msg):
+                    speaker.Speak(msg)
             except Exception as e:
                 print(f"SAPI speak error: {e}")
 
@@ -6,15 +6,13 @@ from PyQt6.QtWidgets import (
     QSizePolicy, QLineEdit, QTextEdit, QComboBox, QFormLayout,
     QScrollArea, QMessageBox,
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QRectF, pyqtSignal
 from PyQt6.QtGui import QImage, QPixmap, QFont, QColor, QPainter, QPen
 
-import numpy as np
-import cv2
-
 from theme import ModernTheme
-from constants import PATIENT_DATA_STORE, canonical_exercise
-from utils import calculate_angle, get_visible_side
+from constants import PATIENT_DATA_STORE, VISION_CAMERA_CONFIG, canonical_exercise
+from frame_pool import FramePool, DisplayScaler, FrameMailbox, fit_size
+import tracing
 
 
 # ─────────────────────────── CUSTOM LABELS ────────────────────────────────────
@@ -33,10 +31,17 @@ class SubHeaderLabel(QLabel):
 
 # ─────────────────────────── CAMERA DISPLAY WIDGET ────────────────────────────
 class CameraDisplayWidget(QWidget):
-    """Stable custom-paint widget used by SetupPage."""
+    """Stable custom-paint widget used by SetupPage.
+
+    ``resized`` carries the widget size in device pixels so the camera thread
+    can deliver frames already scaled to fit; paintEvent then only blits.
+    """
+    resized = pyqtSignal(int, int)
+
     def __init__(self, placeholder_text="Camera Offline"):
         super().__init__()
         self.image = None
+        self._frame = None   # PooledFrame backing self.image
         self.placeholder_text = placeholder_text
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.setStyleSheet(
@@ -44,21 +49,36 @@ class CameraDisplayWidget(QWidget):
             " border: 2px solid #555;"
         )
 
-    def set_image(self, qt_img):
-        self.image = qt_img
+    def set_image(self, frame):
+        """Show a PooledFrame; the previous one is released back to its pool."""
+        if self._frame is not None:
+            self._frame.release()
+        self._frame = frame
+        self.image = frame.image if frame is not None else None
         self.update()
 
+    def device_size(self) -> tuple:
+        dpr = self.devicePixelRatioF()
+        return round(self.width() * dpr), round(self.height() * dpr)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.resized.emit(*self.device_size())
+
     def paintEvent(self, _event):
         painter = QPainter(self)
         if self.image:
-            scaled = self.image.scaled(
-                self.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            x = (self.width() - scaled.width()) // 2
-            y = (self.height() - scaled.height()) // 2
-            painter.drawImage(x, y, scaled)
+            iw, ih = self.image.width(), self.image.height()
+            tw, th = fit_size(iw, ih, *self.device_size())
+            if abs(tw - iw) > 1 and abs(th - ih) > 1:
+                # Frame not pre-scaled (first frames after a resize, upscaling)
+                painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            else:
+                tw, th = iw, ih
+            dpr = self.devicePixelRatioF()
+            w, h = tw / dpr, th / dpr
+            target = QRectF((self.width() - w) / 2, (self.height() - h) / 2, w, h)
+            painter.drawImage(target, self.image)
         else:
             painter.setPen(QPen(QColor(ModernTheme.TEXT_WHITE)))
             painter.setFont(QFont("Segoe UI", 12))
@@ -68,14 +88,27 @@ class CameraDisplayWidget(QWidget):
 
 # ─────────────────────────── SIMPLE CAMERA THREAD (SetupPage only) ────────────
 class SimpleCameraThread(QThread):
-    """Webcam thread for SetupPage: emits frames AND live pose angles."""
-    change_pixmap_signal = pyqtSignal(QImage)
-    bgr_frame_signal = pyqtSignal(object)       # numpy BGR frame
+    """Webcam thread for SetupPage: emits frames AND live pose angles.
+
+    Only used when the main window's camera is off; otherwise SetupPage
+    subscribes to it through vision_service.SetupPreview.
+    """
+    # Both frame signals emit a frame_pool.FrameMailbox; receivers take() the
+    # newest PooledFrame and release() it once done so the buffers are recycled.
+    change_pixmap_signal = pyqtSignal(object)   # RGB frames, ``.image`` is a QImage view
+    bgr_frame_signal = pyqtSignal(object)       # BGR frames, ``.array`` is the numpy frame
     angles_signal = pyqtSignal(float, float)    # (knee_angle, hip_angle)
+    perf_signal = pyqtSignal(dict)              # perf.StageTimer snapshot, ~1 Hz
 
     def __init__(self):
         super().__init__()
         self._run_flag = True
+        self.show_hud = False   # draw fps / inference ms on the preview
+        self.display_scaler = DisplayScaler()
+        self.frames = FrameMailbox()       # preview, newest wins
+        self.bgr_frames = FrameMailbox()   # thumbnail source, newest wins
+        from capture import ClipRecorder
+        self.clip_recorder = ClipRecorder()     # setup clips, written on this thread
         import mediapipe as mp
         _mp = mp.solutions.pose
         self._pose = _mp.Pose(
@@ -90,51 +123,67 @@ class SimpleCameraThread(QThread):
         self._mp_styles = mp.solutions.drawing_styles
 
     def run(self):
-        cap = None
-        for idx, backend, label in [
-            (0, cv2.CAP_DSHOW, "cam0/DSHOW"),
-            (0, cv2.CAP_MSMF,  "cam0/MSMF"),
-            (0, cv2.CAP_ANY,   "cam0/ANY"),
-            (1, cv2.CAP_DSHOW, "cam1/DSHOW"),
-            (1, cv2.CAP_ANY,   "cam1/ANY"),
-        ]:
-            test = cv2.VideoCapture(idx, backend)
-            if test.isOpened():
-                cap = test
-                print(f"SetupPage camera: {label}")
-                break
-            test.release()
-
-        if cap is None:
+        # cv2 and the pose helpers load with the first camera, not with the dialogs
+        import cv2
+        from utils import (
+            joint_angles, landmarks_to_array, resolve_sides, KNEE_ANGLE, HIP_ANGLE,
+        )
+        from capture import open_camera
+        from perf import StageTimer, draw_hud
+        from overlay import put_text
+
+        tracing.name_thread("SetupCameraThread")
+        cap, desc = open_camera(VISION_CAMERA_CONFIG, lambda: not self._run_flag)
+        if cap is not None:
+            print(f"SetupPage camera: {desc}")
+        else:
             print("SetupPage: no camera found")
             return
 
+        bgr_pool = FramePool(max_frames=4)
+        rgb_pool = FramePool(max_frames=4)
+        shape = None
+        timer = StageTimer()
+
         while self._run_flag:
-            ret, cv_img = cap.read()
+            timer.begin()
+            if shape is not None:
+                bgr_frame = bgr_pool.acquire(shape)
+                ret, cv_img = cap.read(bgr_frame.array)
+                if ret and cv_img is not bgr_frame.array:
+                    bgr_frame.release()
+                    bgr_frame = bgr_pool.adopt(cv_img)
+            else:
+                ret, cv_img = cap.read()
+                bgr_frame = bgr_pool.adopt(cv_img) if ret else None
             if ret:
-                bgr_copy = cv_img.copy()
-                self.bgr_frame_signal.emit(bgr_copy)
-
-                rgb = cv2.cvtColor(bgr_copy, cv2.COLOR_BGR2RGB)
+                timer.lap("capture")
+                shape = cv_img.shape
+                self.clip_recorder.write(bgr_frame.array)
+                # SetupPage keeps one reference (thumbnail), we keep ours for cvtColor
+                if self.bgr_frames.put(bgr_frame.retain()):
+                    self.bgr_frame_signal.emit(self.bgr_frames)
+
+                rgb_frame = rgb_pool.acquire(shape)
+                rgb = rgb_frame.array
+                cv2.cvtColor(bgr_frame.array, cv2.COLOR_BGR2RGB, dst=rgb)
+                bgr_frame.release()
+                timer.lap("convert")
                 rgb.flags.writeable = False
                 results = self._pose.process(rgb)
                 rgb.flags.writeable = True
+                timer.lap("inference")
 
                 knee_angle = hip_angle = 0.0
                 if results and results.pose_landmarks:
-                    lm = results.pose_landmarks.landmark
-                    side = get_visible_side(lm)
-                    s = lm[side["shoulder"]]
-                    h_lm = lm[side["hip"]]
-                    k = lm[side["knee"]]
-                    a = lm[side["ankle"]]
-                    knee_angle = float(calculate_angle(
-                        [h_lm.x, h_lm.y], [k.x, k.y], [a.x, a.y]
-                    ))
-                    hip_angle = float(calculate_angle(
-                        [s.x, s.y], [h_lm.x, h_lm.y], [k.x, k.y]
-                    ))
+                    lm = landmarks_to_array(results.pose_landmarks.landmark)
+                    sides = resolve_sides(lm)
+                    angles = joint_angles(lm)[:, sides.col]
+                    knee_angle = float(angles[KNEE_ANGLE])
+                    hip_angle = float(angles[HIP_ANGLE])
+                    h_lm, k = lm[sides.rows[1:3], :2].tolist()
                     self.angles_signal.emit(knee_angle, hip_angle)
+                    timer.lap("exercise")
 
                     # Draw skeleton overlay
                     self._mp_draw.draw_landmarks(
@@ -144,22 +193,44 @@ class SimpleCameraThread(QThread):
                     )
                     # Draw angle values on frame
                     h_img, w_img = rgb.shape[:2]
-                    kx = int(k.x * w_img)
-                    ky = int(k.y * h_img)
-                    hx = int(h_lm.x * w_img)
-                    hy = int(h_lm.y * h_img)
-                    cv2.putText(rgb, f"Knee:{int(knee_angle)}", (kx - 80, ky - 15),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 128), 2, cv2.LINE_AA)
-                    cv2.putText(rgb, f"Hip:{int(hip_angle)}", (hx + 10, hy),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 200, 255), 2, cv2.LINE_AA)
-
-                h_img, w_img, ch = rgb.shape
-                qt_img = QImage(rgb.data, w_img, h_img, ch * w_img, QImage.Format.Format_RGB888)
-                self.change_pixmap_signal.emit(qt_img.copy())
+                    kx = int(k[0] * w_img)
+                    ky = int(k[1] * h_img)
+                    hx = int(h_lm[0] * w_img)
+                    hy = int(h_lm[1] * h_img)
+                    put_text(rgb, f"Knee:{int(knee_angle)}", (kx - 80, ky - 15),
+                             0.7, (0, 255, 128), 2, cache=False)
+                    put_text(rgb, f"Hip:{int(hip_angle)}", (hx + 10, hy),
+                             0.7, (0, 200, 255), 2, cache=False)
+                if self.show_hud:
+                    draw_hud(rgb, timer.last)
+                timer.lap("overlay")
+
+                rgb_frame = self.display_scaler.scale(rgb_frame)
+                if rgb_frame.image is None:
+                    h_img, w_img, ch = rgb_frame.array.shape
+                    rgb_frame.image = QImage(rgb_frame.array.data, w_img, h_img, ch * w_img,
+                                             QImage.Format.Format_RGB888)
+                if self.frames.put(rgb_frame):
+                    self.change_pixmap_signal.emit(self.frames)
+                timer.lap("emit")
+                timer.end()
+                if timer.due():
+                    self.perf_signal.emit(timer.snapshot(
+                        dropped=self.bgr_frames.dropped,
+                        display_dropped=self.frames.dropped,
+                        display_overflow=rgb_pool.overflow))
             else:
+                if bgr_frame is not None:
+                    bgr_frame.release()
                 self.msleep(100)
+        self.clip_recorder.stop()
+        self.frames.clear()
+        self.bgr_frames.clear()
         cap.release()
 
+    def set_display_size(self, w: int, h: int):
+        self.display_scaler.set_size(w, h)
+
     def stop(self):
         self._run_flag = False
         self.wait(1000)